@@ -1,240 +1,696 @@
-import requests
-from requests.exceptions import RequestException
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+import functools
+from io import BytesIO
+import sys
+import time
+from typing import Callable, Iterable, Iterator
 
 from PIL import Image
 from unidecode import unidecode
 
-from utils import get_printer
+from printer import TableLayout, instrumentation
+from printer.document import (
+    Barcode, Feed, Node, Picture, Section, Style, Table, Text,
+)
+from printer.raster_cache import cache_key
+from utils import (
+    get_document_backend, get_printer, get_printer_pool, get_printer_profile,
+    get_receipt_store, get_session,
+)
+from utils.get_printer import print_job
+from utils.get_receipt_store import reprint
+
+# NOTE Change this whenever the same release would print differently.
+RECEIPT_VERSION = 4
+
+# Sizes of the thumbnails the Cover Art Archive has for every image
+COVER_ART_SIZES = (250, 500, 1200)
+
+MUSICBRAINZ_HEADERS = {
+    "User-Agent": "AlbumPrinter/0.0.1 ( winslowjosiah@gmail.com )",
+}
+# Tracks printed at a time, and fetched at a time with the search API
+# (which allows at most 100)
+TRACK_PAGE_SIZE = 100
+# Bytes of a receipt to send to the printer at a time
+STREAM_BUFFER = 4096
 
 
-# Get release information
-mbid = input("Enter MusicBrainz ID for release: ")
-try:
-    r = requests.get(
+def get_release(mbid: str) -> dict:
+    # NOTE MusicBrainz leaves out the tracks past the first few hundred
+    # of a huge medium; those are fetched a page at a time as they're
+    # printed (see media_tracks()).
+    r = get_session().get(
         f"https://musicbrainz.org/ws/2/release/{mbid}",
         params={
             "inc": "artist-credits+genres+labels+recordings+release-groups",
             "fmt": "json",
         },
-        headers={
-            "User-Agent": "AlbumPrinter/0.0.1 ( winslowjosiah@gmail.com )",
+        headers=MUSICBRAINZ_HEADERS,
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+def browse_tracks(
+        mbid: str,
+        position: int,
+        offset: int,
+        limit: int = TRACK_PAGE_SIZE,
+) -> list[dict]:
+    """Get a page of a medium's tracks, in order.
+
+    The tracks are found with the recording search, which (unlike the
+    browse API) has each track's own number and place on the medium.
+
+    :param position: the medium's position in the release.
+    :param offset: how many of the medium's tracks to skip.
+    """
+    r = get_session().get(
+        "https://musicbrainz.org/ws/2/recording",
+        params={
+            "query": (
+                f"reid:{mbid} AND position:{position} "
+                f"AND tnum:[{offset + 1} TO {offset + limit}]"
+            ),
+            "limit": limit,
+            "fmt": "json",
         },
+        headers=MUSICBRAINZ_HEADERS,
     )
     r.raise_for_status()
-except RequestException as e:
-    print("Error getting album info!")
-    raise SystemExit(e)
-release = r.json()
 
+    # NOTE Search results are in order of relevance, not track order,
+    # and each recording has every release it's on; only the tracks on
+    # this medium are kept, in order of their place on it.
+    tracks = {}
+    for recording in r.json()["recordings"]:
+        for release in recording.get("releases", []):
+            if release["id"] != mbid:
+                continue
+            for media in release.get("media", []):
+                if media.get("position") != position:
+                    continue
+                for i, track in enumerate(media.get("track", [])):
+                    track_position = track.get(
+                        "position", media["track-offset"] + i + 1
+                    )
+                    if not offset < track_position <= offset + limit:
+                        continue
+                    tracks[track_position] = {
+                        "number": track["number"],
+                        "position": track_position,
+                        "title": track.get("title", recording["title"]),
+                        "length": track.get("length", recording.get("length")),
+                        "artist-credit": track.get(
+                            "artist-credit", recording.get("artist-credit", []),
+                        ),
+                        "recording": {
+                            "id": recording["id"],
+                            "title": recording["title"],
+                        },
+                    }
+    return [tracks[track_position] for track_position in sorted(tracks)]
+
+
+def media_tracks(
+        media: dict,
+        browse: Callable[[int, int, int], list[dict]] | None = None,
+) -> Iterator[list[dict]]:
+    """Get a medium's tracks, a page at a time.
+
+    Tracks that didn't come with the release (see get_release()) are
+    fetched a page at a time with browse (if given), as they're needed.
+    Tracks browse doesn't find are left out, so there may be fewer
+    tracks than the medium's track count.
+
+    :param browse: gets a page of the medium's tracks, given its
+        position, an offset and a limit (see browse_tracks()).
+    """
+    tracks = media.get("tracks", [])
+    for start in range(0, len(tracks), TRACK_PAGE_SIZE):
+        yield tracks[start:start + TRACK_PAGE_SIZE]
 
-# Get album art
-album_art = None
-url = f"http://coverartarchive.org/release/{mbid}/front"
-try:
-    r = requests.get(url, stream=True)
+    if browse is None:
+        return
+    count = media.get("track-count", len(tracks))
+    # NOTE The search lags behind edits to MusicBrainz, so a page can be
+    # missing some of its tracks (or all of them); the next page still
+    # starts after the last track this one should have had.
+    for offset in range(len(tracks), count, TRACK_PAGE_SIZE):
+        page = browse(
+            media["position"], offset, min(TRACK_PAGE_SIZE, count - offset),
+        )
+        if page:
+            yield page
+
+
+def get_cover_art_list(mbid: str) -> list[dict]:
+    r = get_session().get(f"http://coverartarchive.org/release/{mbid}")
     r.raise_for_status()
-    album_art = Image.open(r.raw)
-except RequestException as e:
-    print("Error getting album front cover art!")
-    print(e)
+    return r.json()["images"]
 
-    url = f"http://coverartarchive.org/release/{mbid}"
-    try:
-        r = requests.get(url)
-        r.raise_for_status()
 
-        images = r.json()["images"]
-        if images:
-            # HACK We're just getting the first image, whatever it is.
-            url = images[0]["image"]
-            try:
-                r = requests.get(url, stream=True)
-                r.raise_for_status()
-                album_art = Image.open(r.raw)
-            except RequestException as e:
-                print("Error getting any album cover art!")
-                print(e)
-    except RequestException as e:
-        print("Error getting list of album cover art!")
-        print(e)
+def cover_art_size(width: int) -> str:
+    """Get the smallest cover art thumbnail size that fills a width."""
+    for size in COVER_ART_SIZES:
+        if size >= width:
+            return str(size)
+    return ""
 
 
-# Initialize printer
-p = get_printer(__file__)
-media_width = p.profile.profile_data["media"]["width"]["pixels"]
-font_0_columns = p.profile.profile_data["fonts"]["0"]["columns"]
-p.hw("INIT")
-p.ln(3)
+def get_image_data(url: str) -> bytes:
+    r = get_session().get(url)
+    r.raise_for_status()
+    return r.content
 
-# Title / artist
-artist_id = release["artist-credit"][0]["artist"]["id"]
-p.set(double_width=True, double_height=True, align="center")
-p.block_text(
-    unidecode(release["title"]),
-    columns=font_0_columns // 2,
-)
-p.ln()
-p.set(normal_textsize=True, align="center")
-artists = ""
-for artist in release["artist-credit"]:
-    artists += artist["name"] + artist["joinphrase"]
-p.block_text(unidecode(artists))
-p.ln()
-p.set(align="left")
-p.ln()
-
-# Album art
-if album_art is not None:
-    height = int(media_width * album_art.height / album_art.width)
-    album_art = album_art.resize((media_width, height), Image.LANCZOS)
-    p.image(album_art, center=True)
-    p.ln(2)
-
-# Calculate tracklist column widths / alignments
-number_column_width = 2
-padding_column_width = 1
-length_column_width = 6
-title_column_width = (
-    font_0_columns
-    - number_column_width - padding_column_width - length_column_width
-)
-column_widths = [
-    number_column_width, padding_column_width, title_column_width,
-    length_column_width,
-]
-column_aligns = ["right", "left", "left", "right"]
-
-# Tracklist
-p.set(double_width=True, align="center")
-p.textln("Tracklist")
-p.set(normal_textsize=True, align="left")
-p.ln()
-for media in release["media"]:
+
+def album_receipt(
+        release: dict,
+        album_art: Image.Image | None,
+        album_art_key: str | None,
+        width: int,
+        columns: int,
+        browse: Callable[[int, int, int], list[dict]] | None = None,
+) -> Section:
+    """Lay out the album receipt.
+
+    The tracklist is laid out a page of tracks at a time, as it's
+    printed (see media_tracks()).
+
+    :param width: width of the paper in pixels.
+    :param columns: width of the paper in characters (of font A).
+    :param browse: see media_tracks().
+    """
+    receipt = [Feed(3)]
+
+    # Title / artist
+    artist_id = release["artist-credit"][0]["artist"]["id"]
+    artists = ""
+    for artist in release["artist-credit"]:
+        artists += artist["name"] + artist["joinphrase"]
+    receipt.append(Section(
+        [
+            Text(unidecode(release["title"]), Style(size="2x"), feed=1),
+            Text(unidecode(artists), Style(size="normal"), feed=2),
+        ],
+        Style(align="center"),
+    ))
+
+    # Album art
+    if album_art is not None:
+        @instrumentation.timed("render", "album art")
+        def resized_album_art():
+            # Let JPEGs decode at (nearly) the print size to begin with
+            album_art.draft(
+                "RGB",
+                (width, width * album_art.height // album_art.width),
+            )
+            height = int(width * album_art.height / album_art.width)
+            return album_art.resize((width, height), Image.LANCZOS)
+        receipt += [
+            Picture(
+                resized_album_art,
+                key=("album-art", album_art_key),
+                center=True,
+            ),
+            Feed(2),
+        ]
+
+    # Calculate tracklist column widths / alignments
+    number_column_width = 2
+    padding_column_width = 1
+    length_column_width = 6
+    title_column_width = (
+        columns
+        - number_column_width - padding_column_width - length_column_width
+    )
+    column_widths = [
+        number_column_width, padding_column_width, title_column_width,
+        length_column_width,
+    ]
+    column_aligns = ["right", "left", "left", "right"]
+    track_layout = TableLayout(column_widths, column_aligns, break_long_words=True)
+
+    # Tracklist
+    receipt.append(heading("Tracklist"))
+    for media in release["media"]:
+        pages = media_tracks(media, browse)
+        complete = len(media.get("tracks", [])) >= media.get("track-count", 0)
+        receipt.append(Section(
+            media_receipt(media, pages, artist_id, track_layout, columns),
+            # NOTE Only a medium that came whole with the release can be
+            # identified by it.
+            key=("album-media", artist_id, columns, media) if complete else None,
+        ))
+
+    # Release information
+    receipt.append(heading("Release Info"))
+    info = []
+
+    # Release date
+    release_date = release["release-events"][0]["date"]
+    if release_date:
+        info.append(f"Released: {release_date}")
+
+    # Release country
+    area = release["release-events"][0]["area"]
+    if area is not None:
+        info.append(f"Country: {area['name']}")
+
+    # Release format
+    release_format = release["media"][0]["format"]
+    if release_format is not None:
+        info.append(f"Format: {release_format}")
+
+    # Release genre
+    genres = sorted(
+        release["release-group"]["genres"],
+        key=lambda g: (-g["count"], g["name"])
+    )
+    if genres:
+        genres_str = ", ".join(genre["name"] for genre in genres[:5])
+        info.append(f"Genre: {genres_str}")
+
+    # Release label
+    label_info = release["label-info"]
+    if label_info:
+        labels = []
+        seen_labels = set()
+        for label in label_info:
+            if label["label"]["id"] in seen_labels:
+                continue
+            seen_labels.add(label["label"]["id"])
+            labels.append(label["label"]["name"])
+        info.append(f"Label: {'; '.join(map(unidecode, labels))}")
+
+    # Release status
+    status = release["status"]
+    if status is not None:
+        info.append(f"Status: {status}")
+
+    receipt += [Text(line, feed=1) for line in info]
+
+    # UPC-A barcode
+    if release["barcode"] is not None:
+        receipt += [Feed(), Barcode(release["barcode"], "UPCA"), Feed()]
+
+    # Padding
+    receipt.append(Feed(6))
+    return Section(receipt)
+
+
+def heading(text: str) -> Section:
+    return Section(
+        [
+            Text(text, Style(align="center", size="2w"), wrap=False, feed=1),
+            Feed(),
+        ],
+        key=("heading", text),
+    )
+
+
+def media_receipt(
+        media: dict,
+        pages: Iterable[list[dict]],
+        artist_id: str,
+        track_layout: TableLayout,
+        columns: int,
+) -> Iterator[Node]:
+    """Lay out a medium's tracklist, a page of tracks at a time.
+
+    If any track's length is unknown, or any track is missing from pages
+    (compared to the medium's track count), the full length is "?:??".
+    """
     media_title = media["title"]
     if media_title:
-        p.set(double_height=True)
-        p.block_text(unidecode(media_title))
-        p.set(normal_textsize=True)
-        p.ln(2)
+        yield Text(unidecode(media_title), Style(size="2h"), feed=1)
+        yield Feed()
 
     # Tracklist header
-    p.set(bold=True)
-    p.software_columns(
-        ["#", "", "TITLE", "LENGTH"],
-        column_widths,
-        column_aligns,
+    yield Table(
+        track_layout, [["#", "", "TITLE", "LENGTH"]],
+        separator="-" * columns, style=Style(bold=True),
     )
-    p.textln("-" * font_0_columns)
-    p.set(bold=False)
 
-    tracks = media["tracks"]
     unknown_length = False
-    for track in tracks:
-        track_length = track.get("length", None)
-        if track_length is None:
-            track_length_str = "?:??"
-            unknown_length = True
-        else:
-            minutes, seconds = divmod(track_length // 1000, 60)
-            track_length_str = f"{minutes}:{seconds:02}"
-
-        track_title = track["recording"]["title"]
-        # Add other artists to title, if any
-        if any(
-            artist["artist"]["id"] != artist_id
-            for artist in track["artist-credit"]
-        ):
-            track_artists = ""
-            for artist in track["artist-credit"]:
-                track_artists += artist["name"] + artist["joinphrase"]
-            track_title += f"\n({track_artists})"
-
-        row = [track["number"], "", unidecode(track_title), track_length_str]
-        p.software_columns(
-            row, column_widths, column_aligns, break_long_words=True,
-        )
-        p.textln("-" * font_0_columns)
+    full_length = 0
+    track_count = 0
+    for tracks in pages:
+        rows = []
+        track_count += len(tracks)
+        for track in tracks:
+            track_length = track.get("length", None)
+            if track_length is None:
+                track_length_str = "?:??"
+                unknown_length = True
+            else:
+                full_length += track_length
+                minutes, seconds = divmod(track_length // 1000, 60)
+                track_length_str = f"{minutes}:{seconds:02}"
+
+            track_title = track["title"]
+            # Add other artists to title, if any
+            if any(
+                artist["artist"]["id"] != artist_id
+                for artist in track["artist-credit"]
+            ):
+                track_artists = ""
+                for artist in track["artist-credit"]:
+                    track_artists += artist["name"] + artist["joinphrase"]
+                track_title += f"\n({track_artists})"
+
+            rows.append(
+                [track["number"], "", unidecode(track_title), track_length_str]
+            )
+        yield Table(track_layout, rows, separator="-" * columns)
 
     # Full length
-    if not unknown_length:
-        full_length = sum(
-            track["length"]
-            for track in tracks
-        ) // 1000
-        full_minutes, full_seconds = divmod(full_length, 60)
+    if track_count < media.get("track-count", track_count) or not track_count:
+        unknown_length = True
+    if unknown_length:
+        full_length_str = "?:??"
+    else:
+        full_minutes, full_seconds = divmod(full_length // 1000, 60)
         full_hours, full_minutes = divmod(full_minutes, 60)
         if full_hours:
             full_length_parts = (full_hours, full_minutes, full_seconds)
         else:
             full_length_parts = (full_minutes, full_seconds)
-        p.set(bold=True, align="right")
-        p.textln(
-            ":".join(
-                f"{part:02}"
-                for part in full_length_parts
-            ).lstrip("0")
+        full_length_str = str(full_length_parts[0]) + "".join(
+            f":{part:02}" for part in full_length_parts[1:]
         )
-        p.set(bold=False, align="left")
-    p.ln()
-
-# Release information
-p.set(double_width=True, align="center")
-p.textln("Release Info")
-p.set(normal_textsize=True, align="left")
-p.ln()
-
-# Release date
-release_date = release["release-events"][0]["date"]
-if release_date:
-    p.block_text(f"Released: {release_date}")
-    p.ln()
-
-# Release country
-area = release["release-events"][0]["area"]
-if area is not None:
-    p.block_text(f"Country: {area['name']}")
-    p.ln()
-
-# Release format
-release_format = release["media"][0]["format"]
-if release_format is not None:
-    p.block_text(f"Format: {release_format}")
-    p.ln()
-
-# Release genre
-genres = sorted(
-    release["release-group"]["genres"],
-    key=lambda g: (-g["count"], g["name"])
-)
-if genres:
-    genres_str = ", ".join(genre["name"] for genre in genres[:5])
-    p.block_text(f"Genre: {genres_str}")
-    p.ln()
-
-# Release label
-label_info = release["label-info"]
-if label_info:
-    labels = []
-    seen_labels = set()
-    for label in label_info:
-        if label["label"]["id"] in seen_labels:
+    yield Text(
+        full_length_str, Style(bold=True, align="right"), wrap=False, feed=1,
+    )
+    yield Feed()
+
+
+def fetch_album(
+        mbid: str,
+        art_size: str,
+        executor: Executor,
+) -> tuple[dict, bytes | None]:
+    """Get a release, and its cover art data (or None, if there isn't any).
+
+    :param art_size: cover art thumbnail size (see cover_art_size()).
+    """
+    # NOTE requests takes a while to import, so it isn't imported until
+    # it's needed (by get_session()).
+    from requests.exceptions import RequestException
+
+    # NOTE The release and the cover art (and the list of cover art, in
+    # case there's no front cover) don't depend on each other, so they're
+    # all started at once.
+    release_future = executor.submit(get_release, mbid)
+    front_future = executor.submit(
+        get_image_data,
+        f"http://coverartarchive.org/release/{mbid}/front"
+        + (f"-{art_size}" if art_size else ""),
+    )
+    cover_art_list_future = executor.submit(get_cover_art_list, mbid)
+
+    # Get release information
+    release = release_future.result()
+
+    # Get album art
+    try:
+        return release, front_future.result()
+    except RequestException as e:
+        print("Error getting album front cover art!")
+        print(e)
+
+    try:
+        images = cover_art_list_future.result()
+    except RequestException as e:
+        print("Error getting list of album cover art!")
+        print(e)
+        return release, None
+    if not images:
+        return release, None
+    # HACK We're just getting the first image, whatever it is.
+    try:
+        return release, get_image_data(
+            images[0]["thumbnails"].get(art_size) or images[0]["image"]
+        )
+    except RequestException as e:
+        print("Error getting any album cover art!")
+        print(e)
+        return release, None
+
+
+def print_album(p, release: dict, album_art_data: bytes | None) -> None:
+    """Print a release's receipt, reprinting the compiled one if possible."""
+    album_art = None
+    album_art_key = None
+    if album_art_data is not None:
+        album_art = Image.open(BytesIO(album_art_data))
+        album_art_key = cache_key(album_art_data)
+
+    # NOTE The receipt is sent as it's laid out, a few KB at a time, so
+    # a long tracklist starts printing before it's all been fetched.
+    with p.document(max_buffer=STREAM_BUFFER):
+        p.hw("INIT")
+
+        # Reprint the compiled receipt, if this release was printed before
+        receipt_key = get_receipt_store().key(
+            "album", RECEIPT_VERSION, p.profile.profile_data["name"],
+            release, album_art_key,
+        )
+        if reprint(p, receipt_key):
+            return
+
+        with p.record() as receipt:
+            get_document_backend(p).render(album_receipt(
+                release, album_art, album_art_key,
+                width=p.profile.profile_data["media"]["width"]["pixels"],
+                columns=p.profile.profile_data["fonts"]["0"]["columns"],
+                browse=functools.partial(browse_tracks, release["id"]),
+            ))
+
+    # Save compiled receipt
+    get_receipt_store().put(
+        receipt_key, bytes(receipt),
+        title=unidecode(release["title"]), script="album",
+    )
+
+
+def compile_album(release: dict, album_art_data: bytes | None) -> bytes:
+    """Get a release's receipt as ESC/POS bytes, without printing it."""
+    from printer import Dummy
+
+    from utils.get_printer import PRINTER_PROFILE
+
+    p = Dummy(profile=PRINTER_PROFILE)
+    print_album(p, release, album_art_data)
+    return p.output
+
+
+def read_mbids(path: str) -> list[str]:
+    """Read release IDs from a file (or stdin, if path is "-").
+
+    IDs are one per line; blank lines and lines starting with # are
+    skipped.
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    return [
+        line.strip() for line in lines
+        if line.strip() and not line.lstrip().startswith("#")
+    ]
+
+
+def print_batch(mbids: list[str], art_size: str, prefetch: int = 2) -> None:
+    """Print many releases over one printer connection.
+
+    Releases are fetched up to prefetch ahead of the one printing, and
+    the ones fetched ahead are compiled one at a time in the background,
+    so the next receipt is usually ready by the time the last one has
+    been sent. A receipt that isn't being compiled yet (like the first
+    one) is printed as it's laid out instead. (Requests to MusicBrainz
+    are rate-limited by get_session().)
+    """
+    from requests.exceptions import RequestException
+
+    started = time.perf_counter()
+    printed = 0
+    # NOTE Each album's requests get their own executor, since
+    # fetch_album() waits for them (and would wait forever if they were
+    # queued behind other albums).
+    with (
+        ThreadPoolExecutor() as request_executor,
+        ThreadPoolExecutor(max_workers=prefetch + 1) as fetch_executor,
+        ThreadPoolExecutor(max_workers=1) as render_executor,
+    ):
+        def prepare(
+                mbid: str, compile_ahead: bool = True,
+        ) -> tuple[Future, Future | None]:
+            fetched = fetch_executor.submit(
+                fetch_album, mbid, art_size, request_executor,
+            )
+            if not compile_ahead:
+                return fetched, None
+            return fetched, render_executor.submit(
+                lambda: compile_album(*fetched.result())
+            )
+
+        printer_future = request_executor.submit(get_printer, __file__)
+        ahead = deque(
+            (mbid, *prepare(mbid, compile_ahead=i > 0))
+            for i, mbid in enumerate(mbids[:prefetch + 1])
+        )
+        queued = len(ahead)
+        try:
+            p = printer_future.result()
+
+            while ahead:
+                mbid, fetched, compiled = ahead.popleft()
+                if queued < len(mbids):
+                    ahead.append((mbids[queued], *prepare(mbids[queued])))
+                    queued += 1
+
+                try:
+                    if compiled is None or compiled.cancel():
+                        print_album(p, *fetched.result())
+                    else:
+                        p._raw(compiled.result())
+                    if hasattr(p, "flush"):
+                        p.flush()
+                except RequestException as e:
+                    print(f"Error getting album info for {mbid}!")
+                    print(e)
+                    continue
+                except Exception as e:
+                    print(f"Error printing {mbid}!")
+                    print(e)
+                    continue
+                printed += 1
+                print(f"Printed {mbid} ({printed} of {len(mbids)})")
+        finally:
+            # NOTE Leaving the with block waits for everything submitted,
+            # so albums that won't be printed now aren't fetched either.
+            for executor in (fetch_executor, render_executor):
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    print(f"Printed {printed} of {len(mbids)} album(s) in {seconds:.1f}s")
+
+
+def print_pool_batch(mbids: list[str], art_size: str, pool) -> None:
+    """Print many releases across a printer pool (see get_printer_pool()).
+
+    Each release goes to the pool as soon as it's fetched, and is laid
+    out for whichever printer it goes to, so several print at once.
+    """
+    from requests.exceptions import RequestException
+
+    from printer import PrintJob
+
+    started = time.perf_counter()
+    jobs = []
+    with ThreadPoolExecutor() as request_executor:
+        for mbid in mbids:
+            try:
+                release, album_art_data = fetch_album(
+                    mbid, art_size, request_executor,
+                )
+            except RequestException as e:
+                print(f"Error getting album info for {mbid}!")
+                print(e)
+                continue
+            jobs.append((mbid, pool.submit(PrintJob(
+                functools.partial(
+                    print_album, release=release,
+                    album_art_data=album_art_data,
+                ),
+                name=mbid,
+            ))))
+
+    printed = 0
+    for mbid, future in jobs:
+        if future.exception() is not None:
+            print(f"Error printing {mbid}!")
+            print(future.exception())
             continue
-        seen_labels.add(label["label"]["id"])
-        labels.append(label["label"]["name"])
-    p.block_text(f"Label: {'; '.join(map(unidecode, labels))}")
-    p.ln()
-
-# Release status
-status = release["status"]
-if status is not None:
-    p.block_text(f"Status: {status}")
-    p.ln()
-
-# UPC-A barcode
-if release["barcode"] is not None:
-    p.ln()
-    p.barcode(release["barcode"], "UPCA")
-    p.ln()
-
-# Padding
-p.ln(6)
+        printed += 1
+        print(f"Printed {mbid} on {future.result()} ({printed} of {len(mbids)})")
+
+    seconds = time.perf_counter() - started
+    print(f"Printed {printed} of {len(mbids)} album(s) in {seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from requests.exceptions import RequestException
+
+    parser = argparse.ArgumentParser(
+        description="Print the information for a MusicBrainz release.",
+    )
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="print every release ID in FILE (one per line, or - for "
+        "stdin), over one printer connection",
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=2,
+        help="with --batch, how many releases to fetch ahead of the one "
+        "printing (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pool", action="store_true",
+        help="print on whichever printer in PRINTER_POOL is free (with "
+        "--batch, on all of them at once)",
+    )
+    args = parser.parse_args()
+
+    # NOTE The full-size cover art can be several megapixels, which is a
+    # lot to download and decode for a 384px-wide printout; getting the
+    # right size thumbnail bounds both by the print width instead.
+    art_width = get_printer_profile().profile_data["media"]["width"]["pixels"]
+    art_size = cover_art_size(art_width)
+
+    if args.batch is not None and args.pool:
+        with get_printer_pool() as pool:
+            print_pool_batch(read_mbids(args.batch), art_size, pool)
+        raise SystemExit
+    if args.batch is not None:
+        print_batch(read_mbids(args.batch), art_size, prefetch=args.prefetch)
+        raise SystemExit
+
+    mbid = input("Enter MusicBrainz ID for release: ")
+
+    # NOTE The printer connection doesn't depend on the release either,
+    # so it's started at the same time.
+    with ThreadPoolExecutor() as executor:
+        printer_future = executor.submit(
+            get_printer_pool if args.pool else functools.partial(
+                get_printer, __file__,
+            )
+        )
+        try:
+            release, album_art_data = fetch_album(mbid, art_size, executor)
+        except RequestException as e:
+            print("Error getting album info!")
+            raise SystemExit(e)
+
+        # Initialize printer
+        p = printer_future.result()
+
+    if args.pool:
+        with p as pool:
+            print_job(
+                __file__,
+                functools.partial(
+                    print_album, release=release,
+                    album_art_data=album_art_data,
+                ),
+                name=unidecode(release["title"]), pool=pool,
+            )
+        raise SystemExit
+
+    print_album(p, release, album_art_data)
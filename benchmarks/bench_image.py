@@ -0,0 +1,70 @@
+"""Compare the NumPy image engine with python-escpos's image path.
+
+Also reports how many bytes compact images save, per image.
+
+Run from the repository root: python -m benchmarks.bench_image
+"""
+import timeit
+
+from PIL import Image
+
+from escpos.escpos import Escpos
+
+from printer import Dummy
+
+
+def make_image(width: int, height: int) -> Image.Image:
+    # A gradient with some detail, so dithering has work to do
+    img = Image.linear_gradient("L").resize((width, height))
+    return Image.merge("RGB", (img, img.transpose(Image.FLIP_LEFT_RIGHT), img))
+
+
+def letterbox(img: Image.Image, width: int, margin: int) -> Image.Image:
+    # Blank margins all around, like a small icon or a letterboxed cover
+    boxed = Image.new("RGB", (width, img.height + margin * 2), "white")
+    boxed.paste(img, ((width - img.width) // 2, margin))
+    return boxed
+
+
+def report_bytes(label: str, img: Image.Image):
+    p = Dummy(profile="ZJ-5870")
+    with p.document():
+        p.image(img, center=True)
+    report = p.document_stats.images[-1]
+    print(
+        f"{label:<40} {report.plain_bytes:8} -> {report.bytes_sent:8} bytes "
+        f"({report.bytes_saved / report.plain_bytes:.0%} saved, "
+        f"{report.rows_fed} rows fed, {report.impl})"
+    )
+
+
+def bench(label: str, func, number: int):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"{label:<40} {seconds * 1000:8.2f} ms")
+
+
+def main():
+    for width, height in ((192, 192), (384, 384), (384, 2000)):
+        img = make_image(width, height)
+        number = max(1, 200_000 // (width * height) * 5)
+        print(f"{width}x{height}:")
+
+        def escpos_path():
+            Escpos.image(Dummy(profile="ZJ-5870"), img)
+
+        bench("  python-escpos", escpos_path, number)
+        for mode in ("floyd-steinberg", "bayer", "threshold"):
+            def fast_path():
+                Dummy(profile="ZJ-5870").image(img, dither=mode)
+
+            bench(f"  printer.raster ({mode})", fast_path, number)
+
+    print("Bytes sent (compact images):")
+    for width, height in ((192, 192), (384, 384)):
+        img = make_image(width, height)
+        report_bytes(f"  {width}x{height}", img)
+        report_bytes(f"  {width}x{height} letterboxed", letterbox(img, 384, 96))
+
+
+if __name__ == "__main__":
+    main()
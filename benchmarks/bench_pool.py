@@ -0,0 +1,75 @@
+"""Measure how print throughput scales with the size of a printer pool.
+
+The printers are simulated: each takes as long to print a job as a real
+printer would take to receive it at --rate bytes per second.
+
+Run from the repository root: python -m benchmarks.bench_pool
+"""
+import argparse
+import time
+
+from printer import Dummy, PoolTarget, PrinterPool, PrintJob
+from printer.pool import media_width
+
+
+PROFILE = "ZJ-5870"
+
+
+class SlowPrinter(Dummy):
+    """Printer that takes a while to print everything it's sent."""
+
+    def __init__(self, rate: float, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate = rate
+
+    def open(self):
+        pass
+
+    def _raw(self, msg: bytes) -> None:
+        time.sleep(len(msg) / self.rate)
+
+
+def bench(printers: int, jobs: int, job_bytes: int, rate: float, strategy: str):
+    targets = [
+        PoolTarget(
+            f"printer-{i}",
+            lambda: SlowPrinter(rate, profile=PROFILE),
+            PROFILE,
+        )
+        for i in range(printers)
+    ]
+    data = b"\n" * job_bytes
+    started = time.perf_counter()
+    with PrinterPool(targets, strategy=strategy) as pool:
+        pool.print_all([
+            PrintJob(name=f"job-{i}", data=data, data_width=media_width(PROFILE))
+            for i in range(jobs)
+        ])
+    return jobs / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=24)
+    parser.add_argument("--job-bytes", type=int, default=4096)
+    parser.add_argument(
+        "--rate", type=float, default=115200,
+        help="simulated bytes per second per printer (default: %(default)s)",
+    )
+    parser.add_argument("--max-printers", type=int, default=4)
+    args = parser.parse_args()
+
+    for strategy in ("round-robin", "least-loaded"):
+        print(f"{strategy}:")
+        single = None
+        for printers in range(1, args.max_printers + 1):
+            rate = bench(printers, args.jobs, args.job_bytes, args.rate, strategy)
+            single = single or rate
+            print(
+                f"  {printers} printer(s) {rate:8.1f} jobs/s "
+                f"({rate / single:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare printing a table row by row with printing it all at once.
+
+Run from the repository root: python -m benchmarks.bench_table
+"""
+import timeit
+
+from printer import Dummy, TableLayout
+
+
+WIDTHS = [2, 1, 23, 6]
+ALIGNS = ["right", "left", "left", "right"]
+SEPARATOR = "-" * 32
+
+
+def make_rows(n: int) -> list[list[str]]:
+    return [
+        [
+            str(i % 100), "",
+            f"Track {i} (Extended Remix)\n(feat. Somebody and Somebody Else)",
+            f"{i % 10}:{i % 60:02}",
+        ]
+        for i in range(n)
+    ]
+
+
+class CountingDummy(Dummy):
+    writes = 0
+
+    def _raw(self, msg: bytes) -> None:
+        self.writes += 1
+        super()._raw(msg)
+
+
+def bench(label: str, func, number: int):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"{label:<30} {seconds * 1000:8.2f} ms")
+
+
+def main():
+    for n in (100, 1000, 5000):
+        rows = make_rows(n)
+        number = max(1, 5000 // n)
+        print(f"{n} rows:")
+
+        def per_row():
+            p = CountingDummy(profile="ZJ-5870")
+            for row in rows:
+                p.software_columns(row, WIDTHS, ALIGNS, break_long_words=True)
+                p.textln(SEPARATOR)
+            return p
+
+        def whole_table():
+            p = CountingDummy(profile="ZJ-5870")
+            layout = TableLayout(WIDTHS, ALIGNS, break_long_words=True)
+            p.table(layout, rows, separator=SEPARATOR)
+            return p
+
+        a, b = per_row(), whole_table()
+        assert a.output == b.output
+        bench(f"  software_columns ({a.writes} writes)", per_row, number)
+        bench(f"  table ({b.writes} writes)", whole_table, number)
+
+
+if __name__ == "__main__":
+    main()
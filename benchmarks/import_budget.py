@@ -0,0 +1,124 @@
+"""Check how long each entry point takes to import its modules.
+
+Every program runs in a fresh interpreter with -X importtime, as far as
+the point where it would start working (scripts with arguments are given
+--help; weather.py and album.py are only imported). The total import
+time is compared with benchmarks/import_budget.json, and this fails
+(exit status 1) when an entry point goes over its budget.
+
+Run from the repository root: python -m benchmarks.import_budget
+Record new budgets: python -m benchmarks.import_budget --update
+"""
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+
+
+ROOT = pathlib.Path(__file__).parent.parent
+BUDGET_PATH = pathlib.Path(__file__).parent.joinpath("import_budget.json")
+# Python arguments for starting each entry point
+ENTRY_POINTS = {
+    "weather": ["-c", "import weather"],
+    "album": ["-c", "import album"],
+    "receipts": ["receipts.py", "--help"],
+    "printd": ["printd.py", "--help"],
+    "printspool": ["printspool.py", "--help"],
+    "emulate": ["emulate.py", "--help"],
+    "printbin": ["printbin.py", "--help"],
+}
+# How much slower than its measured budget an entry point may get
+# NOTE Import times are noisy, more so than the other benchmarks.
+TOLERANCE = 0.5
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int]]:
+    """Get (module, self us, cumulative us) for every top-level import."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module importing them
+        if name.startswith("  "):
+            continue
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(args: list[str]) -> tuple[float, list[tuple[str, int, int]]]:
+    """Import an entry point; get the total import time (ms), and imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    imports = parse_importtime(result.stderr)
+    return sum(cumulative for _, _, cumulative in imports) / 1000, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "entry_points", nargs="*",
+        help="entry points to check (default: all of them)",
+    )
+    parser.add_argument(
+        "--update", action="store_true",
+        help="save the results as the new budgets",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="runs per entry point; the fastest counts (default: 5)",
+    )
+    parser.add_argument(
+        "--top", type=int, default=3,
+        help="slowest imports to show for each entry point (default: 3)",
+    )
+    args = parser.parse_args()
+
+    names = args.entry_points or list(ENTRY_POINTS)
+    unknown = [name for name in names if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry points: {', '.join(unknown)}")
+
+    budgets = {}
+    if BUDGET_PATH.exists():
+        budgets = json.loads(BUDGET_PATH.read_text())
+
+    results = {}
+    failed = False
+    print(f"{'ENTRY POINT':<12} {'MS':>8} {'BUDGET':>8}  SLOWEST IMPORTS")
+    for name in names:
+        # Warm up (bytecode and escpos's capabilities pickle)
+        measure(ENTRY_POINTS[name])
+        ms, imports = min(
+            (measure(ENTRY_POINTS[name]) for _ in range(args.repeat)),
+            key=lambda result: result[0],
+        )
+        results[name] = round(ms, 1)
+        slowest = sorted(imports, key=lambda i: i[2], reverse=True)[:args.top]
+        budget = budgets.get(name)
+        line = (
+            f"{name:<12} {ms:>8.1f} "
+            f"{budget if budget is not None else '-':>8}  "
+            + ", ".join(f"{module} {us / 1000:.0f}" for module, _, us in slowest)
+        )
+        if (
+            not args.update and budget is not None
+            and ms > budget * (1 + TOLERANCE)
+        ):
+            failed = True
+            line += "  OVER BUDGET"
+        print(line)
+
+    if args.update:
+        budgets.update(results)
+        BUDGET_PATH.write_text(json.dumps(budgets, indent=2) + "\n")
+        print(f"Budgets saved to {BUDGET_PATH}")
+    elif failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Benchmark every rendering hot path, and check for regressions.
+
+Everything runs offline: API responses and cover art are replayed from
+benchmarks/fixtures, and output goes to a printer that only counts it.
+For each stage, this reports the time per run, the peak memory
+allocated during a run, and the bytes sent to the printer. It fails
+(exit status 1) when a stage is slower, allocates more, or sends more
+bytes than benchmarks/baseline.json allows.
+
+Run from the repository root: python -m benchmarks.suite
+Record a new baseline: python -m benchmarks.suite --update
+"""
+import argparse
+import contextlib
+from datetime import datetime
+from io import BytesIO, StringIO
+import json
+import pathlib
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from PIL import Image
+
+from benchmarks.replay import NullPrinter, install_session
+from printer.raster_cache import RasterCache
+
+
+BASELINE_PATH = pathlib.Path(__file__).parent.joinpath("baseline.json")
+PROFILE = "ZJ-5870"
+# How much worse than the baseline a stage may get
+TIME_TOLERANCE = 0.5
+ALLOC_TOLERANCE = 0.25
+
+
+def make_stages() -> dict:
+    """Set up each stage; return a function running it, by name."""
+    install_session()
+    # Keep the prepared weather icons out of the real cache
+    sys.modules["utils.get_raster_cache"]._raster_cache = RasterCache(
+        tempfile.mkdtemp(prefix="bench-cache-"),
+    )
+
+    import album
+    import weather
+    from printer import EscposBackend, TableLayout
+    from utils import get_font
+
+    weather_data = weather.get_weather(43.0731, -89.4012)
+    location = weather.get_location_name(43.0731, -89.4012)
+    release = album.get_release("fbc6e8c2-3d8b-4b1a-9a8e-3b1d2a6f0e11")
+    cover_data = album.get_image_data(
+        "http://coverartarchive.org/release/fbc6e8c2/front-500"
+    )
+    now = datetime(2024, 11, 12, 8, 45)
+    width = 384
+    columns = 32
+    icon_path = weather.FILEDIR.joinpath("weather").joinpath(
+        weather_data["currentConditions"]["icon"] + ".png"
+    )
+    cover = Image.open(BytesIO(cover_data)).convert("RGB").resize(
+        (width, width), Image.LANCZOS,
+    )
+
+    layout = TableLayout(
+        [2, 1, columns - 9, 6], ["right", "left", "left", "right"],
+        break_long_words=True,
+    )
+    rows = [
+        [track["number"], "", track["title"], "3:00"]
+        for media in release["media"]
+        for track in media["tracks"]
+    ]
+    paragraphs = [weather_data["description"]] + [
+        day["description"] for day in weather_data["days"]
+    ] + [alert["description"] for alert in weather_data["alerts"]]
+
+    def software_columns():
+        p = NullPrinter(profile=PROFILE)
+        for row in rows:
+            p.software_columns(row, layout.widths, layout.align)
+        return p
+
+    def table():
+        p = NullPrinter(profile=PROFILE)
+        p.table(layout, rows, separator="-" * columns)
+        return p
+
+    def block_text():
+        p = NullPrinter(profile=PROFILE)
+        for paragraph in paragraphs:
+            p.block_text(paragraph)
+            p.ln()
+        return p
+
+    def image():
+        p = NullPrinter(profile=PROFILE)
+        p.image(cover, center=True)
+        return p
+
+    def album_receipt():
+        p = NullPrinter(profile=PROFILE)
+        EscposBackend(p).render(album.album_receipt(
+            release, Image.open(BytesIO(cover_data)), "cover",
+            width=width, columns=columns,
+        ))
+        return p
+
+    stages = {
+        "software_columns": software_columns,
+        "table": table,
+        "block_text": block_text,
+        "image": image,
+        "album_receipt": album_receipt,
+    }
+
+    try:
+        get_font(weather.__file__, weather.TEMPERATURE_FONT, 10)
+    except OSError:
+        print(
+            f"Skipping weather stages ({weather.TEMPERATURE_FONT} "
+            "not found)"
+        )
+        return stages
+
+    def temperature_image():
+        weather.temperature_image(47, "F", size=width // 2, font_size=width // 4.5)
+
+    def weather_image():
+        weather.weather_image(icon_path, temp=47.3, width=width)
+
+    def weather_receipt():
+        p = NullPrinter(profile=PROFILE)
+        EscposBackend(p).render(
+            weather.weather_receipt(location, weather_data, width, now)
+        )
+        return p
+
+    stages.update(
+        temperature_image=temperature_image,
+        weather_image=weather_image,
+        weather_receipt=weather_receipt,
+    )
+    return stages
+
+
+def measure(func, repeat: int) -> dict:
+    # NOTE python-escpos prints a message for every software barcode.
+    with contextlib.redirect_stdout(StringIO()):
+        # Warm up (fonts, caches), and count the output
+        p = func()
+        out_bytes = p.bytes_sent if p is not None else 0
+
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "ms": round(seconds * 1000, 3),
+        "alloc_kib": round(peak / 1024, 1),
+        "bytes": out_bytes,
+    }
+
+
+def regressions(result: dict, baseline: dict) -> list[str]:
+    problems = []
+    if result["ms"] > baseline["ms"] * (1 + TIME_TOLERANCE):
+        problems.append(f"time {baseline['ms']} -> {result['ms']} ms")
+    if result["alloc_kib"] > baseline["alloc_kib"] * (1 + ALLOC_TOLERANCE):
+        problems.append(
+            f"allocated {baseline['alloc_kib']} -> {result['alloc_kib']} KiB"
+        )
+    if result["bytes"] > baseline["bytes"]:
+        problems.append(f"output {baseline['bytes']} -> {result['bytes']} B")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "stages", nargs="*",
+        help="stages to run (default: all of them)",
+    )
+    parser.add_argument(
+        "--update", action="store_true",
+        help="save the results as the new baseline",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="timing runs per stage; the fastest counts (default: 5)",
+    )
+    args = parser.parse_args()
+
+    stages = make_stages()
+    names = args.stages or list(stages)
+    unknown = [name for name in names if name not in stages]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+
+    results = {}
+    failed = False
+    print(f"{'STAGE':<20} {'MS':>9} {'ALLOC KiB':>10} {'BYTES':>8}")
+    for name in names:
+        result = results[name] = measure(stages[name], args.repeat)
+        line = (
+            f"{name:<20} {result['ms']:>9.3f} {result['alloc_kib']:>10.1f} "
+            f"{result['bytes']:>8}"
+        )
+        if not args.update and name in baseline:
+            problems = regressions(result, baseline[name])
+            if problems:
+                failed = True
+                line += "  REGRESSED: " + "; ".join(problems)
+        print(line)
+
+    if args.update:
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline saved to {BASELINE_PATH}")
+    elif failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
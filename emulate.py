@@ -0,0 +1,75 @@
+import argparse
+
+from printer.emulator import Emulator, SpeedModel
+from utils.get_printer import PRINTER_PROFILE
+
+
+parser = argparse.ArgumentParser(
+    description="Work out how long a printout (saved as a .bin file) "
+    "takes to print, and how much paper it uses, without printing it.",
+)
+parser.add_argument("filename", help="file of raw ESC/POS commands")
+parser.add_argument(
+    "--png", default=None,
+    help="also save a preview of the printout as a PNG",
+)
+parser.add_argument(
+    "--profile", default=PRINTER_PROFILE,
+    help=f"printer profile (default: {PRINTER_PROFILE})",
+)
+defaults = SpeedModel()
+parser.add_argument(
+    "--text-speed", type=float, default=defaults.text_mm_per_s,
+    help="mm/s when printing text (default: %(default)s)",
+)
+parser.add_argument(
+    "--image-speed", type=float, default=defaults.image_mm_per_s,
+    help="mm/s when printing images (default: %(default)s)",
+)
+parser.add_argument(
+    "--feed-speed", type=float, default=defaults.feed_mm_per_s,
+    help="mm/s when feeding paper (default: %(default)s)",
+)
+parser.add_argument(
+    "--bytes-per-second", type=float, default=defaults.bytes_per_s,
+    help="how fast the connection sends data (default: %(default)s)",
+)
+args = parser.parse_args()
+
+with open(args.filename, "rb") as f:
+    data = f.read()
+
+emulator = Emulator(args.profile, SpeedModel(
+    text_mm_per_s=args.text_speed,
+    image_mm_per_s=args.image_speed,
+    feed_mm_per_s=args.feed_speed,
+    bytes_per_s=args.bytes_per_second,
+))
+emulator.run(data)
+sections = emulator.sections()
+
+print(f"{'SECTION':<34} {'BYTES':>7} {'RASTER':>6} {'MM':>6} {'SEC':>5}")
+for section in sections:
+    label = f"{section.kind}: {section.label}"
+    if len(label) > 34:
+        label = label[:33] + "~"
+    print(
+        f"{label:<34} {section.bytes:>7} {section.raster_lines:>6} "
+        f"{section.mm:>6.1f} {section.seconds:>5.2f}"
+    )
+print(
+    f"{'TOTAL':<34} {sum(s.bytes for s in sections):>7} "
+    f"{sum(s.raster_lines for s in sections):>6} "
+    f"{sum(s.mm for s in sections):>6.1f} "
+    f"{sum(s.seconds for s in sections):>5.2f}"
+)
+if emulator.unknown:
+    unknown = ", ".join(
+        f"{command.hex(' ')} (x{count})"
+        for command, count in emulator.unknown.items()
+    )
+    print(f"Skipped unknown commands: {unknown}")
+
+if args.png is not None:
+    emulator.render().save(args.png)
+    print(f"Preview saved to {args.png}")
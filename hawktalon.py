@@ -1,11 +1,12 @@
-import requests
+from io import BytesIO
 
 from PIL import Image
 
-from utils import get_printer
+from utils import get_printer, get_session
 
 
 p = get_printer(__file__)
+p.begin_document()
 p.hw("INIT")
 
 p.set(bold=True)
@@ -18,7 +19,7 @@ p.block_text("I DONT NEED MORE TECH I DONT NEED TO SPEND A THOUSAND DORLARS I DO
 p.ln(2)
 
 url = "https://pbs.twimg.com/media/FvpJ6RyWYAcG-Zu?format=jpg&name=large"
-img = Image.open(requests.get(url, stream=True).raw)
+img = Image.open(BytesIO(get_session().get(url).content))
 
 width = p.profile.profile_data["media"]["width"]["pixels"]
 height = int(width * img.height / img.width)
@@ -0,0 +1,137 @@
+import argparse
+import glob
+import mmap
+import time
+
+from printer import instrumentation
+from printer.bluetooth import DEFAULT_CHECKPOINT_SIZE, Bluetooth
+from utils import get_live_printer
+from utils.get_printer import PRINTER_PROFILE
+
+
+parser = argparse.ArgumentParser(
+    description="Print files of raw printer commands (like the ones made "
+    "by printing to a file), one after another over one connection.",
+)
+parser.add_argument(
+    "files", nargs="+",
+    help="files to print; wildcards (like *.bin) are allowed",
+)
+parser.add_argument(
+    "--chunk-size", type=int, default=DEFAULT_CHECKPOINT_SIZE,
+    help="bytes to read and send at a time (default: %(default)s)",
+)
+args = parser.parse_args()
+
+# NOTE Wildcards are expanded here, since Windows doesn't do it.
+files = []
+for pattern in args.files:
+    matches = sorted(glob.glob(pattern))
+    if not matches:
+        parser.error(f"No files match {pattern}")
+    files.extend(matches)
+
+
+def get_usb_printer():
+    from escpos.printer import Win32Raw
+
+    if not Win32Raw.is_usable():
+        return None
+    printer = Win32Raw(profile=PRINTER_PROFILE)
+    printer.open()
+    print("Printing to USB printer")
+    return printer
+
+
+def format_bytes(n: float) -> str:
+    if n < 1024:
+        return f"{n:.0f} B"
+    if n < 1024 ** 2:
+        return f"{n / 1024:.1f} KiB"
+    return f"{n / 1024 ** 2:.1f} MiB"
+
+
+def progress(
+        name: str, sent: int, total: int, seconds: float,
+        queued: bool = False, end: str = "",
+):
+    """Show how much of a file has been sent.
+
+    :param queued: if True, the rate is how fast the file is being
+        queued (by the print daemon or spooler), not printed.
+    """
+    rate = sent / seconds if seconds else 0
+    print(
+        f"\r{name}: {format_bytes(sent)} of {format_bytes(total)} "
+        f"({sent / total:.0%}), {format_bytes(rate)}/s"
+        + (" queued" if queued else ""),
+        end=end, flush=True,
+    )
+
+
+def send_file(printer, path: str, queued: bool = False) -> int:
+    """Send a file to the printer a chunk at a time; return its size.
+
+    The printer isn't flushed, so every file goes in the same job.
+
+    :param queued: see progress().
+    """
+    with open(path, "rb") as f:
+        # NOTE The file is memory-mapped, so only the chunk being sent
+        # has to be in memory, however big the file is.
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be memory-mapped
+            print(f"{path}: empty")
+            return 0
+    with data, instrumentation.span("transmit", "printbin") as span:
+        total = len(data)
+        started = shown = time.perf_counter()
+        for start in range(0, total, args.chunk_size):
+            printer._raw(data[start:start + args.chunk_size])
+            now = time.perf_counter()
+            if now - shown >= 0.25:
+                progress(
+                    path, min(start + args.chunk_size, total), total,
+                    now - started, queued,
+                )
+                shown = now
+        progress(
+            path, total, total, time.perf_counter() - started, queued,
+            end="\n",
+        )
+        if span is not None:
+            span.bytes = total
+    return total
+
+
+printer = get_live_printer() or get_usb_printer()
+if printer is None:
+    raise SystemExit("Printer not found")
+
+# NOTE Only a Bluetooth printer is sent each chunk as it's written (and
+# confirmed as it's printed); the print daemon and the Windows spooler
+# take the whole job first, so their rate per file is only how fast it
+# was queued. The print daemon answers the flush once the job has been
+# printed, so the total rate is the printer's (except on Windows).
+queued = not isinstance(printer, Bluetooth)
+spooled = not hasattr(printer, "flush")
+
+started = time.perf_counter()
+sent = 0
+try:
+    for path in files:
+        sent += send_file(printer, path, queued)
+    if hasattr(printer, "flush"):
+        if queued:
+            print("Waiting for the printer to finish")
+        printer.flush()
+finally:
+    printer.close()
+seconds = time.perf_counter() - started
+print(
+    f"Printed {len(files)} file(s), {format_bytes(sent)} in {seconds:.1f}s "
+    f"({format_bytes(sent / seconds if seconds else 0)}/s"
+    + (" queued)" if spooled else ")")
+)
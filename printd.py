@@ -0,0 +1,22 @@
+import argparse
+
+from printer import PrintDaemon
+from printer.daemon import DEFAULT_SOCKET_PATH
+from utils.get_printer import get_bluetooth_printer
+
+
+parser = argparse.ArgumentParser(
+    description="Keep a Bluetooth connection to the printer open, and "
+    "print jobs sent to a local socket.",
+)
+parser.add_argument(
+    "--socket", default=DEFAULT_SOCKET_PATH,
+    help=f"path of the Unix domain socket (default: {DEFAULT_SOCKET_PATH})",
+)
+args = parser.parse_args()
+
+daemon = PrintDaemon(get_bluetooth_printer(), socket_path=args.socket)
+try:
+    daemon.serve_forever()
+except KeyboardInterrupt:
+    pass
@@ -1,7 +1,75 @@
-from .bluetooth import Bluetooth
-from .escpos_with_software_columns import EscposWithSoftwareColumns
+import importlib
+import os
+import tempfile
+
+# NOTE python-escpos parses its (big) printer database on import, and
+# pickles the result to speed that up next time, but the pickle goes in
+# a new temporary directory every run unless this is set. Only the first
+# import of escpos.capabilities reads it.
+os.environ.setdefault(
+    "ESCPOS_CAPABILITIES_PICKLE_DIR",
+    os.path.join(tempfile.gettempdir(), "receipt-printer-escpos"),
+)
+os.makedirs(os.environ["ESCPOS_CAPABILITIES_PICKLE_DIR"], exist_ok=True)
+
+# Submodule of everything exported; each is only imported when it's first
+# used, so entry points don't pay for (e.g.) escpos and NumPy up front.
+_EXPORTS = {
+    "Bluetooth": "bluetooth",
+    "TransportStats": "bluetooth",
+    "DaemonClient": "daemon",
+    "PrintDaemon": "daemon",
+    "EscposBackend": "document",
+    "PreviewBackend": "document",
+    "Emulator": "emulator",
+    "SpeedModel": "emulator",
+    "Dummy": "escpos_printers",
+    "File": "escpos_printers",
+    "EscposWithSoftwareColumns": "escpos_with_software_columns",
+    "TableLayout": "escpos_with_software_columns",
+    "PoolTarget": "pool",
+    "PrinterPool": "pool",
+    "PrintJob": "pool",
+    "RasterCache": "raster_cache",
+    "ReceiptStore": "receipt_store",
+    "Spool": "spool",
+    "SpoolPrinter": "spool",
+    "SpoolWorker": "spool",
+}
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{_EXPORTS[name]}")
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
+
 
 __all__ = [
     "Bluetooth",
+    "DaemonClient",
+    "Dummy",
+    "Emulator",
+    "EscposBackend",
     "EscposWithSoftwareColumns",
+    "File",
+    "PoolTarget",
+    "PreviewBackend",
+    "PrintDaemon",
+    "PrinterPool",
+    "PrintJob",
+    "RasterCache",
+    "ReceiptStore",
+    "Spool",
+    "SpoolPrinter",
+    "SpeedModel",
+    "SpoolWorker",
+    "TableLayout",
+    "TransportStats",
 ]
\ No newline at end of file
@@ -1,18 +1,32 @@
+from collections import deque
+from dataclasses import dataclass
 import functools
 import socket
+import time
 
-# HACK To add software columns to the ESC/POS printer classes, this must
-# come before every other import from escpos.
-import escpos
-from printer.escpos_with_software_columns import EscposWithSoftwareColumns
-escpos.escpos.Escpos = EscposWithSoftwareColumns
-
-from escpos.escpos import Escpos
 from escpos.exceptions import DeviceNotFoundError
 
+from printer import instrumentation
+from printer.chunking import safe_chunks
+from printer.escpos_with_software_columns import EscposWithSoftwareColumns
+
 
 _DEP_BT = getattr(socket, "AF_BLUETOOTH", None) is not None
 
+# NOTE Most RFCOMM links negotiate a frame size just under 1 KiB.
+DEFAULT_CHUNK_SIZE = 990
+DEFAULT_CHECKPOINT_SIZE = 4096
+
+# DLE EOT n: real-time status request
+DLE_EOT = b"\x10\x04"
+STATUS_PRINTER = 1
+STATUS_PAPER = 4
+# Bits that are always the same in a status reply (0xx1xx10)
+STATUS_FIXED_MASK = 0x93
+STATUS_FIXED_BITS = 0x12
+STATUS_OFFLINE = 0x08
+STATUS_PAPER_OUT = 0x60
+
 
 def is_usable() -> bool:
     return _DEP_BT
@@ -30,15 +44,90 @@ def dependency_bt(func):
     return wrapper
 
 
-class Bluetooth(Escpos):
+class PaperOutError(RuntimeError):
+    pass
+
+
+@dataclass
+class TransportStats:
+    bytes_queued: int = 0
+    bytes_sent: int = 0
+    stall_time: float = 0.0
+    checkpoints: int = 0
+    resumes: int = 0
+    status_wait: float = 0.0
+
+
+class Bluetooth(EscposWithSoftwareColumns):
     @staticmethod
     def is_usable() -> bool:
         return is_usable()
 
-    def __init__(self, address: str = "", port: int = 1, *args, **kwargs):
-        Escpos.__init__(self, *args, **kwargs)
+    def __init__(
+        self,
+        address: str = "",
+        port: int = 1,
+        *args,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        buffered: bool = True,
+        drain_rate: float | None = None,
+        checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE,
+        status_poll: bool = True,
+        status_timeout: float = 1.0,
+        status_interval: float = 0.5,
+        paper_timeout: float = 300.0,
+        max_resumes: int = 5,
+        reconnect_backoff: float = 0.5,
+        **kwargs,
+    ):
+        """Bluetooth (RFCOMM) printer.
+
+        Output is sent in checkpoints: chunks of about checkpoint_size
+        bytes that end between commands (see printer.chunking). After
+        each one, the printer's status is requested; its reply means
+        everything so far has arrived, so that checkpoint is confirmed.
+        If the connection drops, it's reopened, and sending resumes from
+        the first checkpoint that wasn't confirmed.
+
+        :param chunk_size: checkpoints are sent in pieces of at most
+            this many bytes.
+        :param buffered: if False, every write is sent immediately.
+        :param drain_rate: bytes per second the printer can actually
+            print; if given, output is paced so the printer's own
+            buffer never overflows.
+        :param status_poll: if False (or if the printer doesn't answer
+            status requests, until the next time it's connected), a
+            checkpoint counts as confirmed once it's sent, and nothing
+            waits for the printer.
+        :param status_interval: how often to ask again while the printer
+            is offline (e.g. its buffer is full, or it's out of paper).
+        :param paper_timeout: how long to wait for paper to be put in
+            before giving up with PaperOutError.
+        :param max_resumes: how many times one transmission may reconnect.
+        :param reconnect_backoff: seconds to wait before reconnecting;
+            doubled after each try.
+        """
+        EscposWithSoftwareColumns.__init__(self, *args, **kwargs)
         self.address = address
         self.port = port
+        self.chunk_size = chunk_size
+        self.buffered = buffered
+        self.drain_rate = drain_rate
+        self.checkpoint_size = checkpoint_size
+        self.status_poll = status_poll
+        self._status_poll_setting = status_poll
+        self.status_timeout = status_timeout
+        self.status_interval = status_interval
+        self.paper_timeout = paper_timeout
+        self.max_resumes = max_resumes
+        self.reconnect_backoff = reconnect_backoff
+
+        self.stats = TransportStats()
+        # Writes not split into checkpoints yet, and checkpoints not
+        # confirmed yet
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._next_send = 0.0
 
         self._device = False
 
@@ -46,7 +135,17 @@ class Bluetooth(Escpos):
     def open(self, raise_not_found: bool = True):
         if self._device:
             self.close()
+        # NOTE Anything the last connection didn't get confirmed is kept,
+        # and sent first (see discard() to drop it instead).
+
+        self.status_poll = self._status_poll_setting
+        try:
+            self._connect()
+        except DeviceNotFoundError:
+            if raise_not_found:
+                raise
 
+    def _connect(self):
         try:
             self.device = socket.socket(
                 socket.AF_BLUETOOTH,
@@ -56,21 +155,186 @@ class Bluetooth(Escpos):
             self.device.connect((self.address, self.port))
         except (OSError, TimeoutError) as e:
             self.device = None
-            if raise_not_found:
-                raise DeviceNotFoundError(
-                    f"Unable to open Bluetooth printer on "
-                    f"{(self.address, self.port)}:"
-                    f"\n{e}"
-                )
-            else:
-                return
+            raise DeviceNotFoundError(
+                f"Unable to open Bluetooth printer on "
+                f"{(self.address, self.port)}:"
+                f"\n{e}"
+            )
 
     def _raw(self, msg: bytes):
         assert self.device
-        self.device.send(msg)
+        self.stats.bytes_queued += len(msg)
+        self._buffer += msg
+        if not self.buffered:
+            self.flush()
+            return
+
+        # Only send whole checkpoints; the last one may still be missing
+        # part of a command, so it waits for more data or flush()
+        if len(self._buffer) < self.checkpoint_size:
+            return
+        *full, rest = safe_chunks(self._buffer, self.checkpoint_size)
+        self._buffer = bytearray(rest)
+        self._pending.extend(full)
+        self._transmit()
+
+    def flush(self):
+        """Send everything still waiting in the write buffer."""
+        if self._buffer:
+            self._pending.extend(safe_chunks(self._buffer, self.checkpoint_size))
+            self._buffer.clear()
+        self._transmit()
+
+    def discard(self):
+        """Drop everything written that hasn't been confirmed yet."""
+        self._buffer.clear()
+        self._pending.clear()
+
+    def _transmit(self):
+        """Send every pending checkpoint, reconnecting if the link drops.
+
+        A checkpoint stays pending until it's confirmed, so if this
+        fails, the next flush() picks up where it left off.
+        """
+        resumes = 0
+        while self._pending:
+            checkpoint = self._pending[0]
+            try:
+                if self.device is None:
+                    self._reconnect()
+                self._send(checkpoint)
+                self._confirm()
+            except OSError as e:
+                if resumes >= self.max_resumes:
+                    raise
+                self._disconnect(e, self.reconnect_backoff * 2**resumes)
+                resumes += 1
+                continue
+            self._pending.popleft()
+            self.stats.checkpoints += 1
+
+    def _disconnect(self, error: OSError, delay: float):
+        """Close a connection that stopped working, and wait delay seconds."""
+        print(
+            "Bluetooth connection lost; resuming from the last "
+            f"confirmed checkpoint ({len(self._pending)} left) "
+            f"in {delay:g}s"
+        )
+        print(error)
+        if self.device is not None:
+            try:
+                self.device.close()
+            except OSError:
+                pass
+            self.device = None
+        time.sleep(delay)
+
+    def _reconnect(self):
+        try:
+            self._connect()
+        except DeviceNotFoundError as e:
+            # NOTE Callers expect connection problems while printing to
+            # be OSErrors (so that _transmit() tries again).
+            raise OSError(str(e)) from e
+        self.stats.resumes += 1
+        # A printer that didn't answer status requests on the last
+        # connection may well answer them on this one
+        self.status_poll = self._status_poll_setting
+
+    def _status(self, n: int) -> int | None:
+        """Request a real-time status; None if the printer doesn't answer."""
+        self._send_all(memoryview(DLE_EOT + bytes((n,))))
+        self.device.settimeout(self.status_timeout)
+        try:
+            reply = self.device.recv(1)
+        except TimeoutError:
+            return None
+        finally:
+            self.device.settimeout(None)
+        if not reply:
+            raise OSError("Bluetooth connection closed while waiting for status")
+        if reply[0] & STATUS_FIXED_MASK != STATUS_FIXED_BITS:
+            return None
+        return reply[0]
+
+    def _confirm(self):
+        """Wait until the printer has everything sent, and is ready for more.
+
+        The printer only answers a status request once it has received
+        everything before it, and it reports itself offline while its
+        buffer is full, so this also keeps it from being overrun.
+        """
+        if not self.status_poll:
+            return
+        started = time.monotonic()
+        paper_out_since = None
+        try:
+            while True:
+                status = self._status(STATUS_PRINTER)
+                if status is None:
+                    print(
+                        "Printer doesn't answer status requests; sending "
+                        "without waiting for it"
+                    )
+                    self.status_poll = False
+                    return
+                if not status & STATUS_OFFLINE:
+                    return
+
+                paper = self._status(STATUS_PAPER)
+                if paper is not None and paper & STATUS_PAPER_OUT:
+                    now = time.monotonic()
+                    if paper_out_since is None:
+                        print("Printer is out of paper; waiting for more")
+                        paper_out_since = now
+                    elif now - paper_out_since > self.paper_timeout:
+                        raise PaperOutError("Printer is out of paper")
+                time.sleep(self.status_interval)
+        finally:
+            self.stats.status_wait += time.monotonic() - started
+
+    def _send(self, data: bytes):
+        view = memoryview(data)
+        for start in range(0, len(view), self.chunk_size):
+            self._pace()
+            self._send_all(view[start:start + self.chunk_size])
+
+    def _pace(self):
+        if not self.drain_rate:
+            return
+        delay = self._next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            self.stats.stall_time += delay
+        self._next_send = (
+            max(self._next_send, time.monotonic())
+            + self.chunk_size / self.drain_rate
+        )
+
+    def _send_all(self, chunk: memoryview):
+        # NOTE socket.send() may send only part of the data on a slow
+        # link, so keep sending the rest until it all goes through.
+        stalled_since = None
+        while chunk:
+            sent = self.device.send(chunk)
+            if sent == 0:
+                raise OSError("Bluetooth connection closed while sending")
+            self.stats.bytes_sent += sent
+            chunk = chunk[sent:]
+            if chunk and stalled_since is None:
+                stalled_since = time.monotonic()
+        if stalled_since is not None:
+            self.stats.stall_time += time.monotonic() - stalled_since
 
     @dependency_bt
     def close(self):
         if not self._device:
             return
-        self.device = False
+        try:
+            with instrumentation.span("transmit", "Bluetooth") as span:
+                if span is not None:
+                    span.bytes = len(self._buffer) + sum(map(len, self._pending))
+                self.flush()
+        finally:
+            self._device.close()
+            self.device = False
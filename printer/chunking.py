@@ -0,0 +1,199 @@
+"""Split ESC/POS streams into chunks that end between commands.
+
+A chunk only ends at a line feed, or just after an image or barcode, so
+after a chunk has been sent the printer is never partway through a
+command. Raster images too big for one chunk are split into several
+smaller raster images (bands), which print the same. A command whose
+length isn't known ends the splitting; everything from it on stays in
+one chunk.
+"""
+from typing import Iterator
+
+
+ESC = 0x1B
+GS = 0x1D
+FS = 0x1C
+DLE = 0x10
+LF = 0x0A
+
+
+def _arg_counts(*groups: tuple[int, bytes]) -> dict[int, int]:
+    return {command: count for count, commands in groups for command in commands}
+
+
+# Argument bytes of the commands that always have the same number of them
+# (the rest are worked out in _command())
+_ESC_ARGS = _arg_counts(
+    (0, b"\x0e\x14@2<LSimv"),
+    (1, b" !%-3=?EGJKMRTUVadefrtu{"),
+    (2, b"$B\\c"),
+    (3, b"p"),
+    (8, b"W"),
+)
+_GS_ARGS = _arg_counts(
+    (0, b":c"),
+    (1, b"!/BEHITabfhjrw|"),
+    (2, b"$LPW\\"),
+    (3, b"^z"),
+    (4, b"g"),
+)
+_FS_ARGS = _arg_counts(
+    (0, b"&."),
+    (1, b"!-CW"),
+    (2, b"?Sp"),
+)
+# GS V (cut) functions with a feed amount after them
+_CUT_WITH_FEED = frozenset((65, 66, 97, 98, 103, 104))
+
+
+def _command(data: bytes, i: int) -> tuple[int | None, bool]:
+    """Get the end of the command at i, and whether it prints something.
+
+    If the command isn't all there yet, its end is past the end of data.
+    If it isn't known how long the command is, its end is None.
+    """
+    if i + 1 >= len(data):
+        return i + 2, False
+    prefix, command = data[i], data[i + 1]
+    if prefix == DLE:
+        # Real-time commands (DLE DC4 has 3 arguments; the rest have 1)
+        return i + (5 if command == 0x14 else 3), False
+    if prefix == FS:
+        args = _FS_ARGS.get(command)
+        return (None if args is None else i + 2 + args), False
+    if prefix == ESC:
+        if command == ord("*"):
+            if i + 5 > len(data):
+                return i + 5, True
+            # ESC * m nL nH d1...dk
+            m, nl, nh = data[i + 2:i + 5]
+            band_bytes = 3 if m in (32, 33) else 1
+            return i + 5 + (nl + nh * 256) * band_bytes, True
+        if command == ord("("):
+            if i + 5 > len(data):
+                return i + 5, False
+            # ESC ( fn pL pH ...
+            return i + 5 + data[i + 3] + data[i + 4] * 256, False
+        if command == ord("D"):
+            # ESC D n1...nk NUL (tab positions)
+            end = data.find(b"\x00", i + 2)
+            return (len(data) + 1 if end == -1 else end + 1), False
+        args = _ESC_ARGS.get(command)
+        return (None if args is None else i + 2 + args), False
+
+    if command == ord("v"):
+        if i + 8 > len(data):
+            return i + 8, True
+        # GS v 0 m xL xH yL yH d1...dk
+        _, xl, xh, yl, yh = data[i + 3:i + 8]
+        return i + 8 + (xl + xh * 256) * (yl + yh * 256), True
+    if command == ord("("):
+        if i + 5 > len(data):
+            return i + 5, False
+        # GS ( fn pL pH ...
+        length = data[i + 3] + data[i + 4] * 256
+        return i + 5 + length, data[i + 2] == ord("L")
+    if command == ord("k"):
+        if i + 4 > len(data):
+            return i + 4, True
+        m = data[i + 2]
+        if m <= 6:
+            end = data.find(b"\x00", i + 3)
+            # NOTE Until the NUL arrives, the barcode isn't all there.
+            return (len(data) + 1 if end == -1 else end + 1), True
+        return i + 4 + data[i + 3], True
+    if command == ord("8"):
+        if i + 7 > len(data):
+            return i + 7, False
+        # GS 8 L p1 p2 p3 p4 ... (GS ( L with a longer length)
+        length = int.from_bytes(data[i + 3:i + 7], "little")
+        return i + 7 + length, data[i + 2] == ord("L")
+    if command == ord("*"):
+        if i + 4 > len(data):
+            return i + 4, False
+        # GS * x y d1...d(x * y * 8)
+        return i + 4 + data[i + 2] * data[i + 3] * 8, False
+    if command == ord("V"):
+        if i + 3 > len(data):
+            return i + 3, False
+        return i + (4 if data[i + 2] in _CUT_WITH_FEED else 3), False
+    args = _GS_ARGS.get(command)
+    return (None if args is None else i + 2 + args), False
+
+
+def _raster_bands(command: bytes, max_size: int) -> Iterator[bytes]:
+    """Split a GS v 0 raster image into smaller ones of whole rows."""
+    m, xl, xh, yl, yh = command[3:8]
+    width_bytes = xl + xh * 256
+    height = yl + yh * 256
+    rows = max(1, (max_size - 8) // max(1, width_bytes))
+    for y in range(0, height, rows):
+        band_rows = min(rows, height - y)
+        yield (
+            command[:4] + bytes((xl, xh, band_rows & 0xFF, band_rows >> 8))
+            + command[8 + y * width_bytes:8 + (y + band_rows) * width_bytes]
+        )
+
+
+def _segments(data: bytes, max_size: int) -> Iterator[bytes]:
+    """Split a stream at every safe boundary (and long text runs)."""
+    n = len(data)
+    start = i = 0
+    while i < n:
+        byte = data[i]
+        if byte in (ESC, GS, FS, DLE):
+            end, prints = _command(data, i)
+            if end is None or end > n:
+                # NOTE The rest of this command hasn't arrived yet (or it
+                # isn't known where it ends), so it can't be split (or
+                # even checked); it ends the stream.
+                yield data[start:n]
+                return
+            if prints:
+                if data[i + 1] == ord("v") and end - i > max_size:
+                    if i > start:
+                        yield data[start:i]
+                    yield from _raster_bands(data[i:end], max_size)
+                    start = i = end
+                    continue
+                i = end
+                # Column image bands are each followed by a line feed
+                if i < n and data[i] == LF:
+                    i += 1
+                yield data[start:i]
+                start = i
+                continue
+            i = end
+        elif byte == LF:
+            i += 1
+            yield data[start:i]
+            start = i
+            continue
+        else:
+            i += 1
+        if i - start >= max_size:
+            # NOTE Text can be split anywhere outside a command.
+            yield data[start:i]
+            start = i
+    if start < n:
+        yield data[start:n]
+
+
+def safe_chunks(data: bytes, max_size: int) -> list[bytes]:
+    """Split a stream into chunks of at most (about) max_size bytes.
+
+    A chunk is only bigger than max_size if it's a single command that
+    can't be split (like a big column image band), or a command cut off
+    at the end of data, or everything from a command of unknown length
+    on (which always end up in the last chunk).
+    """
+    chunks = []
+    chunk = bytearray()
+    for segment in _segments(data, max_size):
+        if chunk and len(chunk) + len(segment) > max_size:
+            chunks.append(bytes(chunk))
+            chunk.clear()
+        chunk += segment
+    if chunk:
+        chunks.append(bytes(chunk))
+    return chunks
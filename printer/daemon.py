@@ -0,0 +1,252 @@
+import functools
+import os
+import pathlib
+import socket
+import tempfile
+import time
+
+from escpos.exceptions import DeviceNotFoundError
+
+from printer.bluetooth import PaperOutError
+from printer.escpos_with_software_columns import EscposWithSoftwareColumns
+
+
+_DEP_UNIX = getattr(socket, "AF_UNIX", None) is not None
+
+DEFAULT_SOCKET_PATH = pathlib.Path(tempfile.gettempdir()).joinpath(
+    "receipt-printer.sock"
+)
+
+# Reply sent by the daemon once a job has been handed to the printer
+REPLY_OK = b"OK"
+
+
+def is_usable() -> bool:
+    return _DEP_UNIX
+
+
+def dependency_unix(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not is_usable():
+            raise RuntimeError(
+                "Printing through the print daemon requires Unix domain "
+                "socket support in the socket module."
+            )
+        return func(*args, **kwargs)
+    return wrapper
+
+
+class DaemonClient(EscposWithSoftwareColumns):
+    """Printer that streams its job into a running print daemon.
+
+    Each connection to the daemon is one job; the job ends when the
+    client closes its side of the connection (on flush() or close()).
+    """
+
+    @staticmethod
+    def is_usable() -> bool:
+        return is_usable()
+
+    def __init__(
+        self,
+        socket_path: str | os.PathLike[str] = DEFAULT_SOCKET_PATH,
+        *args,
+        **kwargs,
+    ):
+        EscposWithSoftwareColumns.__init__(self, *args, **kwargs)
+        self.socket_path = socket_path
+
+        self._device = False
+
+    @dependency_unix
+    def open(self, raise_not_found: bool = True):
+        if self._device:
+            self.close()
+
+        try:
+            self.device = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.device.connect(os.fspath(self.socket_path))
+        except OSError as e:
+            self.device = None
+            if raise_not_found:
+                raise DeviceNotFoundError(
+                    f"Unable to connect to print daemon on "
+                    f"{self.socket_path}:"
+                    f"\n{e}"
+                )
+            else:
+                return
+
+    def _raw(self, msg: bytes):
+        assert self.device
+        self.device.sendall(msg)
+
+    def flush(self):
+        """Finish the job, and wait for the daemon to print it.
+
+        Raises OSError if the daemon couldn't print it. Anything printed
+        after this is sent as a new job.
+        """
+        if not self._device:
+            return
+        try:
+            # Tell the daemon the job is complete, then wait for it to be
+            # printed
+            self._device.shutdown(socket.SHUT_WR)
+            reply = self._device.recv(1024)
+        finally:
+            self._device.close()
+            # NOTE The next write reconnects (see Escpos.device).
+            self.device = False
+        if reply != REPLY_OK:
+            raise OSError(
+                "Print daemon failed to print job: "
+                f"{reply.decode(errors='replace') or 'no reply'}"
+            )
+
+    @dependency_unix
+    def close(self):
+        try:
+            self.flush()
+        except OSError as e:
+            print(e)
+
+
+class PrintDaemon:
+    """Hold one printer connection open and print jobs sent to a socket.
+
+    Jobs are printed one at a time, in the order they connect. If the
+    printer connection drops, it is reopened with exponential backoff,
+    and the job carries on from the last part the printer confirmed. (So
+    the printer's _raw() should keep what it's given until it's
+    confirmed, even if sending it fails, like Bluetooth does.)
+    """
+
+    def __init__(
+        self,
+        printer: EscposWithSoftwareColumns,
+        socket_path: str | os.PathLike[str] = DEFAULT_SOCKET_PATH,
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        recv_size: int = 4096,
+    ):
+        self.printer = printer
+        self.socket_path = socket_path
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.recv_size = recv_size
+
+        self._connected = False
+        self._backoff = min_backoff
+        self._next_attempt = 0.0
+
+    def _connect(self, wait: bool = True) -> bool:
+        """Try to (re)open the printer, respecting the backoff delay.
+
+        If wait is True, keep retrying until the printer is connected.
+        """
+        while not self._connected:
+            delay = self._next_attempt - time.monotonic()
+            if delay > 0:
+                if not wait:
+                    return False
+                time.sleep(delay)
+            try:
+                self.printer.open()
+            except (DeviceNotFoundError, OSError) as e:
+                print(f"Printer not connected; retrying in {self._backoff}s")
+                print(e)
+                self._next_attempt = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                if not wait:
+                    return False
+            else:
+                print("Printer connected")
+                self._connected = True
+                self._backoff = self.min_backoff
+        return True
+
+    def _disconnect(self):
+        self._connected = False
+        try:
+            self.printer.close()
+        except OSError:
+            pass
+
+    def _lost(self, error: OSError):
+        print("Printer connection lost")
+        print(error)
+        self._disconnect()
+
+    def _print_job(self, conn: socket.socket):
+        # Stream into the printer as the job arrives
+        while True:
+            data = conn.recv(self.recv_size)
+            if not data:
+                break
+            self._connect()
+            try:
+                self.printer._raw(data)
+            except OSError as e:
+                # NOTE The printer still has this data, and sends it
+                # (after anything before it that wasn't confirmed) once
+                # it's reconnected.
+                self._lost(e)
+
+        # Wait until the printer has confirmed the whole job
+        while True:
+            self._connect()
+            try:
+                if hasattr(self.printer, "flush"):
+                    self.printer.flush()
+                return
+            except OSError as e:
+                self._lost(e)
+
+    def _reject_job(self, conn: socket.socket, error: Exception):
+        """Tell the client its job couldn't be printed, and drop it."""
+        print(error)
+        # Read the rest of the job, so the client isn't cut off partway
+        # through sending it
+        while conn.recv(self.recv_size):
+            pass
+        # NOTE The part of the job the printer hasn't confirmed isn't
+        # printed at all, so it isn't printed before the next job either.
+        if hasattr(self.printer, "discard"):
+            self.printer.discard()
+        conn.sendall(f"{error} (job stopped partway through)".encode())
+
+    @dependency_unix
+    def serve_forever(self, idle_timeout: float = 5.0):
+        path = os.fspath(self.socket_path)
+        if os.path.exists(path):
+            os.unlink(path)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen()
+            server.settimeout(idle_timeout)
+            print(f"Print daemon listening on {path}")
+            self._connect(wait=False)
+            try:
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except TimeoutError:
+                        # Use idle time to bring the printer back up
+                        self._connect(wait=False)
+                        continue
+                    with conn:
+                        conn.settimeout(None)
+                        try:
+                            self._print_job(conn)
+                            conn.sendall(REPLY_OK)
+                        except PaperOutError as e:
+                            self._reject_job(conn, e)
+                        except OSError as e:
+                            print("Error receiving print job!")
+                            print(e)
+            finally:
+                self._disconnect()
+                os.unlink(path)
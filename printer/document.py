@@ -0,0 +1,334 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+import textwrap
+import threading
+from typing import Any, Callable, Iterable, Literal, Optional, Union
+
+from PIL import Image
+
+from printer import instrumentation
+from printer.escpos_with_software_columns import (
+    Alignment, EscposWithSoftwareColumns, TableLayout,
+)
+from printer.raster_cache import RasterCache, cache_key
+
+
+Size = Literal["normal", "2w", "2h", "2x"]
+
+
+@dataclass(frozen=True)
+class Style:
+    """Text style of a node; None means "same as the parent's"."""
+    align: Optional[Alignment] = None
+    font: Optional[str] = None
+    bold: Optional[bool] = None
+    underline: Optional[int] = None
+    invert: Optional[bool] = None
+    size: Optional[Size] = None
+
+    def over(self, base: "Style") -> "Style":
+        """Fill in this style's missing values from another style."""
+        return Style(**{
+            f.name: (
+                getattr(base, f.name) if getattr(self, f.name) is None
+                else getattr(self, f.name)
+            )
+            for f in fields(self)
+        })
+
+    def set_args(self) -> dict:
+        """Get the arguments to Escpos.set() for this style."""
+        args = dict(
+            align=self.align, font=self.font, bold=self.bold,
+            underline=self.underline, invert=self.invert,
+        )
+        if self.size is not None:
+            args.update(
+                normal_textsize=self.size == "normal",
+                double_width=self.size in ("2w", "2x"),
+                double_height=self.size in ("2h", "2x"),
+            )
+        return args
+
+
+# Style of everything, unless a node says otherwise (also the printer's
+# style after it's initialized)
+DEFAULT_STYLE = Style(
+    align="left", font="a", bold=False, underline=0, invert=False,
+    size="normal",
+)
+
+
+@dataclass
+class Text:
+    """Text, wrapped to the width of the paper unless wrap is False."""
+    text: str
+    style: Style = Style()
+    wrap: bool = True
+    # Lines to feed after the text
+    feed: int = 0
+
+
+@dataclass
+class Feed:
+    """Blank lines, in the parent's style."""
+    lines: int = 1
+
+
+@dataclass
+class Table:
+    layout: TableLayout
+    rows: list[list]
+    separator: Optional[str] = None
+    style: Style = Style()
+
+
+@dataclass
+class Picture:
+    """An image, or a function returning one.
+
+    If key is given, the image's printer-ready bytes are cached under
+    it (see EscposWithSoftwareColumns.cached_image()), and a function
+    is only called when they aren't cached.
+    """
+    source: Union[Image.Image, str, Callable[[], Image.Image]]
+    key: Any = None
+    center: bool = False
+
+
+@dataclass
+class Barcode:
+    code: str
+    bc: str
+    options: dict = field(default_factory=dict)
+
+
+@dataclass
+class Section:
+    """A group of nodes, sharing a style.
+
+    If key is given, it must identify everything in the section; the
+    ESC/POS backend then keeps the section's bytes, and reuses them the
+    next time a section with the same key is rendered.
+
+    children may be a generator, in which case each child is rendered
+    (and can be printed) before the next one is made.
+    """
+    children: Iterable["Node"]
+    style: Style = Style()
+    key: Any = None
+
+
+Node = Union[Text, Feed, Table, Picture, Barcode, Section]
+
+
+@dataclass
+class SectionStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class EscposBackend:
+    """Renders documents to a printer, as ESC/POS commands.
+
+    Rendering happens in document mode, so styles are only sent where
+    they change. Keyed sections are kept (along with the text state
+    they leave the printer in), up to max_sections of them, and resent
+    as-is when they come up again in the same state. Backends can share
+    their kept sections by being given the same sections dict (the
+    printer's profile is part of each section's key), and the same lock
+    for it, if they render in different threads.
+    """
+
+    def __init__(
+        self,
+        printer: EscposWithSoftwareColumns,
+        raster_cache: Optional[RasterCache] = None,
+        max_sections: int = 256,
+        sections: Optional[OrderedDict] = None,
+        sections_lock: Optional[threading.Lock] = None,
+    ):
+        self.printer = printer
+        self.raster_cache = raster_cache
+        self.max_sections = max_sections
+        self.stats = SectionStats()
+        self._sections = OrderedDict() if sections is None else sections
+        self._sections_lock = (
+            threading.Lock() if sections_lock is None else sections_lock
+        )
+
+    @instrumentation.timed("render", "document")
+    def render(self, root: Node) -> None:
+        """Render a document.
+
+        If a document isn't already open on the printer, the printer is
+        initialized, and the document is rendered in its own; otherwise,
+        it's rendered as part of the open one (whose job is expected to
+        have initialized the printer already).
+        """
+        p = self.printer
+        if p._document is not None:
+            self._render(root, DEFAULT_STYLE)
+            return
+        with p.document():
+            p.hw("INIT")
+            self._render(root, DEFAULT_STYLE)
+
+    def _columns(self, style: Style) -> int:
+        columns = self.printer.profile.get_columns(style.font)
+        if style.size in ("2w", "2x"):
+            columns //= 2
+        return columns
+
+    def _render(self, node: Node, style: Style) -> None:
+        p = self.printer
+        if isinstance(node, Section):
+            style = node.style.over(style)
+            if node.key is None:
+                for child in node.children:
+                    self._render(child, style)
+            else:
+                self._render_section(node, style)
+        elif isinstance(node, Text):
+            style = node.style.over(style)
+            p.set(**style.set_args())
+            if node.wrap:
+                p.block_text(node.text, columns=self._columns(style))
+            else:
+                p.text(node.text)
+            p.ln(node.feed)
+        elif isinstance(node, Feed):
+            # NOTE Blank lines are as tall as the text size says.
+            p.set(**style.set_args())
+            p.ln(node.lines)
+        elif isinstance(node, Table):
+            p.set(**node.style.over(style).set_args())
+            p.table(node.layout, node.rows, separator=node.separator)
+        elif isinstance(node, Picture):
+            p.set(**style.set_args())
+            if node.key is not None:
+                p.cached_image(
+                    node.source, self.raster_cache, key=node.key,
+                    center=node.center,
+                )
+            else:
+                source = node.source
+                if callable(source):
+                    source = source()
+                p.image(source, center=node.center)
+        elif isinstance(node, Barcode):
+            p.set(**style.set_args())
+            p.barcode(node.code, node.bc, **node.options)
+        else:
+            raise TypeError(f"Not a document node: {node!r}")
+
+    def _render_section(self, section: Section, style: Style) -> None:
+        p = self.printer
+        # NOTE The section's bytes depend on the state the printer is in
+        # beforehand (since unchanged styles aren't sent, and code pages
+        # aren't switched to twice), so that's part of the key too.
+        text_state = p._text_state or {}
+        key = cache_key(
+            section.key, style, p.profile.profile_data.get("name"),
+            sorted(text_state.items()), p.magic.encoding,
+        )
+        with self._sections_lock:
+            cached = self._sections.get(key)
+            if cached is not None:
+                self._sections.move_to_end(key)
+        if cached is not None:
+            self.stats.hits += 1
+            data, end_state, end_encoding = cached
+            p._raw(data)
+            if p._text_state is not None:
+                p._text_state.clear()
+                p._text_state.update(end_state)
+            p.magic.encoding = end_encoding
+            return
+
+        self.stats.misses += 1
+        with p._capture(send=True) as buffer:
+            for child in section.children:
+                self._render(child, style)
+        with self._sections_lock:
+            self._sections[key] = (
+                bytes(buffer), dict(p._text_state or {}), p.magic.encoding,
+            )
+            while len(self._sections) > self.max_sections:
+                self._sections.popitem(last=False)
+
+
+class PreviewBackend:
+    """Renders documents as plain text, roughly as they'd be printed.
+
+    Only alignment and text size are shown; images and barcodes are
+    shown as placeholders.
+    """
+
+    def __init__(self, columns: int = 32):
+        self.columns = columns
+
+    def render(self, root: Node) -> str:
+        self._lines = []
+        self._line = ""
+        self._line_style = DEFAULT_STYLE
+        self._render(root, DEFAULT_STYLE)
+        if self._line:
+            self._newline()
+        return "\n".join(self._lines) + "\n"
+
+    def _width(self, style: Style) -> int:
+        if style.size in ("2w", "2x"):
+            return self.columns // 2
+        return self.columns
+
+    def _write(self, text: str, style: Style) -> None:
+        for i, part in enumerate(text.split("\n")):
+            if i:
+                self._newline()
+            if part:
+                if not self._line:
+                    self._line_style = style
+                if style.size in ("2w", "2x"):
+                    part = " ".join(part) + " "
+                self._line += part
+
+    def _newline(self) -> None:
+        line = self._line.rstrip()
+        align = self._line_style.align
+        if align == "center":
+            line = line.center(self.columns).rstrip()
+        elif align == "right":
+            line = line.rjust(self.columns)
+        self._lines.append(line)
+        self._line = ""
+
+    def _placeholder(self, text: str) -> None:
+        if self._line:
+            self._newline()
+        self._lines.append(f"[{text}]".center(self.columns).rstrip())
+
+    def _render(self, node: Node, style: Style) -> None:
+        if isinstance(node, Section):
+            style = node.style.over(style)
+            for child in node.children:
+                self._render(child, style)
+        elif isinstance(node, Text):
+            style = node.style.over(style)
+            text = node.text
+            if node.wrap:
+                text = textwrap.fill(text, self._width(style))
+            self._write(text + "\n" * node.feed, style)
+        elif isinstance(node, Feed):
+            self._write("\n" * node.lines, style)
+        elif isinstance(node, Table):
+            self._write(
+                node.layout.render(node.rows, separator=node.separator),
+                node.style.over(style),
+            )
+        elif isinstance(node, Picture):
+            self._placeholder("image")
+        elif isinstance(node, Barcode):
+            self._placeholder(f"{node.bc} barcode: {node.code}")
+        else:
+            raise TypeError(f"Not a document node: {node!r}")
@@ -0,0 +1,502 @@
+import codecs
+from dataclasses import dataclass, field
+import functools
+from typing import Optional
+
+from escpos.capabilities import get_profile
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+
+ESC = 0x1B
+GS = 0x1D
+LF = 0x0A
+
+# (width, height) in dots of each font's characters
+FONT_SIZES = {0: (12, 24), 1: (9, 17)}
+# Line spacing after ESC 2 (about 1/8")
+DEFAULT_LINE_SPACING = 30
+# Fonts to draw the preview's characters with, in order of preference
+PREVIEW_FONTS = ("DejaVuSansMono.ttf", "cour.ttf", "consola.ttf")
+
+
+@dataclass
+class SpeedModel:
+    """How fast the printer goes, for estimating print times.
+
+    Printing and sending overlap (the printer has a buffer), so each
+    part of a receipt takes as long as the slower of the two.
+    """
+    text_mm_per_s: float = 60.0
+    # Dense images heat more dots per line, so they print slower
+    image_mm_per_s: float = 35.0
+    feed_mm_per_s: float = 80.0
+    # 115200 baud, like a Bluetooth serial port
+    bytes_per_s: float = 11_520.0
+
+    def seconds(self, kind: str, mm: float, n_bytes: int) -> float:
+        mm_per_s = {
+            "text": self.text_mm_per_s,
+            "feed": self.feed_mm_per_s,
+        }.get(kind, self.image_mm_per_s)
+        return max(mm / mm_per_s, n_bytes / self.bytes_per_s)
+
+
+@dataclass
+class Block:
+    """Something the printer printed (or fed), in paper order.
+
+    :param kind: "text", "feed", "image" or "barcode".
+    :param start: offset of the first byte that went into the block.
+    :param end: offset just past the last byte that went into it.
+    :param dots: length on paper, in dots.
+    :param raster_lines: dot lines that were sent as images.
+    """
+    kind: str
+    label: str
+    start: int
+    end: int
+    dots: int
+    raster_lines: int = 0
+    image: Optional[Image.Image] = field(default=None, repr=False)
+
+
+@dataclass
+class SectionProfile:
+    kind: str
+    label: str
+    bytes: int
+    raster_lines: int
+    mm: float
+    seconds: float
+
+
+@functools.lru_cache(maxsize=None)
+def _preview_font(size: int) -> ImageFont.ImageFont:
+    for name in PREVIEW_FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            pass
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=1024)
+def _glyph(char: str, width: int, height: int, bold: bool) -> Image.Image:
+    """Draw one character cell, black on white."""
+    img = Image.new("L", (width, height), 255)
+    if char.strip():
+        font = _preview_font(height * 3 // 4)
+        draw = ImageDraw.Draw(img)
+        draw.text(
+            (width // 2, height // 2), char, fill=0, font=font, anchor="mm",
+        )
+        if bold:
+            img = ImageChops.darker(img, img.transform(
+                img.size, Image.AFFINE, (1, 0, -1, 0, 1, 0), fillcolor=255,
+            ))
+    return img
+
+
+def _encoding(name: Optional[str]) -> str:
+    try:
+        return codecs.lookup(name or "").name
+    except LookupError:
+        return "cp437"
+
+
+class Emulator:
+    """Decodes an ESC/POS stream, and works out what it prints.
+
+    Only the commands used by this project's programs are understood
+    (text and its styles, raster and column images, hardware barcodes,
+    and feeds); anything else is skipped, and counted in unknown.
+
+    :param profile: name of the printer profile, for the paper width
+        and code pages.
+    """
+
+    def __init__(self, profile: str, speed: Optional[SpeedModel] = None):
+        profile_data = get_profile(profile).profile_data
+        media = profile_data["media"]
+        self.width = int(media["width"]["pixels"])
+        self.dots_per_mm = self.width / float(media["width"]["mm"])
+        self.code_pages = {
+            int(n): name for n, name in profile_data["codePages"].items()
+        }
+        self.speed = speed or SpeedModel()
+        self.blocks: list[Block] = []
+        self.unknown: dict[bytes, int] = {}
+        self._reset()
+
+    def _reset(self) -> None:
+        self.align = 0
+        self.font = 0
+        self.bold = False
+        self.underline = 0
+        self.invert = False
+        self.flip = False
+        self.size = (1, 1)
+        self.line_spacing = DEFAULT_LINE_SPACING
+        self.encoding = _encoding(self.code_pages.get(0))
+        self.barcode_height = 162
+        self.barcode_width = 3
+        self.barcode_hri = 0
+        self._line = []
+        self._line_align = 0
+        self._line_used = 0
+        self._graphics = None
+
+    # Parsing
+
+    def run(self, data: bytes) -> list[Block]:
+        """Emulate printing a whole stream; return what was printed."""
+        self._data = data
+        self._block_start = 0
+        i = 0
+        n = len(data)
+        while i < n:
+            byte = data[i]
+            if byte == ESC and i + 1 < n:
+                i = self._esc(data, i)
+            elif byte == GS and i + 1 < n:
+                i = self._gs(data, i)
+            elif byte == LF:
+                i += 1
+                self._newline(i)
+            elif byte < 0x20:
+                # Other control characters (e.g. CR) don't print
+                i += 1
+            else:
+                end = i
+                while end < n and data[end] >= 0x20:
+                    end += 1
+                self._text(data[i:end].decode(self.encoding, "replace"), end)
+                i = end
+        if self._line:
+            self._newline(n)
+        if self.blocks and self._block_start < n:
+            # Trailing commands that didn't print anything
+            self.blocks[-1].end = n
+        return self.blocks
+
+    def _unknown(self, command: bytes) -> None:
+        self.unknown[command] = self.unknown.get(command, 0) + 1
+
+    def _esc(self, data: bytes, i: int) -> int:
+        command = data[i + 1]
+        arg = data[i + 2] if i + 2 < len(data) else 0
+        if command == ord("@"):
+            self._reset()
+            return i + 2
+        if command == ord("!"):
+            self.font = arg & 1
+            self.bold = bool(arg & 0x08)
+            self.size = (2 if arg & 0x20 else 1, 2 if arg & 0x10 else 1)
+            self.underline = 1 if arg & 0x80 else 0
+        elif command == ord("E"):
+            self.bold = bool(arg & 1)
+        elif command == ord("-"):
+            self.underline = arg % 48 if arg >= 48 else arg
+        elif command == ord("M"):
+            self.font = (arg % 48 if arg >= 48 else arg) & 1
+        elif command == ord("a"):
+            self.align = arg % 48 if arg >= 48 else arg
+        elif command == ord("{"):
+            self.flip = bool(arg & 1)
+        elif command == ord("t"):
+            self.encoding = _encoding(self.code_pages.get(arg))
+        elif command == ord("2"):
+            self.line_spacing = DEFAULT_LINE_SPACING
+            return i + 2
+        elif command == ord("3"):
+            self.line_spacing = arg
+        elif command == ord("d"):
+            end = i + 3
+            if self._line:
+                self._newline(end)
+            self._feed(self.line_spacing * arg, end)
+        elif command == ord("J"):
+            end = i + 3
+            if self._line:
+                self._newline(end)
+            self._feed(arg, end)
+        elif command == ord("*"):
+            return self._column_image(data, i)
+        elif command in (ord("G"), ord("V"), ord("R")):
+            pass
+        else:
+            self._unknown(bytes((ESC, command)))
+            return i + 2
+        return i + 3
+
+    def _gs(self, data: bytes, i: int) -> int:
+        command = data[i + 1]
+        arg = data[i + 2] if i + 2 < len(data) else 0
+        if command == ord("!"):
+            self.size = ((arg >> 4) + 1, (arg & 0x0F) + 1)
+        elif command == ord("B"):
+            self.invert = bool(arg & 1)
+        elif command == ord("h"):
+            self.barcode_height = arg
+        elif command == ord("w"):
+            self.barcode_width = arg
+        elif command == ord("H"):
+            self.barcode_hri = arg % 48 if arg >= 48 else arg
+        elif command in (ord("b"), ord("f"), ord("|")):
+            pass
+        elif command == ord("v"):
+            return self._raster_image(data, i)
+        elif command == ord("(") and arg == ord("L"):
+            return self._graphics_command(data, i)
+        elif command == ord("k"):
+            return self._barcode(data, i)
+        elif command == ord("V"):
+            # Cut; function B has a feed amount after it
+            return i + (4 if arg in (65, 66, 97, 98, 103, 104) else 3)
+        else:
+            self._unknown(bytes((GS, command)))
+            return i + 2
+        return i + 3
+
+    # Text
+
+    def _text(self, text: str, end: int) -> None:
+        cell_width = FONT_SIZES[self.font][0] * self.size[0]
+        for char in text:
+            if self._line_used + cell_width > self.width:
+                # The printer wraps text that doesn't fit on the line
+                self._newline(end)
+            if not self._line:
+                self._line_align = self.align
+            self._line.append((
+                char, self.font, self.size, self.bold, self.underline,
+                self.invert,
+            ))
+            self._line_used += cell_width
+
+    def _newline(self, end: int) -> None:
+        """Print the current line (or feed a blank one)."""
+        line, self._line, self._line_used = self._line, [], 0
+        if not line:
+            self._feed(self.line_spacing, end)
+            return
+
+        height = max(
+            FONT_SIZES[font][1] * size[1]
+            for _, font, size, *_ in line
+        )
+        img = Image.new("L", (self.width, max(height, self.line_spacing)), 255)
+        used = sum(FONT_SIZES[font][0] * size[0] for _, font, size, *_ in line)
+        x = (0, (self.width - used) // 2, self.width - used)[min(self._line_align, 2)]
+        for char, font, size, bold, underline, invert in line:
+            width, char_height = FONT_SIZES[font]
+            cell = _glyph(char, width, char_height, bold)
+            if underline:
+                cell = cell.copy()
+                ImageDraw.Draw(cell).rectangle(
+                    (0, char_height - underline, width, char_height), fill=0,
+                )
+            if invert:
+                cell = cell.point(lambda v: 255 - v)
+            cell = cell.resize((width * size[0], char_height * size[1]))
+            # Characters share a baseline at the bottom of the line
+            img.paste(cell, (x, height - cell.height))
+            x += cell.width
+        if self.flip:
+            img = img.rotate(180)
+        text = "".join(char for char, *_ in line).strip()
+        self._add("text", text, end, img.height, image=img)
+
+    def _feed(self, dots: int, end: int) -> None:
+        if dots:
+            self._add("feed", "", end, dots)
+
+    # Images
+
+    def _place(self, img: Image.Image) -> Image.Image:
+        """Put an image on a full-width strip of paper, aligned."""
+        if img.width >= self.width:
+            return img.crop((0, 0, self.width, img.height))
+        strip = Image.new("L", (self.width, img.height), 255)
+        x = (0, (self.width - img.width) // 2, self.width - img.width)[min(self.align, 2)]
+        strip.paste(img, (x, 0))
+        return strip
+
+    @staticmethod
+    def _dots_image(width: int, height: int, data: bytes) -> Image.Image:
+        """Make an image out of rows of dots, 8 per byte, MSB first."""
+        img = Image.frombytes("1", (width, height), bytes(data))
+        # NOTE A set bit is a black dot on paper, but white in PIL.
+        return img.convert("L").point(lambda v: 255 - v)
+
+    def _raster_image(self, data: bytes, i: int) -> int:
+        # GS v 0 m xL xH yL yH d1...dk
+        header = data[i + 3:i + 8]
+        if len(header) < 5:
+            return len(data)
+        m, xl, xh, yl, yh = header
+        width_bytes = xl + xh * 256
+        height = yl + yh * 256
+        end = i + 8 + width_bytes * height
+        img = self._dots_image(width_bytes * 8, height, data[i + 8:end])
+        scale_x = 2 if m & 1 else 1
+        scale_y = 2 if m & 2 else 1
+        if (scale_x, scale_y) != (1, 1):
+            img = img.resize(
+                (img.width * scale_x, img.height * scale_y), Image.NEAREST,
+            )
+        if self._line:
+            self._newline(i)
+        self._add(
+            "image", f"image {img.width}x{img.height}", end, img.height,
+            raster_lines=height, image=self._place(img),
+        )
+        return end
+
+    def _graphics_command(self, data: bytes, i: int) -> int:
+        # GS ( L pL pH m fn [parameters]
+        if i + 7 > len(data):
+            return len(data)
+        length = data[i + 3] + data[i + 4] * 256
+        end = i + 5 + length
+        payload = data[i + 5:end]
+        fn = payload[1] if len(payload) > 1 else None
+        if fn in (ord("p"), 112) and len(payload) >= 10:
+            # a bx by c xL xH yL yH d1...dk
+            _, _, _, bx, by, _, xl, xh, yl, yh = payload[:10]
+            width = xl + xh * 256
+            height = yl + yh * 256
+            img = self._dots_image(
+                (width + 7) // 8 * 8, height, payload[10:],
+            ).crop((0, 0, width, height))
+            self._graphics = (
+                img.resize((width * bx, height * by), Image.NEAREST), height,
+            )
+        elif fn in (ord("2"), 50) and self._graphics is not None:
+            img, height = self._graphics
+            if self._line:
+                self._newline(i)
+            self._add(
+                "image", f"image {img.width}x{img.height}", end, img.height,
+                raster_lines=height, image=self._place(img),
+            )
+        return end
+
+    def _column_image(self, data: bytes, i: int) -> int:
+        # ESC * m nL nH d1...dk; prints as part of the current line
+        m = data[i + 2]
+        columns = data[i + 3] + data[i + 4] * 256
+        band = 24 if m in (32, 33) else 8
+        end = i + 5 + columns * band // 8
+        img = self._dots_image(band, columns, data[i + 5:end])
+        img = img.transpose(Image.TRANSPOSE)
+        if m in (0, 32):
+            # Single density dots are twice as wide
+            img = img.resize((columns * 2, band), Image.NEAREST)
+        if self._line:
+            self._newline(i)
+        # NOTE python-escpos follows every band with a line feed, which
+        # advances by the band itself rather than the line spacing.
+        self._add(
+            "image", f"image {img.width}x{band} (columns)", end, band,
+            raster_lines=band, image=self._place(img),
+        )
+        if end < len(data) and data[end] == LF:
+            end += 1
+            self._block_start = end
+        return end
+
+    def _barcode(self, data: bytes, i: int) -> int:
+        m = data[i + 2]
+        if m <= 6:
+            terminator = data.find(b"\x00", i + 3)
+            if terminator == -1:
+                terminator = len(data)
+            code = data[i + 3:terminator]
+            end = terminator + 1
+        else:
+            length = data[i + 3]
+            code = data[i + 4:i + 4 + length]
+            end = i + 4 + length
+        code = code.decode("ascii", "replace")
+        if self._line:
+            self._newline(i)
+
+        # NOTE This doesn't encode the barcode; it just draws something
+        # the same size as it.
+        width = min(self.width, self.barcode_width * (11 * len(code) + 35))
+        hri_height = FONT_SIZES[0][1]
+        above = hri_height if self.barcode_hri in (1, 3) else 0
+        below = hri_height if self.barcode_hri in (2, 3) else 0
+        img = Image.new("L", (width, above + self.barcode_height + below), 255)
+        draw = ImageDraw.Draw(img)
+        for x in range(0, width, self.barcode_width * 2):
+            draw.rectangle(
+                (x, above, x + self.barcode_width - 1,
+                 above + self.barcode_height - 1),
+                fill=0,
+            )
+        font = _preview_font(hri_height * 3 // 4)
+        for y in ((0,) if above else ()) + ((above + self.barcode_height,) if below else ()):
+            draw.text((width // 2, y), code, fill=0, font=font, anchor="mt")
+        self._add(
+            "barcode", f"barcode {code}", end, img.height,
+            image=self._place(img),
+        )
+        return end
+
+    def _add(
+        self,
+        kind: str,
+        label: str,
+        end: int,
+        dots: int,
+        raster_lines: int = 0,
+        image: Optional[Image.Image] = None,
+    ) -> None:
+        self.blocks.append(Block(
+            kind, label, self._block_start, end, dots,
+            raster_lines=raster_lines, image=image,
+        ))
+        self._block_start = end
+
+    # Results
+
+    def sections(self) -> list[SectionProfile]:
+        """Group the printed blocks into sections, and profile each one.
+
+        A section is a run of text (with the blank lines in it), an
+        image, or a barcode.
+        """
+        sections = []
+        for block in self.blocks:
+            kind = "text" if block.kind == "feed" else block.kind
+            n_bytes = block.end - block.start
+            mm = block.dots / self.dots_per_mm
+            seconds = self.speed.seconds(block.kind, mm, n_bytes)
+            if sections and sections[-1].kind == kind and kind != "barcode" and (
+                kind == "text" or block.label.endswith("(columns)")
+            ):
+                section = sections[-1]
+                section.bytes += n_bytes
+                section.raster_lines += block.raster_lines
+                section.mm += mm
+                section.seconds += seconds
+                if not section.label:
+                    section.label = block.label
+                continue
+            sections.append(SectionProfile(
+                kind, block.label, n_bytes, block.raster_lines, mm, seconds,
+            ))
+        return sections
+
+    def render(self) -> Image.Image:
+        """Draw everything printed, on one long strip of paper."""
+        height = sum(block.dots for block in self.blocks)
+        paper = Image.new("L", (self.width, max(height, 1)), 255)
+        y = 0
+        for block in self.blocks:
+            if block.image is not None:
+                paper.paste(block.image, (0, y))
+            y += block.dots
+        return paper
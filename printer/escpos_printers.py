@@ -0,0 +1,12 @@
+"""python-escpos's own printer classes, with software columns."""
+from escpos.printer import Dummy as EscposDummy, File as EscposFile
+
+from printer.escpos_with_software_columns import EscposWithSoftwareColumns
+
+
+class File(EscposFile, EscposWithSoftwareColumns):
+    """Printer that writes everything to a file."""
+
+
+class Dummy(EscposDummy, EscposWithSoftwareColumns):
+    """Printer that keeps everything in memory (see Dummy.output)."""
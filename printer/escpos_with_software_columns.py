@@ -1,16 +1,79 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import textwrap
-from typing import Literal, Union
+from typing import (
+    TYPE_CHECKING, Any, Callable, Iterable, Literal, Optional, Union,
+)
 
+from escpos.constants import ESC, GS, TXT_STYLE
 from escpos.escpos import Escpos
+from escpos.exceptions import ImageWidthError
+from PIL import Image
+
+from printer import instrumentation
+from printer.raster_cache import RasterCache, cache_key
+
+if TYPE_CHECKING:
+    from printer import raster
 
 
 # HACK This code is mostly taken directly from the python-escpos GitHub.
 # For some reason, software_columns isn't in the version of this library
 # on PyPI yet, even though it's in the GitHub and documentation.
 Alignment = Union[Literal["center", "left", "right"], str]
+_ALIGN_FORMATS = {"center": "^", "left": "<", "right": ">"}
+
+# Text state after ESC @ (initialize printer)
+_INIT_TEXT_STATE = {
+    "size": "normal", "flip": False, "smooth": False, "bold": False,
+    "underline": 0, "font": 0, "align": "left", "invert": False,
+}
+# Order in which Escpos.set() sends each part of the text state
+_TEXT_STATE_ORDER = (
+    "flip", "smooth", "bold", "underline", "font", "align", "density", "invert",
+)
+
+
+# Image encodings, which are also the profile features they need
+_IMAGE_IMPLS = ("bitImageRaster", "graphics", "bitImageColumn")
+# Fewest blank rows in an image worth turning into a paper feed
+_MIN_FEED_ROWS = 4
+
+
+@dataclass
+class ImageReport:
+    """What image() sent for an image, compared to a plain raster image."""
+    width: int
+    height: int
+    impl: str
+    plain_bytes: int
+    bytes_sent: int = 0
+    rows_fed: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.plain_bytes - self.bytes_sent
+
+
+@dataclass
+class DocumentStats:
+    bytes_buffered: int = 0
+    style_bytes_saved: int = 0
+    flushes: int = 0
+    images: list[ImageReport] = field(default_factory=list)
+
+    @property
+    def image_bytes_saved(self) -> int:
+        return sum(image.bytes_saved for image in self.images)
 
 
 class EscposWithSoftwareColumns(Escpos):
+    # While in document mode: everything waiting to be sent, and the text
+    # state the printer will be in once it's sent (missing keys are
+    # unknown)
+    _document: Optional[bytearray] = None
+    _text_state: Optional[dict] = None
+
     @staticmethod
     def _padding(
         text: str,
@@ -52,48 +115,24 @@ class EscposWithSoftwareColumns(Escpos):
                 yield iterable[-1]
             i += 1
 
-    def _rearrange_into_cols(self, text_list: list, widths: list[int], break_long_words: bool = False) -> list:
-        """Wrap and convert a list of strings into an array of text columns.
+    def text(self, txt: str) -> None:
+        """Print alpha-numeric text.
 
-        Set the width of each column by passing a list of widths.
-        Wrap if possible and|or truncate strings longer than its column width.
-        Reorder the wrapped items into an array of text columns.
+        This works like Escpos.text(), but skips the (slow) per-character
+        code page search for plain ASCII text, which encodes the same way
+        in every code page.
         """
-        n_cols = len(text_list)
-        wrapped = [
-            # HACK I'm replacing the normal textwrap with a better one
-            # that respects newlines.
-            "\n".join(
-                "\n".join(
-                    textwrap.wrap(
-                        line, widths[i], break_long_words=break_long_words,
-                    )
-                )
-                for line in text.splitlines()
-                if line.strip()
-            ).splitlines()
-            for i, text in enumerate(text_list)
-        ]
-        max_len = max(*[len(text_group) for text_group in wrapped])
-        text_colums = []
-        for i in range(max_len):
-            row = ["" for _ in range(n_cols)]
-            for j, item in enumerate(wrapped):
-                if i in range(len(item)):
-                    row[j] = self._truncate(item[i], widths[j])
-            text_colums.append(row)
-        return text_colums
-
-    def _add_padding_into_cols(
-        self,
-        text_list: list[str],
-        widths: list[int],
-        align: list[Alignment],
-    ) -> list:
-        """Add padding, width and alignment into the items of a list of strings."""
-        return [
-            self._padding(text, widths[i], align[i]) for i, text in enumerate(text_list)
-        ]
+        txt = str(txt)
+        magic = self.magic
+        if not txt.isascii() or magic.disabled:
+            magic.write(txt)
+            return
+        if magic.encoding is None:
+            # Let MagicEncode pick the first code page
+            magic.write(txt[:1])
+            txt = txt[1:]
+        if txt:
+            self._raw(txt.encode("ascii"))
 
     def software_columns(
         self,
@@ -116,17 +155,646 @@ class EscposWithSoftwareColumns(Escpos):
             If the list of alignment items is shorter than the list of strings then
             the last alignment of the list will be applied till the last string (column).
         """
-        n_cols = len(text_list)
+        layout = TableLayout(
+            widths, align,
+            n_cols=len(text_list), break_long_words=break_long_words,
+        )
+        self.table(layout, [text_list])
+
+    def table(
+        self,
+        layout: "TableLayout",
+        rows: Iterable[list],
+        separator: Optional[str] = None,
+    ) -> None:
+        """Print rows of strings arranged in columns, as one write.
+
+        :param layout: the column layout, made once for the whole table.
+        :param rows: lists of strings, one string per column.
+        :param separator: line printed after every row, if any.
+        """
+        self.text(layout.render(rows, separator=separator))
+
+    @instrumentation.timed("encode", "image")
+    def image(
+        self,
+        img_source,
+        high_density_vertical: bool = True,
+        high_density_horizontal: bool = True,
+        impl: str = "bitImageRaster",
+        fragment_height: int = 960,
+        center: bool = False,
+        dither: Optional["raster.Dither"] = None,
+        gamma: float = 1.0,
+        contrast: float = 1.0,
+        compact: bool = True,
+    ) -> None:
+        """Print an image.
+
+        This works like Escpos.image(), but if NumPy is available, raster
+        images are converted with the (much faster) engine in
+        printer.raster. With compact=False and none of the other extra
+        options, the output is the same as Escpos.image()'s.
+
+        :param dither: dithering mode; one of "threshold", "bayer" or
+            "floyd-steinberg" *default:* "floyd-steinberg"
+        :param gamma: gamma adjustment; above 1 darkens midtones
+        :param contrast: contrast adjustment; above 1 adds contrast
+        :param compact: send as few bytes as possible; see
+            _image_compact()
+        """
+        # NOTE Importing NumPy takes a while, so it waits until an image
+        # is printed.
+        from printer import raster
+
+        fast_path = raster.is_usable() and (
+            compact or impl in ("bitImageRaster", "graphics")
+        )
+        if not fast_path:
+            if dither is not None or gamma != 1.0 or contrast != 1.0:
+                raise ValueError(
+                    "Dithering, gamma and contrast options need NumPy, "
+                    "and the bitImageRaster or graphics impl."
+                )
+            super().image(
+                img_source,
+                high_density_vertical=high_density_vertical,
+                high_density_horizontal=high_density_horizontal,
+                impl=impl,
+                fragment_height=fragment_height,
+                center=center,
+            )
+            return
+
+        im = raster.rasterize(
+            img_source,
+            dither_mode=dither or "floyd-steinberg",
+            gamma=gamma,
+            contrast=contrast,
+        )
+        try:
+            max_width = int(self.profile.profile_data["media"]["width"]["pixels"])
+        except (KeyError, ValueError):
+            # If the printer's pixel width is not known, print anyways...
+            max_width = None
+        if max_width is not None:
+            if im.width > max_width:
+                raise ImageWidthError(f"{im.width} > {max_width}")
+            if center:
+                im = im.center(max_width)
+
+        if compact:
+            with instrumentation.span("encode", "compact image") as span:
+                report = self._image_compact(
+                    im, max_width,
+                    high_density_vertical=high_density_vertical,
+                    high_density_horizontal=high_density_horizontal,
+                    impl=impl,
+                    fragment_height=fragment_height,
+                )
+                if span is not None:
+                    span.bytes = report.bytes_sent
+                    span.attrs.update(
+                        impl=report.impl, bytes_saved=report.bytes_saved,
+                    )
+            if self._text_state is not None:
+                self.document_stats.images.append(report)
+            return
+
+        for fragment in im.split(fragment_height):
+            self._image_raster(
+                fragment,
+                high_density_vertical=high_density_vertical,
+                high_density_horizontal=high_density_horizontal,
+                impl=impl,
+            )
+
+    def _image_impls(self, impl: str) -> list[str]:
+        """Get the image encodings this printer can use (impl first)."""
+        impls = [impl]
+        for other in _IMAGE_IMPLS:
+            if other != impl and self.profile.supports(other):
+                impls.append(other)
+        return impls
+
+    @staticmethod
+    def _image_size(
+        impl: str,
+        width: int,
+        height: int,
+        fragment_height: int = 960,
+        high_density_vertical: bool = True,
+    ) -> Optional[int]:
+        """Count the bytes _image_raster() sends for an image this big.
+
+        Returns None if the encoding can't hold an image this big.
+        """
+        if impl == "bitImageColumn":
+            band = 24 if high_density_vertical else 8
+            # ESC 3 and ESC 2 around the bands, each with a line feed
+            return 5 + -(-height // band) * (6 + width * band // 8)
+        fragments = -(-height // fragment_height)
+        data = ((width + 7) >> 3) * height
+        if impl == "bitImageRaster":
+            return 8 * fragments + data
+        # GS ( L, to store and then print each fragment
+        largest = ((width + 7) >> 3) * min(height, fragment_height)
+        if largest + 10 + 2 > 0xFFFF:
+            return None
+        return 22 * fragments + data
+
+    def _image_compact(
+        self,
+        im: "raster.Raster",
+        max_width: Optional[int],
+        high_density_vertical: bool = True,
+        high_density_horizontal: bool = True,
+        impl: str = "bitImageRaster",
+        fragment_height: int = 960,
+    ) -> ImageReport:
+        """Print an image in as few bytes as possible.
+
+        Runs of blank rows become paper feeds, and what's left is split
+        into bands of rows with dots in them. In document mode (where
+        the alignment is known), the blank margins of full-width bands
+        are cropped off, and the band is left, right or center aligned
+        so it prints in the same place (and the alignment is put back
+        afterwards). Then each band is sent with whichever of the
+        profile's image encodings is smallest.
+        """
+        # Dots of paper per row of the image
+        row_dots = 1 if high_density_vertical else 2
+        impls = self._image_impls(impl)
+        crop = (
+            self._text_state is not None
+            and high_density_horizontal
+            and max_width is not None
+            and max_width % 8 == 0
+            and im.width == max_width
+        )
+        report = ImageReport(
+            im.width, im.height, impl,
+            plain_bytes=self._image_size(
+                "bitImageRaster", im.width, im.height, fragment_height,
+            ),
+        )
+
+        # A band only ends at a gap that costs more to send than a new
+        # image header and a feed
+        min_gap = max(_MIN_FEED_ROWS, -(-(8 + 3) // im.width_bytes))
+        align = None
+        with self._capture(send=True) as sent:
+            row = 0
+            for top, bottom in im.ink_bands(min_gap):
+                self._feed_dots((top - row) * row_dots)
+                report.rows_fed += top - row
+                row = bottom
+
+                band = im.crop(top, bottom, 0, im.width)
+                if crop:
+                    band, band_align = self._crop_band(band, max_width)
+                    # NOTE Full-width bands print the same with any
+                    # alignment.
+                    if band.width < max_width and band_align != align:
+                        self._raw(TXT_STYLE["align"][band_align])
+                        align = band_align
+                sizes = {
+                    name: self._image_size(
+                        name, band.width, band.height, fragment_height,
+                        high_density_vertical,
+                    )
+                    for name in impls
+                }
+                best = min(
+                    (name for name in impls if sizes[name] is not None),
+                    key=sizes.get,
+                    default=impl,
+                )
+                report.impl = best
+                fragments = (
+                    [band] if best == "bitImageColumn"
+                    else band.split(fragment_height)
+                )
+                for fragment in fragments:
+                    self._image_raster(
+                        fragment,
+                        high_density_vertical=high_density_vertical,
+                        high_density_horizontal=high_density_horizontal,
+                        impl=best,
+                    )
+            self._feed_dots((im.height - row) * row_dots)
+            report.rows_fed += im.height - row
+
+            if align is not None:
+                previous = self._text_state.get("align")
+                if previous is None:
+                    self._text_state["align"] = align
+                elif previous != align:
+                    self._raw(TXT_STYLE["align"][previous])
+        report.bytes_sent = len(sent)
+        return report
+
+    @staticmethod
+    def _crop_band(
+        band: "raster.Raster",
+        width: int,
+    ) -> tuple["raster.Raster", str]:
+        """Crop a full-width band's margins, keeping where it prints.
+
+        Returns the cropped band, and the alignment to print it with.
+        Crops are whole bytes wide (and centered crops are the same on
+        both sides), so the band lines up the same with any encoding.
+        """
+        left, right = band.ink_columns()
+        margin = min(left, width - right) // 4 * 4
+        crops = {
+            "left": (0, -(-right // 8) * 8),
+            "center": (margin, width - margin),
+            "right": (left // 8 * 8, width),
+        }
+        band_align = min(crops, key=lambda a: crops[a][1] - crops[a][0])
+        left, right = crops[band_align]
+        return band.crop(0, band.height, left, right), band_align
 
+    def _feed_dots(self, dots: int) -> None:
+        # NOTE This assumes the vertical motion unit is one dot, as it is
+        # by default on 203 DPI printers.
+        while dots > 0:
+            self._raw(ESC + b"J" + bytes((min(dots, 255),)))
+            dots -= 255
+
+    def _image_raster(
+        self,
+        im: "raster.Raster",
+        high_density_vertical: bool = True,
+        high_density_horizontal: bool = True,
+        impl: str = "bitImageRaster",
+    ) -> None:
+        if impl == "bitImageColumn":
+            # ESC *, column format bit image
+            density_byte = (1 if high_density_horizontal else 0) + (
+                32 if high_density_vertical else 0
+            )
+            header = ESC + b"*" + bytes((density_byte,)) + self._int_low_high(im.width, 2)
+            band_height = 24 if high_density_vertical else 8
+            self._raw(
+                ESC + b"3" + bytes((16,))
+                + b"".join(
+                    header + blob + b"\n"
+                    for blob in im.to_column_format(band_height)
+                )
+                + ESC + b"2"
+            )
+        elif impl == "bitImageRaster":
+            # GS v 0, raster format bit image
+            density_byte = (0 if high_density_horizontal else 1) + (
+                0 if high_density_vertical else 2
+            )
+            header = (
+                GS
+                + b"v0"
+                + bytes((density_byte,))
+                + self._int_low_high(im.width_bytes, 2)
+                + self._int_low_high(im.height, 2)
+            )
+            self._raw(header + im.to_raster_format())
+        elif impl == "graphics":
+            # GS ( L raster format graphics
+            img_header = self._int_low_high(im.width, 2) + self._int_low_high(
+                im.height, 2
+            )
+            tone = b"0"
+            colors = b"1"
+            ym = b"\x01" if high_density_vertical else b"\x02"
+            xm = b"\x01" if high_density_horizontal else b"\x02"
+            header = tone + xm + ym + colors + img_header
+            self._image_send_graphics_data(
+                b"0", b"p", header + im.to_raster_format()
+            )
+            self._image_send_graphics_data(b"0", b"2", b"")
+
+    def cached_image(
+        self,
+        img_source: Union[Image.Image, str, Callable[[], Image.Image]],
+        cache: Optional[RasterCache],
+        key: Any,
+        **kwargs,
+    ) -> None:
+        """Print an image, reusing its ESC/POS bytes from a cache if possible.
+
+        :param img_source: image to print, or a function returning the
+            image (which is only called if the image isn't cached).
+        :param cache: cache of image bytes; if None, just print the image.
+        :param key: identifies the image source (e.g. a hash of the
+            source file), and anything else affecting how it looks.
+            The printer profile and image options are added to it.
+        :param kwargs: passed to image().
+        """
+        if cache is not None:
+            key = cache_key(
+                key,
+                self.profile.profile_data.get("name"),
+                self.profile.profile_data.get("media"),
+                sorted(kwargs.items()),
+                # Images are only cropped in document mode, and then put
+                # the alignment back (if it's known)
+                None if self._text_state is None
+                else self._text_state.get("align", "unknown"),
+            )
+            data = cache.get(key)
+            if data is not None:
+                self._raw(data)
+                return
+
+        if callable(img_source):
+            img_source = img_source()
+        if cache is None:
+            self.image(img_source, **kwargs)
+            return
+
+        # Capture what image() sends, so it can be cached
+        with self._capture() as buffer:
+            self.image(img_source, **kwargs)
+        data = bytes(buffer)
+        cache.put(key, data)
+        self._raw(data)
+
+    @contextmanager
+    def _capture(self, send: bool = False):
+        """Collect everything sent with _raw() instead of sending it.
+
+        If send is True, everything is still sent as well.
+        """
+        buffer = bytearray()
+        previous = self.__dict__.get("_raw")
+        if send:
+            write = self._raw
+
+            def tee(msg: bytes) -> None:
+                buffer.extend(msg)
+                write(msg)
+            self._raw = tee
+        else:
+            self._raw = buffer.extend
+        try:
+            yield buffer
+        finally:
+            if previous is None:
+                del self._raw
+            else:
+                self._raw = previous
+
+    def begin_document(self, max_buffer: Optional[int] = None) -> None:
+        """Start buffering everything printed, until end_document().
+
+        While buffering, the printer's text state is tracked, and set()
+        only sends the parts of it that actually change.
+
+        :param max_buffer: if given, send the buffer whenever it gets
+            this big, instead of all at once at the end.
+        """
+        if self._document is not None:
+            return
+        self._document = bytearray()
+        self._document_max_buffer = max_buffer
+        self._text_state = {}
+        self.document_stats = DocumentStats()
+        self._raw = self._document_write
+
+    def _document_write(self, msg: bytes) -> None:
+        if instrumentation.enabled:
+            instrumentation.count_command(msg)
+        self._document += msg
+        self.document_stats.bytes_buffered += len(msg)
+        if (
+            self._document_max_buffer
+            and len(self._document) >= self._document_max_buffer
+        ):
+            self._flush_document()
+
+    def _flush_document(self) -> None:
+        if not self._document:
+            return
+        # Bypass the buffering _raw to reach the real printer
+        with instrumentation.span("transmit", type(self).__name__) as span:
+            if span is not None:
+                span.bytes = len(self._document)
+            type(self)._raw(self, bytes(self._document))
+        self._document.clear()
+        self.document_stats.flushes += 1
+
+    def end_document(self) -> None:
+        """Send everything buffered since begin_document(), and stop buffering."""
+        if self._document is None:
+            return
+        self.__dict__.pop("_raw", None)
+        self._flush_document()
+        self._document = None
+        self._text_state = None
+
+    @contextmanager
+    def document(self, max_buffer: Optional[int] = None):
+        """Buffer everything printed in a with block; see begin_document()."""
+        self.begin_document(max_buffer=max_buffer)
+        try:
+            yield self
+        finally:
+            self.end_document()
+
+    @contextmanager
+    def record(self):
+        """Keep a copy of everything printed in a with block.
+
+        Everything is still sent as usual; the copy is the bytearray
+        yielded, and is complete once the block ends.
+        """
+        with self._capture(send=True) as buffer:
+            yield buffer
+
+    def hw(self, hw: str) -> None:
+        super().hw(hw)
+        if hw.upper() == "INIT" and not self.magic.disabled:
+            # Initializing also resets the code page
+            self.magic.encoding = None
+        if self._text_state is not None:
+            self._text_state.clear()
+            if hw.upper() == "INIT":
+                self._text_state.update(_INIT_TEXT_STATE)
+
+    def barcode(self, *args, **kwargs) -> None:
+        super().barcode(*args, **kwargs)
+        if self._text_state is not None:
+            # Hardware barcodes may center the text
+            self._text_state.pop("align", None)
+
+    def set(
+        self,
+        align: Optional[str] = None,
+        font: Optional[str] = None,
+        bold: Optional[bool] = None,
+        underline: Optional[int] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        density: Optional[int] = None,
+        invert: Optional[bool] = None,
+        smooth: Optional[bool] = None,
+        flip: Optional[bool] = None,
+        normal_textsize: Optional[bool] = None,
+        double_width: Optional[bool] = None,
+        double_height: Optional[bool] = None,
+        custom_size: Optional[bool] = None,
+    ) -> None:
+        """Set text properties by sending them to the printer.
+
+        This works like Escpos.set(), but in document mode, only the
+        properties that are different from the printer's current ones
+        are sent.
+        """
+        args = dict(
+            align=align, font=font, bold=bold, underline=underline,
+            width=width, height=height, density=density, invert=invert,
+            smooth=smooth, flip=flip, normal_textsize=normal_textsize,
+            double_width=double_width, double_height=double_height,
+            custom_size=custom_size,
+        )
+        state = self._text_state
+        if state is None:
+            super().set(**args)
+            return
+
+        with self._capture() as full:
+            super().set(**args)
+        sent = self.document_stats.bytes_buffered
+
+        size = None
+        if custom_size:
+            size = ("custom", width, height)
+        elif double_width and double_height:
+            size = "2x"
+        elif double_width:
+            size = "2w"
+        elif double_height:
+            size = "2h"
+        elif normal_textsize:
+            size = "normal"
+
+        target = {
+            "flip": flip, "smooth": smooth, "bold": bold,
+            "underline": underline,
+            "font": None if font is None else int(self.profile.get_font(font)),
+            "align": align,
+            "density": None if density == 9 else density,
+            "invert": invert,
+        }
+        if size is not None:
+            # NOTE Setting a (non-custom) size sends ESC ! 0, which also
+            # resets bold, underline and font.
+            resets = {} if custom_size else {"bold": False, "underline": 0, "font": 0}
+            for name, value in resets.items():
+                if target[name] is None:
+                    target[name] = value
+            if state.get("size") != size:
+                super().set(
+                    width=width, height=height, custom_size=custom_size,
+                    normal_textsize=normal_textsize,
+                    double_width=double_width, double_height=double_height,
+                )
+                state.update(size=size, **resets)
+
+        for name in _TEXT_STATE_ORDER:
+            value = target[name]
+            if value is None or (name in state and state[name] == value):
+                continue
+            super().set(**{name: value})
+            state[name] = value
+
+        sent = self.document_stats.bytes_buffered - sent
+        self.document_stats.style_bytes_saved += len(full) - sent
+
+
+class TableLayout:
+    """Column layout for printing tables, worked out once per table.
+
+    :param widths: width of each column, or a single total width to
+        split evenly between n_cols columns. If the list is shorter than
+        the number of columns, its last width is repeated.
+    :param align: alignment of each column, or one alignment for all of
+        them. If the list is shorter than the number of columns, its
+        last alignment is repeated.
+    :param n_cols: number of columns; defaults to the number of widths.
+    :param break_long_words: break words longer than their column.
+    """
+
+    def __init__(
+        self,
+        widths: Union[list[int], int],
+        align: Union[list[Alignment], Alignment],
+        n_cols: Optional[int] = None,
+        break_long_words: bool = False,
+    ):
+        if n_cols is None:
+            n_cols = 1 if isinstance(widths, int) else len(widths)
         if isinstance(widths, int):
             widths = [round(widths / n_cols)]
-        widths = list(self._repeat_last(widths, max_iterations=n_cols))
-
         if isinstance(align, str):
             align = [align]
-        align = list(self._repeat_last(align, max_iterations=n_cols))
+        repeat_last = EscposWithSoftwareColumns._repeat_last
+        self.n_cols = n_cols
+        self.widths = list(repeat_last(widths, max_iterations=n_cols))
+        self.align = list(repeat_last(align, max_iterations=n_cols))
+
+        self._wrappers = [
+            textwrap.TextWrapper(width, break_long_words=break_long_words)
+            for width in self.widths
+        ]
+        # One format string pads a whole line of cells at once
+        self._line_format = "".join(
+            "{:" + _ALIGN_FORMATS.get(a.lower(), "") + (
+                str(width) if a.lower() in _ALIGN_FORMATS else ""
+            ) + "}"
+            for a, width in zip(self.align, self.widths)
+        )
+
+    def _wrap(self, col: int, text: str) -> list[str]:
+        # HACK I'm replacing the normal textwrap with a better one
+        # that respects newlines.
+        wrap = self._wrappers[col].wrap
+        width = self.widths[col]
+        lines = []
+        for line in text.splitlines():
+            if line.strip():
+                lines.extend(wrap(line))
+        # Wrapping may leave words longer than the column
+        return [
+            EscposWithSoftwareColumns._truncate(line, width)
+            if len(line) > width else line
+            for line in lines
+        ]
 
-        columns = self._rearrange_into_cols(text_list, widths, break_long_words=break_long_words)
-        for row in columns:
-            padded = self._add_padding_into_cols(row, widths, align)
-            self.textln("".join(padded))
+    def lines(self, text_list: list) -> list[str]:
+        """Lay out one row, which may wrap onto several lines."""
+        cells = [self._wrap(col, text) for col, text in enumerate(text_list)]
+        n_lines = max(len(cell) for cell in cells)
+        if n_lines == 1:
+            return [self._line_format.format(*(cell[0] if cell else "" for cell in cells))]
+        return [
+            self._line_format.format(
+                *(cell[i] if i < len(cell) else "" for cell in cells)
+            )
+            for i in range(n_lines)
+        ]
+
+    def render(
+        self,
+        rows: Iterable[list],
+        separator: Optional[str] = None,
+    ) -> str:
+        """Lay out every row of a table as one string."""
+        out = []
+        for row in rows:
+            out.extend(self.lines(row))
+            if separator is not None:
+                out.append(separator)
+        if not out:
+            return ""
+        return "\n".join(out) + "\n"
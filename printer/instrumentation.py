@@ -0,0 +1,300 @@
+"""Timings of each stage of printing, for finding out where time goes.
+
+Code that does something slow wraps it in span(stage, name), where
+stage is one of STAGES. While instrumentation is disabled (the
+default), span() hands back a shared do-nothing context manager, so the
+hooks cost about as much as a function call.
+
+Set PRINT_METRICS to a file path to turn it on for a whole run; the
+results are exported there (see export()) every EXPORT_INTERVAL seconds
+while spans are finishing, and when Python exits.
+
+Totals are kept as spans finish, so a long-running program (like the
+print daemon) doesn't keep every span; only the last MAX_SPANS spans
+that haven't been exported yet are kept.
+"""
+import atexit
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+import functools
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+STAGES = ("connect", "fetch", "render", "encode", "transmit")
+
+# Command types, by the bytes the command starts with
+COMMAND_TYPES = (
+    (b"\x1dv0", "raster image"),
+    (b"\x1d(L", "graphics"),
+    (b"\x1b*", "column image"),
+    # Escpos.image() sets the line spacing for column images first
+    (b"\x1b3\x10\x1b*", "column image"),
+    (b"\x1dk", "barcode"),
+    (b"\x1bt", "code page"),
+    (b"\x1b@", "initialize"),
+    (b"\x1b", "style"),
+    (b"\x1d", "style"),
+)
+
+# Most finished spans to keep until they're exported
+MAX_SPANS = 10_000
+# Seconds between exports to PRINT_METRICS
+EXPORT_INTERVAL = 60.0
+
+enabled = False
+# Finished spans that haven't been exported yet
+spans: deque["Span"] = deque(maxlen=MAX_SPANS)
+command_bytes: dict[str, int] = defaultdict(int)
+hooks: list[Callable[["Span"], None]] = []
+
+# Totals of every finished span (see stage_totals() and link_rates())
+_stage_totals: dict[str, dict] = {}
+_link_totals = defaultdict(lambda: [0, 0.0])
+_lock = threading.Lock()
+# Spans open right now in each thread, by stage
+# NOTE Spans only nest within a thread; spans of the same stage in other
+# threads are running alongside this one, not inside it.
+_local = threading.local()
+
+_NULL_SPAN = nullcontext()
+
+
+@dataclass
+class Span:
+    stage: str
+    name: str
+    start: float
+    seconds: float = 0.0
+    bytes: int = 0
+    # Whether this is inside another span of the same stage
+    nested: bool = False
+    attrs: dict = field(default_factory=dict)
+
+
+class _SpanContext:
+    def __init__(self, span: Span):
+        self.span = span
+
+    def __enter__(self) -> Span:
+        open_spans = _open_spans()
+        self.span.nested = open_spans[self.span.stage] > 0
+        open_spans[self.span.stage] += 1
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.seconds = time.perf_counter() - self._started
+        _open_spans()[self.span.stage] -= 1
+        _finish(self.span)
+        for hook in hooks:
+            hook(self.span)
+
+
+def _open_spans() -> dict[str, int]:
+    try:
+        return _local.open
+    except AttributeError:
+        _local.open = defaultdict(int)
+        return _local.open
+
+
+def _finish(s: Span) -> None:
+    with _lock:
+        spans.append(s)
+        if s.nested:
+            return
+        total = _stage_totals.setdefault(
+            s.stage, {"count": 0, "seconds": 0.0, "bytes": 0},
+        )
+        total["count"] += 1
+        total["seconds"] += s.seconds
+        total["bytes"] += s.bytes
+        if s.stage == "transmit" and s.bytes:
+            _link_totals[s.name][0] += s.bytes
+            _link_totals[s.name][1] += s.seconds
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    with _lock:
+        spans.clear()
+        _stage_totals.clear()
+        _link_totals.clear()
+    command_bytes.clear()
+
+
+def span(stage: str, name: str = "", **attrs: Any):
+    """Time a with block, as part of a stage.
+
+    The block gets the Span (or None, if disabled), so it can fill in
+    bytes or attrs as it goes.
+    """
+    if not enabled:
+        return _NULL_SPAN
+    return _SpanContext(Span(stage, name, time.time(), attrs=attrs))
+
+
+def timed(stage: str, name: Optional[str] = None):
+    """Decorator version of span()."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with span(stage, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_command(msg: bytes) -> None:
+    """Count the bytes of one command sent to the printer, by type.
+
+    NOTE A write of several commands at once (like a cached section) is
+    counted as the type of its first command.
+    """
+    for prefix, command_type in COMMAND_TYPES:
+        if msg.startswith(prefix):
+            break
+    else:
+        command_type = "text"
+    command_bytes[command_type] += len(msg)
+
+
+def stage_totals() -> dict[str, dict]:
+    """Get the number of spans, seconds and bytes of each stage.
+
+    Spans nested in another span of the same stage (in the same thread)
+    aren't counted, since their time is already part of the outer span's.
+    """
+    with _lock:
+        return {stage: dict(total) for stage, total in _stage_totals.items()}
+
+
+def link_rates() -> dict[str, float]:
+    """Get the bytes per second sent over each transport."""
+    with _lock:
+        return {
+            name: n_bytes / seconds
+            for name, (n_bytes, seconds) in _link_totals.items()
+            if seconds > 0
+        }
+
+
+def export_jsonl(path: str | os.PathLike[str]) -> None:
+    """Append the spans since the last export, then the totals, to a file."""
+    with _lock:
+        finished = list(spans)
+        spans.clear()
+    with open(path, "a") as f:
+        for s in finished:
+            f.write(json.dumps({"type": "span", **asdict(s)}) + "\n")
+        f.write(json.dumps({
+            "type": "summary",
+            "time": time.time(),
+            "stages": stage_totals(),
+            "link_bytes_per_second": link_rates(),
+            "command_bytes": dict(command_bytes),
+        }) + "\n")
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(prefix: str = "receipt_printer") -> str:
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: dict):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples.items():
+            lines.append(f"{prefix}_{name}{{{labels}}} {value}")
+
+    totals = stage_totals()
+    metric(
+        "stage_seconds", "gauge", "Time spent in each stage of printing.",
+        {f'stage="{stage}"': t["seconds"] for stage, t in totals.items()},
+    )
+    metric(
+        "stage_spans", "gauge", "Number of timed spans in each stage.",
+        {f'stage="{stage}"': t["count"] for stage, t in totals.items()},
+    )
+    metric(
+        "stage_bytes", "gauge", "Bytes handled in each stage.",
+        {f'stage="{stage}"': t["bytes"] for stage, t in totals.items()},
+    )
+    metric(
+        "link_bytes_per_second", "gauge",
+        "Throughput of each printer connection.",
+        {f'transport="{_label(name)}"': rate for name, rate in link_rates().items()},
+    )
+    metric(
+        "command_bytes", "gauge", "Bytes sent to the printer, by command type.",
+        {f'type="{_label(name)}"': n for name, n in command_bytes.items()},
+    )
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path: str | os.PathLike[str]) -> None:
+    """Write a textfile for the Prometheus node exporter's collector."""
+    path = pathlib.Path(path)
+    # NOTE The collector may read the file at any time, so it's replaced
+    # all at once.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def export(path: str | os.PathLike[str]) -> None:
+    """Export to a Prometheus textfile (*.prom), or else JSON lines."""
+    if str(path).endswith(".prom"):
+        export_prometheus(path)
+    else:
+        export_jsonl(path)
+
+
+def _export_periodically(path: str | os.PathLike[str]):
+    """Get a hook that exports to path if it hasn't been for a while."""
+    exported = time.monotonic()
+    export_lock = threading.Lock()
+
+    def hook(s: Span) -> None:
+        nonlocal exported
+        # NOTE Spans finish in several threads, but only one of them
+        # needs to export.
+        if not export_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - exported >= EXPORT_INTERVAL:
+                exported = time.monotonic()
+                export(path)
+        finally:
+            export_lock.release()
+    return hook
+
+
+_path = os.getenv("PRINT_METRICS")
+if _path:
+    enable()
+    hooks.append(_export_periodically(_path))
+    atexit.register(export, _path)
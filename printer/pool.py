@@ -0,0 +1,331 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import itertools
+import queue
+import threading
+import time
+from typing import Callable, Literal, Optional
+
+from escpos.capabilities import get_profile
+from escpos.exceptions import DeviceNotFoundError
+
+from printer.escpos_printers import Dummy
+from printer.escpos_with_software_columns import EscposWithSoftwareColumns
+
+
+Strategy = Literal["round-robin", "least-loaded"]
+
+# Errors meaning a printer can't be reached (RuntimeError is raised when
+# the transport isn't supported here at all)
+CONNECT_ERRORS = (DeviceNotFoundError, OSError, RuntimeError)
+
+
+def media_width(profile: str) -> int:
+    return int(get_profile(profile).profile_data["media"]["width"]["pixels"])
+
+
+@dataclass
+class PoolTarget:
+    """A printer in a pool.
+
+    :param connect: makes an (unopened) printer using this profile.
+    """
+    name: str
+    connect: Callable[[], EscposWithSoftwareColumns]
+    profile: str
+
+
+@dataclass
+class TargetStats:
+    jobs: int = 0
+    bytes_sent: int = 0
+    send_time: float = 0.0
+    renders: int = 0
+    failures: int = 0
+
+
+@dataclass
+class PrintJob:
+    """Something to print, on whichever printer it ends up on.
+
+    :param render: prints the job to a printer, laid out for that
+        printer's profile (which it should read from the printer). It's
+        called again for each width of printer the job lands on, so it
+        shouldn't do anything but print.
+    :param data: the job already compiled, for printers data_width
+        pixels wide; if there's no render function, the job can only go
+        to printers of that width.
+    """
+    render: Optional[Callable[[EscposWithSoftwareColumns], None]] = None
+    name: str = ""
+    data: Optional[bytes] = None
+    data_width: Optional[int] = None
+    # Compiled job, by media width
+    _compiled: dict[int, bytes] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        if self.render is None and (self.data is None or self.data_width is None):
+            raise ValueError("A print job needs a render function, or data and its width")
+        if self.data is not None and self.data_width is not None:
+            self._compiled[self.data_width] = self.data
+
+    def can_print(self, width: int) -> bool:
+        return self.render is not None or width in self._compiled
+
+    def compile(self, profile: str) -> tuple[bytes, bool]:
+        """Get the job's bytes for a profile; also, whether it was rendered.
+
+        The job is only rendered again for a printer of a new width.
+        """
+        width = media_width(profile)
+        data = self._compiled.get(width)
+        if data is not None:
+            return data, False
+        if self.render is None:
+            raise ValueError(f"Print job {self.name!r} can't be printed {width}px wide")
+        printer = Dummy(profile=profile)
+        self.render(printer)
+        data = self._compiled[width] = printer.output
+        return data, True
+
+
+class _Worker:
+    """Thread printing one target's jobs over one held-open connection."""
+
+    def __init__(self, pool: "PrinterPool", target: PoolTarget):
+        self.pool = pool
+        self.target = target
+        self.width = media_width(target.profile)
+        self.stats = TargetStats()
+        self.queue = queue.Queue()
+        # Jobs queued or printing
+        self.outstanding = 0
+
+        self.healthy = True
+        self.retry_at = 0.0
+        self._backoff = pool.min_backoff
+        self._printer = None
+
+        self.thread = threading.Thread(
+            target=self._run, name=f"printer-pool-{target.name}", daemon=True,
+        )
+        self.thread.start()
+
+    def available(self, now: float) -> bool:
+        """Whether this target should get jobs (possibly to test it)."""
+        return self.healthy or now >= self.retry_at
+
+    def _mark_down(self, e: Exception):
+        print(f"Printer {self.target.name} unavailable; retrying in {self._backoff}s")
+        print(e)
+        self.stats.failures += 1
+        self.healthy = False
+        self.retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.pool.max_backoff)
+        # NOTE The job goes to another printer instead, so the rest of it
+        # mustn't be sent here when the printer is closed (which may
+        # reconnect to finish sending, like Bluetooth does).
+        if hasattr(self._printer, "discard"):
+            self._printer.discard()
+        self.close()
+
+    def _mark_up(self):
+        if not self.healthy:
+            print(f"Printer {self.target.name} is back")
+        self.healthy = True
+        self._backoff = self.pool.min_backoff
+
+    def connect(self) -> EscposWithSoftwareColumns:
+        if self._printer is None:
+            printer = self.target.connect()
+            printer.open()
+            self._printer = printer
+        return self._printer
+
+    def close(self):
+        printer, self._printer = self._printer, None
+        if printer is None:
+            return
+        try:
+            printer.close()
+        except CONNECT_ERRORS:
+            pass
+
+    def check(self, force: bool = False):
+        """Reconnect to the printer if it's down, and due for a retry.
+
+        If force is True, try now, even if it isn't due yet.
+        """
+        if self.healthy or not (force or self.available(time.monotonic())):
+            return
+        try:
+            self.connect()
+        except CONNECT_ERRORS as e:
+            self._mark_down(e)
+        else:
+            self._mark_up()
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                # Use idle time to bring the printer back up
+                self.check()
+                continue
+            if item is None:
+                self.close()
+                return
+            job, future, tried = item
+            if job is None:
+                # Health check (see PrinterPool.check_health())
+                self.check(force=True)
+                future.set_result(self.healthy)
+                continue
+            try:
+                self._print(job, future, tried)
+            finally:
+                with self.pool._lock:
+                    self.outstanding -= 1
+
+    def _print(self, job: PrintJob, future: Future, tried: set[str]):
+        if not self.available(time.monotonic()):
+            # Went down after this job was queued
+            self.pool._failover(job, future, tried)
+            return
+        try:
+            data, rendered = job.compile(self.target.profile)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self.stats.renders += rendered
+
+        started = time.perf_counter()
+        try:
+            printer = self.connect()
+            printer._raw(data)
+            if hasattr(printer, "flush"):
+                printer.flush()
+        except CONNECT_ERRORS as e:
+            self._mark_down(e)
+            self.pool._failover(job, future, tried)
+            return
+        self._mark_up()
+        self.stats.jobs += 1
+        self.stats.bytes_sent += len(data)
+        self.stats.send_time += time.perf_counter() - started
+        future.set_result(self.target.name)
+
+
+class PrinterPool:
+    """Spread print jobs across several printers.
+
+    Each printer gets its own thread and connection, so jobs print in
+    parallel. Jobs go to printers in turn ("round-robin"), or to the
+    printer with the fewest jobs waiting ("least-loaded"). A printer
+    that can't be reached gets no more jobs until its backoff delay is
+    up, and its job goes to another printer instead. While a printer
+    that's down has nothing to print, its thread tries to reconnect to
+    it every health_interval seconds (once its backoff delay is up).
+    """
+
+    def __init__(
+        self,
+        targets: list[PoolTarget],
+        strategy: Strategy = "least-loaded",
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        health_interval: float = 5.0,
+    ):
+        if not targets:
+            raise ValueError("A printer pool needs at least one printer")
+        if strategy not in ("round-robin", "least-loaded"):
+            raise ValueError(f"Unknown strategy: {strategy!r}")
+        self.strategy = strategy
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.health_interval = health_interval
+
+        self._lock = threading.Lock()
+        self._workers = [_Worker(self, target) for target in targets]
+        self._turns = itertools.cycle(range(len(self._workers)))
+
+    @property
+    def stats(self) -> dict[str, TargetStats]:
+        return {worker.target.name: worker.stats for worker in self._workers}
+
+    def _choose(self, job: PrintJob, tried: set[str]) -> Optional[_Worker]:
+        now = time.monotonic()
+        candidates = [
+            worker for worker in self._workers
+            if worker.target.name not in tried
+            and worker.available(now) and job.can_print(worker.width)
+        ]
+        if not candidates:
+            return None
+        if self.strategy == "least-loaded":
+            # NOTE A printer that's down but due for a retry only gets a
+            # job if no healthy printer can take it.
+            return min(
+                candidates,
+                key=lambda worker: (not worker.healthy, worker.outstanding),
+            )
+        for _ in range(len(self._workers)):
+            worker = self._workers[next(self._turns)]
+            if worker in candidates:
+                return worker
+
+    def _dispatch(self, job: PrintJob, future: Future, tried: set[str]):
+        with self._lock:
+            worker = self._choose(job, tried)
+            if worker is not None:
+                worker.outstanding += 1
+                tried.add(worker.target.name)
+        if worker is None:
+            future.set_exception(DeviceNotFoundError(
+                f"No printer in the pool could print {job.name or 'job'}"
+            ))
+            return
+        worker.queue.put((job, future, tried))
+
+    def _failover(self, job: PrintJob, future: Future, tried: set[str]):
+        self._dispatch(job, future, tried)
+
+    def submit(self, job: PrintJob) -> Future:
+        """Queue a job; the future's result is the name of its printer."""
+        future = Future()
+        self._dispatch(job, future, set())
+        return future
+
+    def print_all(self, jobs: list[PrintJob]) -> list[Future]:
+        """Print jobs, and wait until every one has printed (or failed)."""
+        futures = [self.submit(job) for job in jobs]
+        for future in futures:
+            future.exception()
+        return futures
+
+    def check_health(self) -> dict[str, bool]:
+        """Try to reconnect to every printer that's down; return which are up.
+
+        NOTE Each printer is checked by its own thread (on its own
+        connection), after the jobs already queued for it.
+        """
+        checks = {}
+        for worker in self._workers:
+            future = Future()
+            worker.queue.put((None, future, None))
+            checks[worker.target.name] = future
+        return {name: future.result() for name, future in checks.items()}
+
+    def close(self):
+        """Finish every queued job, then close every printer."""
+        for worker in self._workers:
+            worker.queue.put(None)
+        for worker in self._workers:
+            worker.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
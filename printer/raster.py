@@ -0,0 +1,200 @@
+import functools
+from typing import Literal, Union
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    _DEP_NUMPY = False
+else:
+    _DEP_NUMPY = True
+
+
+Dither = Literal["threshold", "bayer", "floyd-steinberg"]
+DITHER_MODES = ("threshold", "bayer", "floyd-steinberg")
+
+
+def is_usable() -> bool:
+    return _DEP_NUMPY
+
+
+def dependency_numpy(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not is_usable():
+            raise RuntimeError(
+                "The fast image engine requires NumPy."
+            )
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@functools.cache
+def _bayer_thresholds(order: int = 3):
+    """Get an ordered-dithering threshold map, scaled to 0-255."""
+    bayer = np.zeros((1, 1), dtype=np.int32)
+    for _ in range(order):
+        bayer = np.block([
+            [4 * bayer, 4 * bayer + 2],
+            [4 * bayer + 3, 4 * bayer + 1],
+        ])
+    return (bayer + 0.5) * (256 / bayer.size)
+
+
+class Raster:
+    """A 1-bit image, ready to be sent to the printer.
+
+    dots is a 2D boolean array, which is True wherever a dot is printed.
+    """
+
+    def __init__(self, dots):
+        self.dots = dots
+
+    @property
+    def width(self) -> int:
+        return self.dots.shape[1]
+
+    @property
+    def width_bytes(self) -> int:
+        return (self.width + 7) >> 3
+
+    @property
+    def height(self) -> int:
+        return self.dots.shape[0]
+
+    def to_raster_format(self) -> bytes:
+        """Pack into rows of bytes, 8 dots per byte, MSB first."""
+        return np.packbits(self.dots, axis=1).tobytes()
+
+    def center(self, max_width: int) -> "Raster":
+        if self.width >= max_width:
+            return self
+        left = (max_width - self.width) // 2
+        return Raster(np.pad(
+            self.dots,
+            ((0, 0), (left, max_width - self.width - left)),
+        ))
+
+    def split(self, fragment_height: int) -> list["Raster"]:
+        return [
+            Raster(self.dots[top:top + fragment_height])
+            for top in range(0, self.height, fragment_height)
+        ]
+
+    def crop(self, top: int, bottom: int, left: int, right: int) -> "Raster":
+        return Raster(self.dots[top:bottom, left:right])
+
+    def ink_bands(self, min_gap: int = 1) -> list[tuple[int, int]]:
+        """Find the (top, bottom) rows of each band with dots in it.
+
+        Bands are only separated by at least min_gap blank rows; shorter
+        gaps are kept inside a band.
+        """
+        ink = np.flatnonzero(self.dots.any(axis=1))
+        if not ink.size:
+            return []
+        gaps = np.flatnonzero(np.diff(ink) > min_gap)
+        tops = np.concatenate(([ink[0]], ink[gaps + 1]))
+        bottoms = np.concatenate((ink[gaps] + 1, [ink[-1] + 1]))
+        return list(zip(tops.tolist(), bottoms.tolist()))
+
+    def ink_columns(self) -> tuple[int, int]:
+        """Find the first column with dots in it, and the one after the last."""
+        ink = np.flatnonzero(self.dots.any(axis=0))
+        if not ink.size:
+            return 0, 0
+        return int(ink[0]), int(ink[-1]) + 1
+
+    def to_column_format(self, band_height: int = 24) -> list[bytes]:
+        """Pack into bands of columns, band_height (8 or 24) dots tall.
+
+        Each column is band_height // 8 bytes, MSB at the top, like
+        ESC * expects.
+        """
+        dots = np.pad(self.dots, ((0, -self.height % band_height), (0, 0)))
+        return [
+            np.packbits(dots[top:top + band_height].T, axis=1).tobytes()
+            for top in range(0, dots.shape[0], band_height)
+        ]
+
+
+@dependency_numpy
+def grayscale(img_source: Union[Image.Image, str, "np.ndarray"]):
+    """Convert an image to a 2D array of lightness values (0-255).
+
+    Transparent areas are treated as white, like python-escpos does.
+    PIL images give a uint8 array; other arrays give a float32 array.
+    """
+    if isinstance(img_source, str):
+        img_source = Image.open(img_source)
+    if isinstance(img_source, Image.Image):
+        # NOTE PIL's own conversions are already fast, and using them
+        # keeps the output identical to python-escpos's.
+        img = img_source
+        if "A" in img.getbands() or img.mode in ("P", "PA"):
+            img = img.convert("RGBA")
+            im = Image.new("RGB", img.size, (255, 255, 255))
+            im.paste(img, mask=img.split()[3])
+            img = im
+        return np.asarray(img.convert("L"))
+
+    arr = np.asarray(img_source, dtype=np.float32)
+    if arr.ndim == 2:
+        return arr
+    if arr.shape[2] == 4:
+        alpha = arr[..., 3:] / 255
+        arr = arr[..., :3] * alpha + 255 * (1 - alpha)
+    # ITU-R 601-2 luma, as used by PIL
+    return arr[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+@dependency_numpy
+def adjust(gray, gamma: float = 1.0, contrast: float = 1.0):
+    """Apply gamma and contrast to an array of lightness values.
+
+    A gamma above 1 darkens midtones, and a contrast above 1 pushes
+    values away from middle gray.
+    """
+    if gamma == 1.0 and contrast == 1.0:
+        return gray
+    v = gray.astype(np.float32) / 255
+    if gamma != 1.0:
+        v = v ** gamma
+    if contrast != 1.0:
+        v = (v - 0.5) * contrast + 0.5
+    return np.clip(v * 255, 0, 255)
+
+
+@dependency_numpy
+def dither(gray, mode: Dither = "floyd-steinberg", threshold: int = 128):
+    """Turn an array of lightness values into an array of dots."""
+    if mode == "threshold":
+        return gray < threshold
+    if mode == "bayer":
+        thresholds = _bayer_thresholds()
+        h, w = gray.shape
+        reps = (-(-h // thresholds.shape[0]), -(-w // thresholds.shape[1]))
+        return gray < np.tile(thresholds, reps)[:h, :w]
+    if mode == "floyd-steinberg":
+        # NOTE Error diffusion can't be vectorized (each pixel depends
+        # on the ones before it), so let PIL's C implementation do it.
+        if gray.dtype != np.uint8:
+            gray = np.clip(gray, 0, 255).round().astype(np.uint8)
+        inverted = Image.fromarray(255 - gray, "L")
+        return np.asarray(inverted.convert("1"), dtype=bool)
+    raise ValueError(
+        f"Unknown dithering mode {mode!r}; expected one of {DITHER_MODES}"
+    )
+
+
+@dependency_numpy
+def rasterize(
+    img_source: Union[Image.Image, str, "np.ndarray"],
+    dither_mode: Dither = "floyd-steinberg",
+    gamma: float = 1.0,
+    contrast: float = 1.0,
+    threshold: int = 128,
+) -> Raster:
+    gray = adjust(grayscale(img_source), gamma=gamma, contrast=contrast)
+    return Raster(dither(gray, dither_mode, threshold=threshold))
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Any
+
+
+def cache_key(*parts: Any) -> str:
+    """Make a cache key out of some bytes and/or printable values."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray, memoryview)):
+            part = repr(part).encode()
+        # Length-prefix each part so different splits can't collide
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def file_hash(path: str | os.PathLike[str]) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class RasterCache:
+    """Content-addressed on-disk cache of printer-ready bytes.
+
+    Entries are files named after their key. Reading an entry marks it
+    as recently used (by touching it), and when the cache grows past
+    max_bytes, the least recently used entries are evicted (down to
+    evict_to of max_bytes, so it isn't scanned again on the next put).
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        max_bytes: int = 64 * 1024 * 1024,
+        evict_to: float = 0.9,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.evict_to = evict_to
+
+        self.hits = 0
+        self.misses = 0
+
+        # Total size of the entries, once it's been worked out
+        # NOTE Other processes can add to the cache too, so this is only
+        # an estimate; it's worked out again whenever entries are evicted.
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory.joinpath(key[:2]).joinpath(key)
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._size_lock:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += len(data) - replaced
+            full = self._size > self.max_bytes
+        if full:
+            self.evict(int(self.max_bytes * self.evict_to))
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def entries(self) -> list[os.DirEntry]:
+        if not self.directory.is_dir():
+            return []
+        entries = []
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            entries.extend(
+                entry for entry in os.scandir(subdir)
+                if entry.is_file() and not entry.name.endswith(".tmp")
+            )
+        return entries
+
+    def _entry_stats(self) -> list[tuple[float, int, str]]:
+        """Get the last use time, size and path of every entry."""
+        stats = []
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Evicted by another thread (or process) since the scan
+                continue
+            stats.append((stat.st_mtime, stat.st_size, entry.path))
+        return stats
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entry_stats())
+
+    def evict(self, max_bytes: int | None = None):
+        """Remove least recently used entries until under the size cap."""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        total = 0
+        kept = 0
+        for _, size, path in sorted(self._entry_stats(), reverse=True):
+            total += size
+            if total > max_bytes:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            else:
+                kept = total
+        with self._size_lock:
+            self._size = kept
+
+    def clear(self):
+        self.evict(max_bytes=0)
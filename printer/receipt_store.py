@@ -0,0 +1,86 @@
+import json
+import os
+import pathlib
+import tempfile
+import time
+from typing import Any
+
+from printer.raster_cache import cache_key
+
+
+class ReceiptStore:
+    """Directory of compiled receipts (their complete ESC/POS bytes).
+
+    Each receipt is stored under a key made from everything that went
+    into it (its input data, the version of the program that made it,
+    and the printer profile), so printing the same thing again can just
+    send the stored bytes.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]):
+        self.directory = pathlib.Path(directory)
+
+    @staticmethod
+    def key(template: str, version: Any, profile: str, *payload: Any) -> str:
+        """Make the key for a receipt.
+
+        :param template: name of the program that makes the receipt.
+        :param version: version of the receipt's layout; change it
+            whenever the program would print the same data differently.
+        :param profile: name of the printer profile.
+        :param payload: the receipt's input data. Anything that isn't
+            bytes is turned into JSON (with sorted keys) first.
+        """
+        return cache_key(template, version, profile, *(
+            part if isinstance(part, bytes)
+            else json.dumps(part, sort_keys=True).encode()
+            for part in payload
+        ))
+
+    def _path(self, key: str, suffix: str) -> pathlib.Path:
+        return self.directory.joinpath(key + suffix)
+
+    def _write(self, path: pathlib.Path, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._path(key, ".bin").read_bytes()
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes, title: str = "", **meta: Any):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # NOTE The receipt is written before its metadata, since only
+        # receipts with metadata are listed.
+        self._write(self._path(key, ".bin"), data)
+        self._write(self._path(key, ".json"), json.dumps({
+            "title": title,
+            "created": time.time(),
+            "size": len(data),
+            **meta,
+        }).encode())
+
+    def receipts(self) -> list[tuple[str, dict]]:
+        """Get the key and metadata of every receipt, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        receipts = []
+        for path in self.directory.glob("*.json"):
+            try:
+                meta = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            receipts.append((path.stem, meta))
+        return sorted(receipts, key=lambda receipt: receipt[1]["created"])
+
+    def find(self, prefix: str) -> list[str]:
+        """Get the keys of every receipt starting with prefix."""
+        return [key for key, _ in self.receipts() if key.startswith(prefix)]
+
+    def evict(self, key: str):
+        for suffix in (".json", ".bin"):
+            self._path(key, suffix).unlink(missing_ok=True)
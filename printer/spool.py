@@ -0,0 +1,180 @@
+import os
+import pathlib
+import re
+import time
+from typing import Callable
+
+from escpos.exceptions import DeviceNotFoundError
+
+from printer.escpos_with_software_columns import EscposWithSoftwareColumns
+
+
+_JOB_RE = re.compile(r"^(\d+)(?:-.*)?\.(bin|tmp)$")
+
+
+class Spool:
+    """Directory of print jobs waiting for a printer.
+
+    Each job is a file named after its sequence number (and, optionally,
+    the program that made it), so jobs are delivered in the order they
+    were added. Job files are written to a temporary file first and then
+    renamed, so a job is either completely in the spool or not at all.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]):
+        self.directory = pathlib.Path(directory)
+
+    @property
+    def index_path(self) -> pathlib.Path:
+        return self.directory.joinpath("index")
+
+    def _next_seq(self) -> int:
+        try:
+            seq = int(self.index_path.read_text())
+        except (OSError, ValueError):
+            seq = 0
+        for path in self.directory.iterdir():
+            match = _JOB_RE.match(path.name)
+            if match:
+                seq = max(seq, int(match.group(1)) + 1)
+        return seq
+
+    def _write_index(self, seq: int):
+        tmp = self.index_path.with_suffix(".new")
+        tmp.write_text(str(seq))
+        os.replace(tmp, self.index_path)
+
+    def add(self, data: bytes, name: str = "") -> pathlib.Path:
+        """Atomically add a job to the end of the spool."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Claim a sequence number by exclusively creating its temp file
+        seq = self._next_seq()
+        while True:
+            tmp = self.directory.joinpath(f"{seq:08}.tmp")
+            try:
+                fd = os.open(
+                    tmp,
+                    os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                    | getattr(os, "O_BINARY", 0),
+                )
+                break
+            except FileExistsError:
+                seq += 1
+
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        name = re.sub(r"[^\w.]+", "_", name)
+        path = self.directory.joinpath(
+            f"{seq:08}-{name}.bin" if name else f"{seq:08}.bin"
+        )
+        os.replace(tmp, path)
+        self._write_index(seq + 1)
+        return path
+
+    def jobs(self) -> list[pathlib.Path]:
+        """Get the jobs in the spool, in the order they were added."""
+        if not self.directory.is_dir():
+            return []
+        jobs = []
+        for path in self.directory.iterdir():
+            match = _JOB_RE.match(path.name)
+            if match and match.group(2) == "bin":
+                jobs.append((int(match.group(1)), path.name, path))
+        return [path for *_, path in sorted(jobs)]
+
+    def remove(self, path: pathlib.Path):
+        path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.jobs())
+
+
+class SpoolPrinter(EscposWithSoftwareColumns):
+    """Printer that adds everything it prints to a spool as one job.
+
+    The job is added to the spool when the printer is closed.
+    """
+
+    def __init__(self, spool: Spool, name: str = "", *args, **kwargs):
+        EscposWithSoftwareColumns.__init__(self, *args, **kwargs)
+        self.spool = spool
+        self.name = name
+
+        self._device = False
+
+    def open(self):
+        self.device = bytearray()
+
+    def _raw(self, msg: bytes):
+        self.device += msg
+
+    def close(self):
+        if self._device is False or self._device is None:
+            return
+        if self._device:
+            path = self.spool.add(bytes(self._device), self.name)
+            print(f"Print job spooled to {path}")
+        self.device = False
+
+
+class SpoolWorker:
+    """Deliver spooled jobs, in order, to whichever printer is reachable.
+
+    All the jobs waiting in the spool are sent over a single printer
+    connection. A job is only removed from the spool after it has been
+    sent (and, if the printer can confirm it, like the print daemon can,
+    confirmed); if sending fails, it (and every job after it) stays in
+    the spool to be retried later.
+    """
+
+    def __init__(
+        self,
+        spool: Spool,
+        connect: Callable[[], EscposWithSoftwareColumns | None],
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.spool = spool
+        self.connect = connect
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+    def drain(self) -> int:
+        """Print every job in the spool; return how many were printed."""
+        jobs = self.spool.jobs()
+        if not jobs:
+            return 0
+
+        printer = self.connect()
+        if printer is None:
+            raise DeviceNotFoundError("No printer is reachable")
+
+        printed = 0
+        try:
+            for job in jobs:
+                printer._raw(job.read_bytes())
+                if hasattr(printer, "flush"):
+                    printer.flush()
+                self.spool.remove(job)
+                printed += 1
+                print(f"Printed spooled job {job.name}")
+        finally:
+            printer.close()
+        return printed
+
+    def run_forever(self, poll_interval: float = 5.0):
+        backoff = self.min_backoff
+        while True:
+            try:
+                self.drain()
+            except (DeviceNotFoundError, OSError) as e:
+                print(f"Unable to print spooled jobs; retrying in {backoff}s")
+                print(e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.min_backoff
+            time.sleep(poll_interval)
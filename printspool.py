@@ -0,0 +1,74 @@
+import argparse
+
+from escpos.exceptions import DeviceNotFoundError
+
+from printer import PrintJob, Spool, SpoolWorker
+from printer.pool import media_width
+from utils import get_live_printer, get_printer_pool
+from utils.get_printer import PRINTER_PROFILE, SPOOL_DIR
+
+
+parser = argparse.ArgumentParser(
+    description="Print the jobs that were spooled while the printer was "
+    "unreachable.",
+)
+parser.add_argument(
+    "--watch", action="store_true",
+    help="keep running, and print new jobs as soon as the printer is "
+    "reachable",
+)
+parser.add_argument(
+    "--spool", default=SPOOL_DIR,
+    help=f"spool directory (default: {SPOOL_DIR})",
+)
+parser.add_argument(
+    "--pool", action="store_true",
+    help="spread the jobs across every printer in PRINTER_POOL (so they "
+    "may not print in order)",
+)
+parser.add_argument(
+    "--strategy", choices=("least-loaded", "round-robin"),
+    default="least-loaded",
+    help="how --pool picks a printer for each job (default: %(default)s)",
+)
+args = parser.parse_args()
+if args.pool and args.watch:
+    parser.error("--pool can't be used with --watch")
+
+worker = SpoolWorker(Spool(args.spool), get_live_printer)
+if args.pool:
+    # NOTE Spooled jobs are already compiled for PRINTER_PROFILE, so they
+    # only go to printers of the same width.
+    spool = worker.spool
+    jobs = spool.jobs()
+    with get_printer_pool(args.strategy) as pool:
+        futures = pool.print_all([
+            PrintJob(
+                name=job.name, data=job.read_bytes(),
+                data_width=media_width(PRINTER_PROFILE),
+            )
+            for job in jobs
+        ])
+    printed = 0
+    for job, future in zip(jobs, futures):
+        if future.exception() is not None:
+            print(f"Unable to print spooled job {job.name}")
+            print(future.exception())
+            continue
+        spool.remove(job)
+        printed += 1
+        print(f"Printed spooled job {job.name} on {future.result()}")
+    print(f"Printed {printed} of {len(jobs)} spooled job(s)")
+elif args.watch:
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        pass
+else:
+    jobs = len(worker.spool)
+    try:
+        printed = worker.drain()
+    except (DeviceNotFoundError, OSError) as e:
+        print("Unable to print spooled jobs!")
+        raise SystemExit(e)
+    print(f"Printed {printed} of {jobs} spooled job(s)")
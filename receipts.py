@@ -0,0 +1,58 @@
+import argparse
+from datetime import datetime
+
+from utils import get_printer, get_receipt_store
+
+
+parser = argparse.ArgumentParser(
+    description="List, reprint or delete compiled receipts.",
+)
+subparsers = parser.add_subparsers(dest="command", required=True)
+subparsers.add_parser("list", help="list compiled receipts")
+reprint_parser = subparsers.add_parser("reprint", help="reprint a receipt")
+reprint_parser.add_argument("key", help="receipt key (or the start of it)")
+evict_parser = subparsers.add_parser("evict", help="delete receipts")
+evict_parser.add_argument(
+    "key", nargs="?", default=None,
+    help="receipt key (or the start of it)",
+)
+evict_parser.add_argument(
+    "--all", action="store_true", help="delete every receipt",
+)
+args = parser.parse_args()
+
+store = get_receipt_store()
+
+
+def find_one(prefix: str) -> str:
+    keys = store.find(prefix)
+    if len(keys) != 1:
+        raise SystemExit(
+            f"{len(keys)} receipts match {prefix!r}; expected exactly 1"
+        )
+    return keys[0]
+
+
+if args.command == "list":
+    for key, meta in store.receipts():
+        created = datetime.fromtimestamp(meta["created"])
+        print(
+            f"{key[:12]}  {created:%Y-%m-%d %H:%M}  "
+            f"{meta['size']:>8} B  {meta['title']}"
+        )
+elif args.command == "reprint":
+    key = find_one(args.key)
+    p = get_printer(__file__)
+    # NOTE Compiled receipts don't initialize the printer themselves.
+    p.hw("INIT")
+    p._raw(store.get(key))
+elif args.command == "evict":
+    if args.all:
+        keys = [key for key, _ in store.receipts()]
+    elif args.key is not None:
+        keys = [find_one(args.key)]
+    else:
+        parser.error("evict needs a key or --all")
+    for key in keys:
+        store.evict(key)
+    print(f"Deleted {len(keys)} receipt(s)")
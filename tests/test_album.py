@@ -0,0 +1,92 @@
+import sys
+import unittest
+
+import album
+from benchmarks.replay import install_session
+from printer.document import Text
+
+MBID = "fbc6e8c2-3d8b-4b1a-9a8e-3b1d2a6f0e11"
+
+
+def track(position: int, length: int | None = 60000) -> dict:
+    return {
+        "number": str(position),
+        "position": position,
+        "title": f"Track {position}",
+        "length": length,
+        "artist-credit": [],
+        "recording": {"id": f"rec-{position}", "title": f"Recording {position}"},
+    }
+
+
+class TestBrowseTracks(unittest.TestCase):
+    def setUp(self):
+        module = sys.modules["utils.get_session"]
+        self.addCleanup(setattr, module, "_session", module._session)
+        self.session = install_session()
+
+    def test_only_this_medium_in_order(self):
+        tracks = album.browse_tracks(MBID, 1, 0)
+        self.assertEqual([t["position"] for t in tracks], [1, 3])
+        # The track's own title, not its recording's
+        self.assertEqual(tracks[1]["title"], "Track Three")
+        self.assertEqual(tracks[1]["length"], 180000)
+
+
+class TestMediaTracks(unittest.TestCase):
+    def test_only_missing_tracks_are_fetched(self):
+        calls = []
+
+        def browse(position, offset, limit):
+            calls.append((position, offset, limit))
+            # The search doesn't find the second page at all, and only
+            # some of the third
+            if offset == 102:
+                return []
+            return [
+                track(n) for n in range(offset + 1, offset + limit + 1)
+                if n % 10
+            ]
+
+        media = {
+            "position": 1, "track-count": 250,
+            "tracks": [track(1), track(2)],
+        }
+        pages = list(album.media_tracks(media, browse))
+        self.assertEqual(calls, [(1, 2, 100), (1, 102, 100), (1, 202, 48)])
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(pages[0], media["tracks"])
+        self.assertEqual(pages[2][-1]["position"], 249)
+
+    def test_whole_medium_is_not_fetched(self):
+        media = {"position": 1, "track-count": 2, "tracks": [track(1), track(2)]}
+        pages = list(album.media_tracks(media, self.fail))
+        self.assertEqual(pages, [media["tracks"]])
+
+
+class TestMediaReceipt(unittest.TestCase):
+    def full_length(self, media: dict, pages: list[list[dict]]) -> str:
+        layout = album.TableLayout([2, 1, 23, 6], ["right", "left", "left", "right"])
+        nodes = album.media_receipt(media, pages, "artist", layout, 32)
+        return [node for node in nodes if isinstance(node, Text)][-1].text
+
+    def test_full_length(self):
+        media = {"title": "", "track-count": 2}
+        self.assertEqual(self.full_length(media, [[track(1), track(2)]]), "2:00")
+        self.assertEqual(
+            self.full_length(media, [[track(1, 30000), track(2, 3600000)]]),
+            "1:00:30",
+        )
+
+    def test_missing_tracks_make_full_length_unknown(self):
+        media = {"title": "", "track-count": 3}
+        self.assertEqual(self.full_length(media, [[track(1), track(3)]]), "?:??")
+        self.assertEqual(self.full_length(media, []), "?:??")
+        self.assertEqual(
+            self.full_length({"title": "", "track-count": 1}, [[track(1, None)]]),
+            "?:??",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+from printer.bluetooth import Bluetooth
+from printer.chunking import DLE, ESC, GS, _command, safe_chunks
+
+
+def raster(width: int, height: int) -> bytes:
+    """A GS v 0 raster image with a different byte in every row."""
+    width_bytes = width // 8
+    return (
+        b"\x1dv0\x00"
+        + bytes((width_bytes & 0xFF, width_bytes >> 8, height & 0xFF, height >> 8))
+        + b"".join(bytes((y & 0xFF,)) * width_bytes for y in range(height))
+    )
+
+
+JOB = b"\x1b@Hello\n" + raster(384, 400) + b"\x1bE\x01World\n\x1dVA\x03"
+
+
+def raster_rows(chunk: bytes) -> int:
+    """Check that a chunk ends between commands; count its raster rows."""
+    rows = 0
+    i = 0
+    while i < len(chunk):
+        if chunk[i] in (ESC, GS, DLE):
+            end, _ = _command(chunk, i)
+            if chunk[i + 1:i + 2] == b"v":
+                rows += chunk[i + 6] + chunk[i + 7] * 256
+            i = end
+        else:
+            i += 1
+    assert i == len(chunk), "chunk ends partway through a command"
+    return rows
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = bytearray()
+
+    def send(self, data) -> int:
+        self.sent += data
+        return len(data)
+
+
+class FakeBluetooth(Bluetooth):
+    """Bluetooth printer that sends everything to a FakeSocket."""
+
+    def open(self):
+        self.device = FakeSocket()
+
+    def close(self):
+        pass
+
+
+def send(job: bytes, slice_size: int) -> bytes:
+    """Feed a job to a Bluetooth printer a slice at a time."""
+    printer = FakeBluetooth(profile="ZJ-5870", status_poll=False)
+    printer.open()
+    for start in range(0, len(job), slice_size):
+        printer._raw(job[start:start + slice_size])
+    printer.flush()
+    return bytes(printer.device.sent)
+
+
+class TestSafeChunks(unittest.TestCase):
+    def test_chunks_are_whole_commands(self):
+        chunks = safe_chunks(JOB, 4096)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 4096)
+        # The image is split into bands that are complete images
+        self.assertEqual(sum(map(raster_rows, chunks)), 400)
+
+    def test_cut_off_command_is_not_split(self):
+        cut = JOB[:5000]
+        chunks = safe_chunks(cut, 4096)
+        self.assertEqual(b"".join(chunks), cut)
+        # The cut-off image is kept whole, at the end
+        self.assertTrue(chunks[-1].startswith(b"\x1dv0"))
+
+    def test_cut_off_header_is_not_split(self):
+        for end in range(len(b"\x1b@Hello\n") + 1, len(b"\x1b@Hello\n") + 8):
+            cut = JOB[:end]
+            self.assertEqual(safe_chunks(cut, 4)[-1], cut[len(b"\x1b@Hello\n"):])
+
+    def test_command_arguments_are_not_split(self):
+        # ESC p (cash drawer pulse) has three argument bytes, here line feeds
+        pulse = b"\x1bp\x00\n\n"
+        chunks = safe_chunks(b"A\n" + pulse + b"B\n", 2)
+        self.assertIn(pulse, chunks[1])
+
+    def test_unknown_command_ends_splitting(self):
+        job = b"A\n\x1b&\x03\n\n" + b"B\n" * 10
+        chunks = safe_chunks(job, 2)
+        self.assertEqual(chunks, [b"A\n", job[2:]])
+
+
+class TestBluetoothSlices(unittest.TestCase):
+    def test_sliced_job_matches_whole_job(self):
+        whole = send(JOB, len(JOB))
+        for slice_size in (1, 7, 1000, 4096, 5000):
+            with self.subTest(slice_size=slice_size):
+                self.assertEqual(send(JOB, slice_size), whole)
+
+
+if __name__ == "__main__":
+    unittest.main()
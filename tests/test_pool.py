@@ -0,0 +1,122 @@
+import unittest
+
+from escpos.exceptions import DeviceNotFoundError
+
+from printer import Dummy, PoolTarget, PrinterPool, PrintJob
+from printer.bluetooth import Bluetooth
+from printer.pool import media_width
+from tests.test_chunking import JOB
+
+
+class FlakySocket:
+    """Socket that stops working after it's been sent fail_after bytes."""
+
+    def __init__(self, fail_after: int | None = None):
+        self.fail_after = fail_after
+        self.sent = bytearray()
+
+    def send(self, data) -> int:
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise OSError("Connection reset by peer")
+        self.sent += data
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class FlakyBluetooth(Bluetooth):
+    """Bluetooth printer that connects to each of sockets in turn."""
+
+    def __init__(self, sockets: list[FlakySocket], *args, **kwargs):
+        super().__init__(
+            *args, status_poll=False, max_resumes=1, reconnect_backoff=0,
+            **kwargs,
+        )
+        self.sockets = sockets
+
+    def open(self):
+        self._connect()
+
+    def _connect(self):
+        if not self.sockets:
+            raise DeviceNotFoundError("No more sockets")
+        self.device = self.sockets.pop(0)
+
+    def close(self):
+        # NOTE Bluetooth.close() needs Bluetooth support in the socket
+        # module, which isn't needed here.
+        Bluetooth.close.__wrapped__(self)
+
+
+class Recorder(Dummy):
+    def open(self):
+        pass
+
+
+class TestFailover(unittest.TestCase):
+    def test_failed_printer_prints_one_copy(self):
+        # The connection drops partway through the job, the reconnect
+        # drops too (so the job fails over), and the printer would be
+        # reachable again after that
+        broken = FlakySocket(fail_after=5000)
+        sockets = [broken, FlakySocket(fail_after=0), FlakySocket()]
+        spare = sockets[-1]
+        recorders = []
+
+        def recorder():
+            recorders.append(Recorder(profile="ZJ-5870"))
+            return recorders[-1]
+
+        targets = [
+            PoolTarget(
+                "flaky", lambda: FlakyBluetooth(sockets, profile="ZJ-5870"),
+                "ZJ-5870",
+            ),
+            PoolTarget("backup", recorder, "ZJ-5870"),
+        ]
+        with PrinterPool(
+            targets, strategy="round-robin", min_backoff=60,
+        ) as pool:
+            future = pool.submit(PrintJob(
+                name="job", data=JOB, data_width=media_width("ZJ-5870"),
+            ))
+            self.assertEqual(future.result(), "backup")
+
+        self.assertEqual(pool.stats["flaky"].failures, 1)
+        self.assertEqual(recorders[0].output, JOB)
+        # Nothing more of the job was sent to the printer that failed
+        self.assertLess(len(broken.sent), len(JOB))
+        self.assertEqual(spare.sent, b"")
+
+
+class TestRender(unittest.TestCase):
+    def test_job_is_rendered_for_other_widths(self):
+        widths = []
+
+        def render(p):
+            width = p.profile.profile_data["media"]["width"]["pixels"]
+            widths.append(width)
+            p._raw(f"{width}px\n".encode())
+
+        recorders = []
+
+        def recorder():
+            recorders.append(Recorder(profile="TM-T88V"))
+            return recorders[-1]
+
+        with PrinterPool([PoolTarget("wide", recorder, "TM-T88V")]) as pool:
+            future = pool.submit(PrintJob(
+                render, name="job",
+                data=b"narrow\n", data_width=media_width("ZJ-5870"),
+            ))
+            self.assertEqual(future.result(), "wide")
+
+        width = media_width("TM-T88V")
+        self.assertEqual(widths, [width])
+        self.assertEqual(recorders[0].output, f"{width}px\n".encode())
+        self.assertEqual(pool.stats["wide"].renders, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,27 @@
-from .get_font import get_font
-from .get_printer import get_file_printer, get_printer
+from .get_document_backend import get_document_backend
+from .get_font import get_font, preload_fonts
+from .get_printer import (
+    get_file_printer, get_live_printer, get_printer, get_printer_pool,
+    get_printer_profile, get_spool_printer,
+)
+from .get_raster_cache import get_raster_cache, get_weather_icon
+from .get_receipt_store import get_receipt_store
+from .get_session import get_session
+from .get_weather_store import get_weather_store
 
 __all__ = [
+    "get_document_backend",
     "get_file_printer",
     "get_font",
+    "get_live_printer",
     "get_printer",
-]
+    "get_printer_pool",
+    "get_printer_profile",
+    "get_raster_cache",
+    "get_receipt_store",
+    "get_session",
+    "get_spool_printer",
+    "get_weather_icon",
+    "get_weather_store",
+    "preload_fonts",
+]
\ No newline at end of file
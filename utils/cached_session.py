@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from io import BytesIO
+import json
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from printer import instrumentation
+from printer.raster_cache import RasterCache, cache_key
+from utils.get_session import (
+    CACHE_TTLS, DEFAULT_TIMEOUT, RATE_LIMITS, SECRET_PARAMS, TIMEOUTS,
+)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    # Seconds spent waiting for rate limits
+    throttled: float = 0.0
+
+
+class TokenBucket:
+    """Rate limit of rate per second on average, in bursts of up to capacity.
+
+    Threads waiting for a token get them in the order they asked.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Wait for a token; return how long that took."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            # NOTE Taking the token now (going into debt if there isn't
+            # one) reserves the next free slot for this thread.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class CachedSession(requests.Session):
+    """Session with per-host timeouts, and an on-disk cache of GETs.
+
+    A cached response is used without touching the network while it's
+    fresh (according to its URL's TTL). After that, it's revalidated
+    with its ETag/Last-Modified, if it had any. Requests that do go to
+    the network wait for their host's rate limit, if it has one.
+
+    Query parameters named in secret_params (like API keys) are left out
+    of everything that's cached.
+    """
+
+    def __init__(
+        self,
+        cache: RasterCache | None,
+        ttls: dict[str, float] = CACHE_TTLS,
+        timeouts: dict[str, float | tuple[float, float]] = TIMEOUTS,
+        default_timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+        rate_limits: dict[str, float] = RATE_LIMITS,
+        secret_params: tuple[str, ...] = SECRET_PARAMS,
+        pool_maxsize: int = 10,
+    ):
+        super().__init__()
+        self.cache = cache
+        self.ttls = ttls
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+        self.secret_params = secret_params
+        self.buckets = {
+            host: TokenBucket(rate) for host, rate in rate_limits.items()
+        }
+        self.stats = CacheStats()
+
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def _ttl(self, url: str) -> float:
+        for prefix, ttl in self.ttls.items():
+            if url.startswith(prefix):
+                return ttl
+        return 0
+
+    def _public_url(self, url: str) -> str:
+        """Get a URL without its secret query parameters."""
+        parts = urlsplit(url)
+        query = [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name not in self.secret_params
+        ]
+        return parts._replace(query=urlencode(query)).geturl()
+
+    def request(self, method, url, *args, **kwargs):
+        with instrumentation.span("fetch", urlsplit(url).hostname or "") as span:
+            r = self._request(method, url, *args, **kwargs)
+            if span is not None:
+                span.attrs.update(
+                    status=r.status_code,
+                    cached=getattr(r, "from_cache", False),
+                )
+                if not kwargs.get("stream"):
+                    span.bytes = len(r.content)
+            return r
+
+    def _send(self, method, url, *args, **kwargs):
+        bucket = self.buckets.get(urlsplit(url).hostname)
+        if bucket is not None:
+            self.stats.throttled += bucket.acquire()
+        return super().request(method, url, *args, **kwargs)
+
+    def _request(self, method, url, *args, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeouts.get(
+                urlsplit(url).hostname, self.default_timeout,
+            )
+
+        if method.upper() != "GET" or self.cache is None:
+            return self._send(method, url, *args, **kwargs)
+        prepared = self.prepare_request(requests.Request(
+            method, url,
+            params=kwargs.get("params"), headers=kwargs.get("headers"),
+        ))
+        ttl = self._ttl(prepared.url)
+        if not ttl:
+            return self._send(method, url, *args, **kwargs)
+
+        # NOTE The URL is cached without its API keys, so they're never
+        # written to disk.
+        url = self._public_url(prepared.url)
+        key = cache_key("http", url, prepared.headers.get("Accept"))
+        entry = self._load(key)
+        if entry is not None:
+            meta, content = entry
+            if time.time() - meta["stored"] < ttl:
+                self.stats.hits += 1
+                return self._response(prepared, meta, content)
+
+            # Stale; ask the server whether it's still good
+            headers = dict(kwargs.get("headers") or {})
+            if meta["headers"].get("ETag"):
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+            kwargs["headers"] = headers
+
+        self.stats.misses += 1
+        r = self._send(method, url, *args, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            self.stats.revalidated += 1
+            meta, content = entry
+            meta["stored"] = time.time()
+            self._store(key, meta, content)
+            return self._response(prepared, meta, content)
+        if r.status_code == 200:
+            self._store(key, {
+                "stored": time.time(),
+                "status": r.status_code,
+                "headers": dict(r.headers),
+                "url": self._public_url(r.url),
+                "encoding": r.encoding,
+            }, r.content)
+        return r
+
+    def _load(self, key: str):
+        data = self.cache.get(key)
+        if data is None:
+            return None
+        header, _, content = data.partition(b"\n")
+        try:
+            return json.loads(header), content
+        except ValueError:
+            return None
+
+    def _store(self, key: str, meta: dict, content: bytes):
+        self.cache.put(key, json.dumps(meta).encode() + b"\n" + content)
+
+    @staticmethod
+    def _response(prepared, meta: dict, content: bytes) -> requests.Response:
+        r = requests.Response()
+        r.status_code = meta["status"]
+        r.headers = CaseInsensitiveDict(meta["headers"])
+        r.url = meta["url"]
+        r.encoding = meta["encoding"]
+        r.request = prepared
+        r._content = content
+        r.raw = BytesIO(content)
+        r.from_cache = True
+        return r
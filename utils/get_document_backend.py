@@ -0,0 +1,30 @@
+from collections import OrderedDict
+import threading
+from typing import TYPE_CHECKING
+
+from utils.get_raster_cache import get_raster_cache
+
+if TYPE_CHECKING:
+    from printer.document import EscposBackend
+
+
+# Sections rendered so far, by every backend
+_sections = OrderedDict()
+_sections_lock = threading.Lock()
+
+
+def get_document_backend(printer) -> "EscposBackend":
+    """Get a backend to render documents to a printer with.
+
+    Every backend shares the raster cache, and the sections rendered so
+    far, so sections that come up again (in the next receipt of a batch,
+    or the next day's weather) are only rendered once per process.
+    """
+    # NOTE Batch printing and printer pools render in several threads at
+    # once, so the sections are shared with a lock.
+    from printer.document import EscposBackend
+
+    return EscposBackend(
+        printer, get_raster_cache(),
+        sections=_sections, sections_lock=_sections_lock,
+    )
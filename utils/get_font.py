@@ -1,14 +1,40 @@
+import functools
 import os
 import pathlib
-from typing import BinaryIO, TypeAlias
-
-from PIL import ImageFont
+from typing import BinaryIO, Iterable, TypeAlias
 
 
 StrOrBytesPath: TypeAlias = (
     str | bytes | os.PathLike[str] | os.PathLike[bytes]
 )
 
+# Enough for every size of every font a receipt uses
+FONT_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def _resolve_font(filedir: pathlib.Path, font: StrOrBytesPath):
+    """Find where a font is loaded from.
+
+    The font is looked for where PIL looks for fonts (including the
+    system font directory), and then in the fonts directory next to the
+    calling file.
+    """
+    from PIL import ImageFont
+
+    try:
+        ImageFont.truetype(font)
+        return font
+    except OSError:
+        return filedir.joinpath("fonts").joinpath(font)
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(font: StrOrBytesPath, size: float, *args, **kwargs):
+    from PIL import ImageFont
+
+    return ImageFont.truetype(font, size, *args, **kwargs)
+
 
 def get_font(
     file: str,
@@ -17,11 +43,25 @@ def get_font(
     *args,
     **kwargs,
 ):
-    try:
+    # NOTE File objects can only be read once, so they can't be cached.
+    if font is None or hasattr(font, "read"):
+        from PIL import ImageFont
+
         return ImageFont.truetype(font, size, *args, **kwargs)
-    except OSError:
-        filedir = pathlib.Path(file).parent
-        return ImageFont.truetype(
-            filedir.joinpath("fonts").joinpath(font),
-            size, *args, **kwargs,
-        )
+
+    filedir = pathlib.Path(file).parent
+    return _load_font(
+        _resolve_font(filedir, font), size, *args, **kwargs,
+    )
+
+
+def preload_fonts(
+    file: str,
+    fonts: Iterable[tuple[StrOrBytesPath, float]],
+):
+    """Load fonts ahead of time, so later get_font calls are instant.
+
+    :param fonts: pairs of font name (or path) and size.
+    """
+    for font, size in fonts:
+        get_font(file, font, size)
@@ -1,43 +1,198 @@
+import atexit
 import os
+import pathlib
 
-# HACK To add software columns to the ESC/POS printer classes, this must
-# come before every other import from escpos.
-import escpos
-from printer.escpos_with_software_columns import EscposWithSoftwareColumns
-escpos.escpos.Escpos = EscposWithSoftwareColumns
+from printer import instrumentation
 
-from escpos.printer import File
-from escpos.exceptions import DeviceNotFoundError
+# NOTE The printer classes (and escpos) are only imported once a printer
+# is actually needed, so entry points that don't print start faster.
 
-from printer import Bluetooth
+
+PRINTER_ADDRESS = "86:67:7a:b0:fb:5b"
+PRINTER_PORT = 1
+PRINTER_PROFILE = "ZJ-5870"
+
+SPOOL_DIR = pathlib.Path(__file__).parent.parent.joinpath("spool")
+
+# Printers for get_printer_pool() to spread jobs across. Each has a
+# transport ("bluetooth", with an address and port, or "file", with a
+# path) and its own profile.
+PRINTER_POOL = [
+    {
+        "name": "zj-5870",
+        "transport": "bluetooth",
+        "address": PRINTER_ADDRESS,
+        "port": PRINTER_PORT,
+        "profile": PRINTER_PROFILE,
+    },
+    # {
+    #     "name": "backup",
+    #     "transport": "file",
+    #     "path": "backup.bin",
+    #     "profile": "TM-T88V",
+    # },
+]
+
+
+def get_printer_profile():
+    """Get the printer's escpos profile, without connecting to it."""
+    from escpos.capabilities import get_profile
+
+    return get_profile(PRINTER_PROFILE)
 
 
 def get_file_printer(filename: str):
+    from printer import File
+
     filename, _ = os.path.splitext(os.path.basename(filename))
-    printer = File(f"{filename}.bin", profile="ZJ-5870")
+    printer = File(f"{filename}.bin", profile=PRINTER_PROFILE)
     printer.open()
     return printer
 
 
+def get_spool_printer(filename: str):
+    from printer import Spool, SpoolPrinter
+
+    filename, _ = os.path.splitext(os.path.basename(filename))
+    printer = SpoolPrinter(Spool(SPOOL_DIR), filename, profile=PRINTER_PROFILE)
+    printer.open()
+    return printer
+
+
+def get_daemon_printer():
+    from printer import DaemonClient
+
+    if not DaemonClient.is_usable():
+        return None
+
+    printer = DaemonClient(profile=PRINTER_PROFILE)
+    printer.open(raise_not_found=False)
+    if not printer.device:
+        return None
+    return printer
+
+
+def get_bluetooth_printer():
+    from printer import Bluetooth
+
+    return Bluetooth(PRINTER_ADDRESS, port=PRINTER_PORT, profile=PRINTER_PROFILE)
+
+
+# Printers from get_printer() that haven't been closed yet
+_open_printers = set()
+
+
+def close_printer(printer):
+    """Send anything the printer is still buffering, and close it."""
+    _open_printers.discard(printer)
+    try:
+        printer.end_document()
+    finally:
+        printer.close()
+
+
+# NOTE Printers may buffer output, so make sure they're closed (and
+# flushed) before the interpreter starts tearing down modules.
+@atexit.register
+def _close_open_printers():
+    for printer in list(_open_printers):
+        close_printer(printer)
+
+
 def get_printer(filename: str, file: bool = False):
-    if file:
-        print("Printing to file")
-        return get_file_printer(filename)
+    with instrumentation.span("connect") as span:
+        printer = _get_printer(filename, file=file)
+        if span is not None:
+            span.name = type(printer).__name__
+    _open_printers.add(printer)
+    return printer
+
+
+def print_job(filename: str, render, name: str = "", pool=None) -> None:
+    """Print a job laid out by render(printer).
+
+    If a printer pool is given (see get_printer_pool()), the job goes to
+    whichever of its printers is free (and is laid out again for one of
+    a different width), and this waits until it's printed; otherwise,
+    it's printed with get_printer().
+    """
+    if pool is not None:
+        from printer import PrintJob
+
+        target = pool.submit(PrintJob(render, name=name)).result()
+        print(f"Printed {name or 'job'} on {target}")
+        return
+
+    printer = get_printer(filename)
+    try:
+        render(printer)
+    finally:
+        close_printer(printer)
+
+
+def get_live_printer():
+    """Get an open connection to the printer, or None if it's unreachable."""
+    from escpos.exceptions import DeviceNotFoundError
+
+    from printer import Bluetooth
+
+    printer = get_daemon_printer()
+    if printer is not None:
+        print("Printing to print daemon")
+        return printer
 
     if not Bluetooth.is_usable():
-        print("Bluetooth not usable; printing to file")
-        return get_file_printer(filename)
+        return None
 
+    printer = get_bluetooth_printer()
     try:
-        printer = Bluetooth("86:67:7a:b0:fb:5b", port=1, profile="ZJ-5870")
         printer.open()
-        print("Printing to Bluetooth printer")
     except (DeviceNotFoundError, RuntimeError):
         try:
             printer.close()
         except RuntimeError:
             pass
-        printer = get_file_printer(filename)
-        print("Bluetooth printer not found; printing to file")
+        return None
+    print("Printing to Bluetooth printer")
+    return printer
+
+
+def _get_printer(filename: str, file: bool = False):
+    if file:
+        print("Printing to file")
+        return get_file_printer(filename)
+
+    printer = get_live_printer()
+    if printer is None:
+        printer = get_spool_printer(filename)
+        print("Printer not found; spooling print job")
 
     return printer
+
+
+def _pool_target(config: dict):
+    from printer import Bluetooth, File
+    from printer.pool import PoolTarget
+
+    profile = config.get("profile", PRINTER_PROFILE)
+    if config["transport"] == "bluetooth":
+        def connect():
+            return Bluetooth(
+                config["address"], port=config.get("port", 1), profile=profile,
+            )
+    elif config["transport"] == "file":
+        def connect():
+            return File(config["path"], profile=profile)
+    else:
+        raise ValueError(f"Unknown printer transport: {config['transport']!r}")
+    return PoolTarget(config["name"], connect, profile)
+
+
+def get_printer_pool(
+    strategy: str = "least-loaded",
+    config: list[dict] = PRINTER_POOL,
+):
+    """Get a pool of every printer in PRINTER_POOL (see printer.pool)."""
+    from printer import PrinterPool
+
+    return PrinterPool([_pool_target(c) for c in config], strategy=strategy)
@@ -0,0 +1,49 @@
+from io import BytesIO
+import pathlib
+from typing import TYPE_CHECKING
+
+from printer.raster_cache import RasterCache, cache_key, file_hash
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+CACHE_DIR = pathlib.Path(__file__).parent.parent.joinpath("cache")
+WEATHER_ICON_DIR = pathlib.Path(__file__).parent.parent.joinpath("weather")
+
+_raster_cache = None
+
+
+def get_raster_cache() -> RasterCache:
+    global _raster_cache
+    if _raster_cache is None:
+        _raster_cache = RasterCache(CACHE_DIR.joinpath("raster"))
+    return _raster_cache
+
+
+def get_weather_icon(icon_path: str | pathlib.Path, size: int) -> "Image.Image":
+    """Get a weather icon, resized and sharpened for printing."""
+    from PIL import Image, ImageFilter
+
+    cache = get_raster_cache()
+    key = cache_key("weather-icon", file_hash(icon_path), size)
+    data = cache.get(key)
+    if data is not None:
+        return Image.open(BytesIO(data))
+
+    icon = Image.open(icon_path)
+    icon = icon.resize((size, size), Image.Resampling.LANCZOS)
+    icon = icon.filter(ImageFilter.UnsharpMask(percent=200))
+
+    buffer = BytesIO()
+    icon.save(buffer, "PNG")
+    cache.put(key, buffer.getvalue())
+    return icon
+
+
+def warm_weather_icons(width: int) -> int:
+    """Prepare every bundled weather icon for a given media width."""
+    icons = sorted(WEATHER_ICON_DIR.glob("*.png"))
+    for icon_path in icons:
+        get_weather_icon(icon_path, width // 2)
+    return len(icons)
@@ -0,0 +1,27 @@
+from printer.receipt_store import ReceiptStore
+from utils.get_raster_cache import CACHE_DIR
+
+
+_receipt_store = None
+
+
+def get_receipt_store() -> ReceiptStore:
+    global _receipt_store
+    if _receipt_store is None:
+        _receipt_store = ReceiptStore(CACHE_DIR.joinpath("receipts"))
+    return _receipt_store
+
+
+def reprint(printer, key: str) -> bool:
+    """Print a compiled receipt, if there is one; return whether there was."""
+    data = get_receipt_store().get(key)
+    if data is None:
+        return False
+    print("Reprinting compiled receipt")
+    printer._raw(data)
+    # NOTE Whatever the receipt left the printer's text style and code
+    # page as isn't known, so they're sent again before they're used.
+    if printer._text_state is not None:
+        printer._text_state.clear()
+    printer.magic.encoding = None
+    return True
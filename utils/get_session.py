@@ -0,0 +1,53 @@
+import threading
+from typing import TYPE_CHECKING
+
+from printer.raster_cache import RasterCache
+from utils.get_raster_cache import CACHE_DIR
+
+if TYPE_CHECKING:
+    from utils.cached_session import CachedSession
+
+
+# How long (in seconds) responses stay fresh, by URL prefix
+CACHE_TTLS = {
+    "https://api.opencagedata.com/": 30 * 24 * 60 * 60,
+    "https://weather.visualcrossing.com/": 30 * 60,
+    "https://musicbrainz.org/ws/2/": 24 * 60 * 60,
+    "http://coverartarchive.org/": 30 * 24 * 60 * 60,
+    "https://coverartarchive.org/": 30 * 24 * 60 * 60,
+    "https://pbs.twimg.com/": 30 * 24 * 60 * 60,
+}
+# Query parameters that are kept out of the cache (API keys)
+SECRET_PARAMS = ("key",)
+# (connect, read) timeouts in seconds, by host
+TIMEOUTS = {
+    "coverartarchive.org": (5, 60),
+    "pbs.twimg.com": (5, 60),
+}
+DEFAULT_TIMEOUT = (5, 30)
+# Most requests per second, by host (cached responses don't count)
+RATE_LIMITS = {
+    # https://musicbrainz.org/doc/MusicBrainz_API/Rate_Limiting
+    "musicbrainz.org": 1.0,
+}
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "CachedSession":
+    global _session
+    if _session is None:
+        # NOTE Batch printing fetches from several threads at once, and
+        # the rate limits only hold if they all share one session.
+        with _session_lock:
+            if _session is None:
+                # NOTE requests takes a while to import, and not
+                # everything that imports utils goes online.
+                from utils.cached_session import CachedSession
+
+                _session = CachedSession(
+                    RasterCache(CACHE_DIR.joinpath("http"))
+                )
+    return _session
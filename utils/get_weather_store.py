@@ -0,0 +1,20 @@
+from typing import TYPE_CHECKING
+
+from utils.get_raster_cache import CACHE_DIR
+
+if TYPE_CHECKING:
+    from utils.weather_store import WeatherStore
+
+
+_weather_store = None
+
+
+def get_weather_store() -> "WeatherStore":
+    global _weather_store
+    if _weather_store is None:
+        # NOTE Only the weather program needs sqlite3, so it's only
+        # imported then.
+        from utils.weather_store import WeatherStore
+
+        _weather_store = WeatherStore(CACHE_DIR.joinpath("weather.sqlite3"))
+    return _weather_store
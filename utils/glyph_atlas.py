@@ -0,0 +1,43 @@
+import functools
+
+from PIL import Image, ImageDraw, ImageFont
+
+# NOTE Sprites are cached per run of text (like "72" or "°F") rather
+# than per glyph, so kerning and sub-pixel glyph positions come out
+# exactly like ImageDraw.text's.
+ATLAS_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=ATLAS_SIZE)
+def _sprite(font: ImageFont.FreeTypeFont, text: str):
+    bbox = font.getbbox(text, mode="L")
+    left, top, right, bottom = bbox
+    # NOTE The sprite is a mask of the text, cropped to its bounding box.
+    sprite = Image.new("L", (right - left, bottom - top))
+    ImageDraw.Draw(sprite).text((-left, -top), text, fill=255, font=font)
+    return bbox, sprite
+
+
+def text_bbox(
+    font: ImageFont.FreeTypeFont,
+    text: str,
+) -> tuple[int, int, int, int]:
+    """Get the bounding box of some text, like ImageDraw.textbbox((0, 0))."""
+    bbox, _ = _sprite(font, text)
+    return bbox
+
+
+def draw_text(
+    draw: ImageDraw.ImageDraw,
+    xy: tuple[int, int],
+    text: str,
+    fill,
+    font: ImageFont.FreeTypeFont,
+):
+    """Draw single-line text from a cached sprite, like ImageDraw.text.
+
+    The text is only rasterized the first time it's drawn in a font.
+    """
+    (left, top, _, _), sprite = _sprite(font, text)
+    x, y = xy
+    draw.bitmap((x + left, y + top), sprite, fill=fill)
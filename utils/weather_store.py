@@ -0,0 +1,87 @@
+import os
+import pathlib
+import sqlite3
+import time
+from typing import Iterable
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    coords TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    stored REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_alerts (
+    id TEXT PRIMARY KEY,
+    seen REAL NOT NULL
+);
+"""
+# How long (in seconds) to remember an alert after it was printed
+ALERT_MEMORY = 30 * 24 * 60 * 60
+
+
+class WeatherStore:
+    """SQLite database of what the weather program has looked up and printed.
+
+    It keeps the place names found by reverse geocoding, keyed by
+    coordinates rounded to precision decimal places (so places close
+    together share a name, and a lookup), and the IDs of the weather
+    alerts that have been printed.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], precision: int = 2):
+        self.path = pathlib.Path(path)
+        self.precision = precision
+        self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _coords(self, latitude: float, longitude: float) -> str:
+        return f"{latitude:.{self.precision}f},{longitude:.{self.precision}f}"
+
+    def get_location(self, latitude: float, longitude: float) -> str | None:
+        row = self._connect().execute(
+            "SELECT name FROM locations WHERE coords = ?",
+            (self._coords(latitude, longitude),),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put_location(self, latitude: float, longitude: float, name: str):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO locations VALUES (?, ?, ?)",
+                (self._coords(latitude, longitude), name, time.time()),
+            )
+
+    def unseen(self, alert_ids: Iterable[str]) -> list[str]:
+        """Get the alert IDs that haven't been printed, in order."""
+        db = self._connect()
+        return [
+            alert_id for alert_id in alert_ids
+            if db.execute(
+                "SELECT 1 FROM seen_alerts WHERE id = ?", (alert_id,),
+            ).fetchone() is None
+        ]
+
+    def mark_seen(self, alert_ids: Iterable[str]):
+        """Remember that alerts were printed (and forget very old ones)."""
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO seen_alerts VALUES (?, ?)",
+                ((alert_id, now) for alert_id in alert_ids),
+            )
+            db.execute(
+                "DELETE FROM seen_alerts WHERE seen < ?",
+                (now - ALERT_MEMORY,),
+            )
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
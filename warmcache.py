@@ -0,0 +1,7 @@
+from utils.get_printer import PRINTER_PROFILE, get_printer_profile
+from utils.get_raster_cache import warm_weather_icons
+
+
+media_width = get_printer_profile().profile_data["media"]["width"]["pixels"]
+count = warm_weather_icons(media_width)
+print(f"Prepared {count} weather icons for {PRINTER_PROFILE} ({media_width}px)")
@@ -1,92 +1,114 @@
-import asyncio
-from datetime import datetime
+from datetime import datetime, time as dt_time, timedelta
+import functools
 from io import BytesIO
 import os
 import pathlib
 import re
-import requests
-from requests.exceptions import RequestException
+import time
 from typing import Any
 
 from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from PIL import Image, ImageDraw, ImageFont
 
-from utils import get_font, get_printer
+from printer import instrumentation
+from printer.document import (
+    Feed, Node, Picture, Section, Style, Text,
+)
+from printer.raster_cache import cache_key, file_hash
+from utils import (
+    get_document_backend, get_font, get_printer_pool, get_receipt_store,
+    get_session, get_weather_icon, get_weather_store, preload_fonts,
+)
+from utils.get_printer import print_job
+from utils.get_receipt_store import reprint
+from utils.glyph_atlas import draw_text, text_bbox
 
 FILEDIR = pathlib.Path(__file__).parent
+TEMPERATURE_FONT = r"ariblk.ttf"
+# NOTE Change this whenever the same weather would print differently.
+RECEIPT_VERSION = 4
 
 
 load_dotenv(".env")
 
 
-# Get location
-try:
-    import winsdk.windows.devices.geolocation as wdg
-    async def get_lat_long():
+def get_lat_long() -> tuple[float, float]:
+    try:
+        import winsdk.windows.devices.geolocation as wdg
+    except ImportError:
+        # try:
+        #     r = get_session().get("https://ipinfo.io/json")
+        #     r.raise_for_status()
+        # except RequestException as e:
+        #     print("Error getting IP info!")
+        #     raise SystemExit(e)
+
+        # return tuple(map(float, r.json()["loc"].split(",")))
+
+        # HACK I wanted to use ipinfo.io to get location info from an IP
+        # address, but being in a Wisconsin hospital makes it think I'm in
+        # New York City, so that's an unviable option. For now, I'm asking
+        # directly for a latitude and longitude.
+        latlong = input(
+            "Enter latitude and longitude (separated by comma): "
+        )
+        latitude, longitude = map(float, latlong.split(","))
+        return latitude, longitude
+
+    import asyncio
+
+    async def get_geoposition():
         locator = wdg.Geolocator()
         pos = await locator.get_geoposition_async()
         return pos.coordinate.latitude, pos.coordinate.longitude
 
     try:
-        LATITUDE, LONGITUDE = asyncio.run(get_lat_long())
+        return asyncio.run(get_geoposition())
     except PermissionError:
         print(
             "Please allow access to your location. "
             "Using default coordinates."
         )
-        LATITUDE, LONGITUDE = 38.897957, -77.036560
-except ImportError:
-    # try:
-    #     r = requests.get("https://ipinfo.io/json")
-    #     r.raise_for_status()
-    # except RequestException as e:
-    #     print("Error getting IP info!")
-    #     raise SystemExit(e)
-
-    # LATITUDE, LONGITUDE = map(float, r.json()["loc"].split(","))
-
-    # HACK I wanted to use ipinfo.io to get location info from an IP
-    # address, but being in a Wisconsin hospital makes it think I'm in
-    # New York City, so that's an unviable option. For now, I'm asking
-    # directly for a latitude and longitude.
-    latlong = input(
-        "Enter latitude and longitude (separated by comma): "
-    )
-    LATITUDE, LONGITUDE = map(float, latlong.split(","))
+        return 38.897957, -77.036560
 
 
-# Get formatted location name
-try:
-    r = requests.get(
+def get_location_name(latitude: float, longitude: float) -> str:
+    r = get_session().get(
         "https://api.opencagedata.com/geocode/v1/json",
         params={
             "key": os.getenv("OPENCAGE_API_KEY"),
-            "q": f"{LATITUDE},{LONGITUDE}",
+            "q": f"{latitude},{longitude}",
             "language": "en",
             "no_annotations": 1,
             "abbrv": 1,
         },
     )
     r.raise_for_status()
-except RequestException as e:
-    print("Error getting location name!")
-    raise SystemExit(e)
-location_components = r.json()["results"][0]["components"]
-LOCATION = ", ".join(
-    location_components[target]
-    for target in (
-        "neighborhood", "suburb", "city_district", "village", "town",
-        "city", "state", "country",
+    location_components = r.json()["results"][0]["components"]
+    return ", ".join(
+        location_components[target]
+        for target in (
+            "neighborhood", "suburb", "city_district", "village", "town",
+            "city", "state", "country",
+        )
+        if target in location_components
     )
-    if target in location_components
-)
 
 
-# Get weather forecast
-try:
-    r = requests.get(
+def get_location(latitude: float, longitude: float) -> str:
+    """Get a location's name, looking it up only if it isn't stored yet."""
+    store = get_weather_store()
+    location = store.get_location(latitude, longitude)
+    if location is None:
+        location = get_location_name(latitude, longitude)
+        store.put_location(latitude, longitude, location)
+    return location
+
+
+def get_weather(latitude: float, longitude: float) -> dict:
+    r = get_session().get(
         "https://weather.visualcrossing.com/VisualCrossingWebServices/"
-        f"rest/services/timeline/{LATITUDE}%2C{LONGITUDE}/next7days",
+        f"rest/services/timeline/{latitude}%2C{longitude}/next7days",
         params={
             "key": os.getenv("VISUALCROSSING_API_KEY"),
             "unitGroup": "us",
@@ -94,12 +116,7 @@ try:
         },
     )
     r.raise_for_status()
-except RequestException as e:
-    print("Error getting weather!")
-    raise SystemExit(e)
-weather = r.json()
-current_weather = weather["currentConditions"]
-todays_weather = weather["days"][0]
+    return r.json()
 
 
 def f_to_c(temp: float):
@@ -119,14 +136,14 @@ def temperature_image(
     img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
 
     draw = ImageDraw.Draw(img)
-    font = get_font(__file__, r"ariblk.ttf", font_size)
-    subfont = get_font(__file__, r"ariblk.ttf", font_size // 2)
+    font = get_font(__file__, TEMPERATURE_FONT, font_size)
+    subfont = get_font(__file__, TEMPERATURE_FONT, font_size // 2)
 
     temptext = str(temperature)
     unittext = "°" + unit
     # Get size of temperature and unit text
-    tempbbox = draw.textbbox((0, 0), temptext, font=font)
-    unitbbox = draw.textbbox((0, 0), unittext, font=subfont)
+    tempbbox = text_bbox(font, temptext)
+    unitbbox = text_bbox(subfont, unittext)
     # Get width of temperature and unit text next to each other
     w = (tempbbox[2] - tempbbox[0]) + (unitbbox[2] - unitbbox[0])
     h = (tempbbox[3] - tempbbox[1])
@@ -140,12 +157,23 @@ def temperature_image(
     # Unit text Y should be flush with the top of temperature text
     uy = ty + unitbbox[1]
 
-    draw.text((tx, ty), temptext, fill=(0, 0, 0), font=font)
-    draw.text((ux, uy), unittext,fill=(0, 0, 0), font=subfont)
+    draw_text(draw, (tx, ty), temptext, fill=(0, 0, 0), font=font)
+    draw_text(draw, (ux, uy), unittext, fill=(0, 0, 0), font=subfont)
     img = img.crop((0, ty, size, ty + tempbbox[1] + tempbbox[3]))
     return img
 
 
+def weather_image_fonts(width: int) -> list[tuple[str, float]]:
+    """Get every font (and size) that weather_image uses."""
+    icon_size = width // 2
+    return [
+        (TEMPERATURE_FONT, size)
+        for font_size in (icon_size // 2.25, icon_size // 4.75)
+        for size in (font_size, font_size // 2)
+    ]
+
+
+@instrumentation.timed("render", "weather image")
 def weather_image(
         icon_path: str,
         temp: float,
@@ -153,9 +181,7 @@ def weather_image(
 ) -> Image.Image:
     # Create weather icon
     icon_size = width // 2
-    icon = Image.open(icon_path)
-    icon = icon.resize((icon_size, icon_size), Image.Resampling.LANCZOS)
-    icon = icon.filter(ImageFilter.UnsharpMask(percent=200))
+    icon = get_weather_icon(icon_path, icon_size)
 
     # Draw icon to side
     img = Image.new("RGBA", (width, icon_size), (255, 255, 255))
@@ -189,119 +215,397 @@ def weather_image(
     return img
 
 
-# Initialize printer
-p = get_printer(__file__)
-media_width = p.profile.profile_data["media"]["width"]["pixels"]
-p.hw("INIT")
-p.ln(3)
-
-# Date / location
-p.set(bold=True)
-p.block_text(datetime.now().strftime("%A, %B %#d, %Y"))
-p.set(bold=False)
-p.ln()
-p.block_text(LOCATION)
-p.ln()
-
-# Weather image (icon + temperature)
-p.image(weather_image(
-    icon_path=FILEDIR
-        .joinpath("weather")
-        .joinpath(current_weather["icon"] + ".png"),
-    temp=current_weather["temp"],
-    width=media_width,
-))
-p.ln()
-
-# Weather description
-p.set(double_height=True)
-p.block_text(weather["description"])
-p.set(normal_textsize=True)
-p.ln(2)
-
-# Temperature / "feels like"
-p.block_text(f"Condition: {current_weather['conditions']}")
-p.ln()
-p.block_text(f"Temperature: {temperature_text(current_weather['temp'])}")
-p.ln()
-p.text(f"Feels like: {temperature_text(current_weather['feelslike'])}")
-p.ln(2)
-
-# High / low, precipitation chance, humidity
-p.text(f"High: {temperature_text(todays_weather['tempmax'])}")
-p.ln()
-p.text(f"Low: {temperature_text(todays_weather['tempmin'])}")
-p.ln()
-p.block_text(f"Precip. chance: {round(todays_weather['precipprob'])}%")
-p.ln()
-p.block_text(f"Humidity: {round(todays_weather['humidity'])}%")
-p.ln(2)
-
-# Sunrise / sunset
-sunrise = datetime.fromtimestamp(
-    todays_weather["sunriseEpoch"]
-).strftime("%I:%M %p")
-p.block_text(f"Sunrise: {sunrise}")
-p.ln()
-sunset = datetime.fromtimestamp(
-    todays_weather["sunsetEpoch"]
-).strftime("%I:%M %p")
-p.block_text(f"Sunset: {sunset}")
-p.ln(4)
-
-# Next 7 days forecast
-p.set(underline=1, double_width=True, double_height=True)
-p.textln("Weather Forecast")
-p.set(underline=0, normal_textsize=True)
-p.ln()
-for day in weather["days"]:
-    p.set(invert=True)
-    this_datetime = datetime.strptime(day["datetime"], "%Y-%m-%d")
-    p.text(this_datetime.strftime("%A, %B %#d, %Y"))
-    p.ln()
-    p.set(invert=False)
-
-    p.set(bold=True)
-    p.block_text(day["description"])
-    p.ln(2)
-    p.set(bold=False)
-
-    p.text(f"High: {temperature_text(day['tempmax'])}")
-    p.ln()
-    p.text(f"Low: {temperature_text(day['tempmin'])}")
-    p.ln(2)
-p.ln(2)
-
-# Weather alerts
-alerts = weather.get("alerts", [])
-if alerts:
-    p.set(underline=1, double_width=True, double_height=True)
-    p.textln("Weather Alerts")
-    p.set(underline=0, normal_textsize=True)
-    p.ln()
+def weather_receipt(
+        location: str,
+        weather: dict,
+        width: int,
+        now: datetime,
+) -> Section:
+    """Lay out the weather receipt."""
+    return Section([
+        *receipt_header(location, now),
+        *weather_body(weather, width),
+        *receipt_footer(now),
+    ])
+
+
+def receipt_header(location: str, now: datetime) -> list[Node]:
+    # Date / location
+    return [
+        Feed(3),
+        Text(now.strftime("%A, %B %#d, %Y"), Style(bold=True), feed=1),
+        Text(location, feed=1),
+    ]
+
+
+def receipt_footer(now: datetime) -> list[Node]:
+    # Generation time
+    generated_time = now.isoformat(sep=" ", timespec="minutes")
+    return [
+        Text(f"Generated: {generated_time}", feed=1),
+        # Padding
+        Feed(6),
+    ]
+
+
+def weather_body(weather: dict, width: int) -> list[Node]:
+    """Lay out the weather itself (everything that doesn't change by time)."""
+    current_weather = weather["currentConditions"]
+    todays_weather = weather["days"][0]
+    receipt = []
+
+    # Weather image (icon + temperature)
+    icon_path = FILEDIR.joinpath("weather").joinpath(current_weather["icon"] + ".png")
+    receipt += [
+        Picture(
+            lambda: weather_image(
+                icon_path=icon_path,
+                temp=current_weather["temp"],
+                width=width,
+            ),
+            key=(
+                "weather-image", file_hash(icon_path),
+                round(current_weather["temp"]),
+                round(f_to_c(current_weather["temp"])),
+            ),
+        ),
+        Feed(),
+    ]
+
+    # Weather description
+    receipt += [
+        Text(weather["description"], Style(size="2h"), feed=1),
+        Feed(),
+    ]
+
+    # Temperature / "feels like"
+    receipt += [
+        Text(f"Condition: {current_weather['conditions']}", feed=1),
+        Text(f"Temperature: {temperature_text(current_weather['temp'])}", feed=1),
+        Text(
+            f"Feels like: {temperature_text(current_weather['feelslike'])}",
+            wrap=False, feed=2,
+        ),
+    ]
+
+    # High / low, precipitation chance, humidity
+    receipt += [
+        Text(
+            f"High: {temperature_text(todays_weather['tempmax'])}",
+            wrap=False, feed=1,
+        ),
+        Text(
+            f"Low: {temperature_text(todays_weather['tempmin'])}",
+            wrap=False, feed=1,
+        ),
+        Text(f"Precip. chance: {round(todays_weather['precipprob'])}%", feed=1),
+        Text(f"Humidity: {round(todays_weather['humidity'])}%", feed=2),
+    ]
+
+    # Sunrise / sunset
+    sunrise = datetime.fromtimestamp(
+        todays_weather["sunriseEpoch"]
+    ).strftime("%I:%M %p")
+    sunset = datetime.fromtimestamp(
+        todays_weather["sunsetEpoch"]
+    ).strftime("%I:%M %p")
+    receipt += [
+        Text(f"Sunrise: {sunrise}", feed=1),
+        Text(f"Sunset: {sunset}", feed=4),
+    ]
+
+    # Next 7 days forecast
+    receipt.append(heading("Weather Forecast"))
+    for day in weather["days"]:
+        this_datetime = datetime.strptime(day["datetime"], "%Y-%m-%d")
+        receipt.append(Section(
+            [
+                Text(
+                    this_datetime.strftime("%A, %B %#d, %Y"),
+                    Style(invert=True), wrap=False, feed=1,
+                ),
+                Text(day["description"], Style(bold=True), feed=2),
+                Text(
+                    f"High: {temperature_text(day['tempmax'])}",
+                    wrap=False, feed=1,
+                ),
+                Text(
+                    f"Low: {temperature_text(day['tempmin'])}",
+                    wrap=False, feed=2,
+                ),
+            ],
+            key=(
+                "forecast-day", day["datetime"], day["description"],
+                day["tempmax"], day["tempmin"],
+            ),
+        ))
+    receipt.append(Feed(2))
+
+    # Weather alerts
+    alerts = weather.get("alerts", [])
+    if alerts:
+        receipt += alerts_receipt(alerts)
+    return receipt
+
+
+def heading(text: str) -> Section:
+    return Section(
+        [
+            Text(
+                text, Style(underline=1, size="2x"), wrap=False, feed=1,
+            ),
+            Feed(),
+        ],
+        key=("heading", text),
+    )
+
 
+def new_alerts_receipt(
+        location: str,
+        alerts: list[dict],
+        now: datetime,
+) -> Section:
+    """Lay out a receipt of just some weather alerts."""
+    return Section([
+        *receipt_header(location, now),
+        Feed(),
+        *alerts_receipt(alerts),
+        *receipt_footer(now),
+    ])
+
+
+def alerts_receipt(alerts: list[dict]) -> list[Node]:
+    receipt = [heading("Weather Alerts")]
     for alert in alerts:
-        p.set(invert=True)
-        p.block_text(alert["event"])
-        p.ln()
-        p.set(bold=True, invert=False)
-        p.block_text(alert["headline"])
-        p.ln()
-        p.set(bold=False)
-        p.ln()
-        description = alert["description"]
-        if "\n\n" in description:
-            description = re.sub(r"(.)\n(?!\n)", r"\1 ", description)
-        for line in description.split("\n"):
-            p.block_text(line)
-            p.ln()
-        p.ln()
-    p.ln(3)
-
-# Generation time
-generated_time = datetime.now().isoformat(sep=" ", timespec="minutes")
-p.block_text(f"Generated: {generated_time}")
-p.ln()
-
-# Padding
-p.ln(6)
+        receipt.append(Section(
+            alert_receipt(alert),
+            key=("weather-alert", alert["event"], alert["headline"],
+                 alert["description"]),
+        ))
+    receipt.append(Feed(3))
+    return receipt
+
+
+def alert_id(alert: dict) -> str:
+    # NOTE Every alert should have an ID, but just in case...
+    return alert.get("id") or cache_key(alert["event"], alert["headline"])
+
+
+def alert_receipt(alert: dict) -> list[Node]:
+    description = alert["description"]
+    if "\n\n" in description:
+        description = re.sub(r"(.)\n(?!\n)", r"\1 ", description)
+    return [
+        Text(alert["event"], Style(invert=True), feed=1),
+        Text(alert["headline"], Style(bold=True), feed=2),
+        *(Text(line, feed=1) for line in description.split("\n")),
+        Feed(),
+    ]
+
+
+def print_weather(p, location: str, weather: dict, now: datetime) -> None:
+    """Print the weather receipt, reprinting the compiled one if possible.
+
+    Only the weather itself is compiled; the date and generation time
+    are printed fresh every time. (The alerts on it aren't remembered as
+    printed; see print_report().)
+    """
+    backend = get_document_backend(p)
+    with p.document():
+        p.hw("INIT")
+        backend.render(Section(receipt_header(location, now)))
+
+        # Reprint the compiled weather, if this weather was printed before
+        # NOTE The compiled weather picks its own code page, since the
+        # header's (which depends on the location) may not be the same.
+        # It does depend on the text style the header leaves behind,
+        # which is part of its key.
+        p.magic.encoding = None
+        receipt_key = get_receipt_store().key(
+            "weather", RECEIPT_VERSION, p.profile.profile_data["name"],
+            sorted(p._text_state.items()), weather,
+        )
+        if not reprint(p, receipt_key):
+            media_width = p.profile.profile_data["media"]["width"]["pixels"]
+            preload_fonts(__file__, weather_image_fonts(media_width))
+            with p.record() as body:
+                backend.render(Section(weather_body(weather, media_width)))
+
+            # Save compiled weather
+            get_receipt_store().put(
+                receipt_key, bytes(body),
+                title=f"Weather for {location}", script="weather",
+            )
+
+        backend.render(Section(receipt_footer(now)))
+
+
+def print_alerts(p, location: str, alerts: list[dict], now: datetime) -> None:
+    """Print a receipt of just some weather alerts."""
+    get_document_backend(p).render(new_alerts_receipt(location, alerts, now))
+
+
+def print_report(location: str, weather: dict, now: datetime, pool=None) -> None:
+    """Print the weather receipt (see print_job() for pool).
+
+    The alerts on it are remembered as printed.
+    """
+    # NOTE print_weather() may be called once for each width of printer
+    # in the pool, so what's printed is only remembered here.
+    print_job(
+        __file__,
+        functools.partial(
+            print_weather, location=location, weather=weather, now=now,
+        ),
+        name="weather", pool=pool,
+    )
+    # Alerts on this receipt don't need printing again
+    get_weather_store().mark_seen(
+        alert_id(alert) for alert in weather.get("alerts", [])
+    )
+
+
+def print_new_alerts(
+        location: str,
+        weather: dict,
+        now: datetime,
+        pool=None,
+) -> int:
+    """Print the alerts that haven't been printed before; return how many.
+
+    See print_job() for pool.
+    """
+    alerts = {alert_id(alert): alert for alert in weather.get("alerts", [])}
+    new_ids = get_weather_store().unseen(alerts)
+    if not new_ids:
+        return 0
+    # NOTE The printer is only connected to when there's something new
+    # to print.
+    print_job(
+        __file__,
+        functools.partial(
+            print_alerts, location=location,
+            alerts=[alerts[new_id] for new_id in new_ids], now=now,
+        ),
+        name="weather alerts", pool=pool,
+    )
+    get_weather_store().mark_seen(new_ids)
+    return len(new_ids)
+
+
+def next_report(report_time: dt_time, now: datetime) -> datetime:
+    report = datetime.combine(now.date(), report_time)
+    return report if report > now else report + timedelta(days=1)
+
+
+def run_schedule(
+        latitude: float,
+        longitude: float,
+        report_time: dt_time,
+        interval: float,
+        pool=None,
+) -> None:
+    """Print the weather every day, and new weather alerts as they come.
+
+    The weather is checked every interval seconds. The whole receipt is
+    printed at report_time; the rest of the time, only alerts that
+    haven't been printed before are. See print_job() for pool.
+    """
+    # NOTE requests takes a while to import, so it isn't imported until
+    # it's needed (by get_session()).
+    from requests.exceptions import RequestException
+
+    location = get_location(latitude, longitude)
+    report_at = next_report(report_time, datetime.now())
+    print(f"Next weather report at {report_at:%Y-%m-%d %H:%M}")
+    while True:
+        now = datetime.now()
+        try:
+            weather = get_weather(latitude, longitude)
+            if now >= report_at:
+                print_report(location, weather, now, pool)
+                report_at = next_report(report_time, now)
+                print(f"Next weather report at {report_at:%Y-%m-%d %H:%M}")
+            else:
+                printed = print_new_alerts(location, weather, now, pool)
+                if printed:
+                    print(f"Printed {printed} new weather alert(s)")
+        except RequestException as e:
+            print("Error getting weather!")
+            print(e)
+        except Exception as e:
+            # NOTE Anything else that goes wrong (with the printer, or
+            # with the weather that came back) is retried on the next
+            # check too, instead of stopping the schedule.
+            print("Error printing weather!")
+            print(f"{type(e).__name__}: {e}")
+
+        # Wait for the next check (or the report, if it's sooner)
+        wake = now + timedelta(seconds=interval)
+        if report_at > now:
+            wake = min(wake, report_at)
+        time.sleep(max(0.0, (wake - datetime.now()).total_seconds()))
+
+
+if __name__ == "__main__":
+    import argparse
+    from contextlib import nullcontext
+
+    from requests.exceptions import RequestException
+
+    parser = argparse.ArgumentParser(
+        description="Print today's weather, the forecast for the next "
+        "week, and any weather alerts.",
+    )
+    parser.add_argument(
+        "--schedule", action="store_true",
+        help="keep running: print the weather every day at --report-time, "
+        "and in between, print weather alerts as soon as they're issued",
+    )
+    parser.add_argument(
+        "--report-time", default="07:00",
+        type=lambda value: datetime.strptime(value, "%H:%M").time(),
+        help="with --schedule, when to print the weather each day, as "
+        "HH:MM (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=30,
+        help="with --schedule, minutes between checks for new weather "
+        "alerts (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pool", action="store_true",
+        help="print on whichever printer in PRINTER_POOL is free",
+    )
+    args = parser.parse_args()
+
+    latitude, longitude = get_lat_long()
+
+    # Get formatted location name
+    try:
+        location = get_location(latitude, longitude)
+    except RequestException as e:
+        print("Error getting location name!")
+        raise SystemExit(e)
+
+    # NOTE The pool's printers stay connected (and are health-checked)
+    # for as long as it's open, which is the whole schedule.
+    with get_printer_pool() if args.pool else nullcontext() as pool:
+        if args.schedule:
+            try:
+                run_schedule(
+                    latitude, longitude, args.report_time,
+                    args.interval * 60, pool,
+                )
+            except KeyboardInterrupt:
+                pass
+            raise SystemExit
+
+        # Get weather forecast
+        try:
+            weather = get_weather(latitude, longitude)
+        except RequestException as e:
+            print("Error getting weather!")
+            raise SystemExit(e)
+
+        print_report(location, weather, datetime.now(), pool)